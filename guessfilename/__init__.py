@@ -21,91 +21,1692 @@ import os
 import os.path
 import time
 import logging
-from optparse import OptionParser
+from optparse import OptionParser, Values
 import colorama
 import datetime  # for calculating duration of chunks
+import errno
+import functools
+import itertools
 import json  # to parse JSON meta-data files
-from typing import Any, NoReturn
+import io
+import socket  # for the daemon of --serve
+import contextlib
+import signal  # for the worker processes of --jobs
+import mmap  # for reading the headers of Pixel camera files (see PixelMetadataReader)
+import struct
+from string import Formatter  # to parse the templates of the rule table
+from typing import Any, BinaryIO, Callable, Iterable, Iterator, NoReturn, TextIO, TypeVar
 
-try:
-    from fuzzywuzzy import fuzz  # for fuzzy comparison of strings
-except ImportError:
-    print("Could not find Python module \"fuzzywuzzy\".\nPlease install it, e.g., with \"sudo pip install fuzzywuzzy\".")
-    sys.exit(1)
+PROG_VERSION_DATE = PROG_VERSION[13:23]
+INVOCATION_TIME = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime())
+
+USAGE = "\n\
+    guessfilename [<options>] <list of files>\n\
+    guessfilename [<options>] --recursive <list of directories>\n\
+\n\
+This little Python script tries to rename files according to pre-defined rules.\n\
+\n\
+It does this with several methods: first, the current file name is analyzed and\n\
+any ISO date/timestamp and filetags are re-used. Secondly, if the parsing of the\n\
+file name did not lead to any new file name, the content of the file is analyzed.\n\
+\n\
+You have to adapt the rules in the Python script to meet your requirements.\n\
+The default rule-set follows the filename convention described on\n\
+http://karl-voit.at/managing-digital-photographs/\n\
+\n\
+\n\
+:copyright: (c) by Karl Voit\n\
+:license: GPL v3 or any later version\n\
+:URL: https://github.com/novoid/guess-filename.py\n\
+:bugreports: via github or <tools@Karl-Voit.at>\n\
+:version: " + PROG_VERSION_DATE + "\n"
+
+ERROR_DIR = 'guess-filename_fails'
+SUCCESS_DIR = 'guess-filename_success'
+RULE_TABLE_FILENAME = 'guessfilenamerules.json'  # optional rule table in the config directory (see TableRule)
+AT_FDCWD = -100  # arguments of renameat2() on Linux (see rename_no_replace())
+RENAME_NOREPLACE = 1
+FILE_BATCH_SIZE = 500  # files handled at once by main() and run_client() (see get_batches())
+
+parser = OptionParser(usage=USAGE)
+
+parser.add_option("-d", "--dryrun", dest="dryrun", action="store_true",
+                  help="enable dryrun mode: just simulate what would happen, do not modify files")
+
+parser.add_option("-v", "--verbose", dest="verbose", action="store_true",
+                  help="enable verbose mode")
+
+parser.add_option("-q", "--quiet", dest="quiet", action="store_true",
+                  help="enable quiet mode")
+
+parser.add_option("--debug", dest="debug", action="store_true",
+                  help="enable debug mode, printing debug information on selected file formats. Currently: just PXL files.")
+
+parser.add_option("--stats", dest="stats", action="store_true",
+                  help="print the number of attempts, hits and durations of the rules after processing the files")
+
+parser.add_option("--stats-json", dest="stats_json", metavar="FILE",
+                  help="write the statistics of the rules as JSON to FILE")
+
+parser.add_option("--serve", dest="serve", action="store_true",
+                  help="run as a daemon which keeps its rules in memory and renames the files sent by --client")
+
+parser.add_option("--client", dest="client", action="store_true",
+                  help="send the files to the daemon started with --serve instead of renaming them in this process")
+
+parser.add_option("--socket", dest="socket", metavar="PATH",
+                  help="Unix domain socket of --serve and --client (default: guessfilename.sock in " +
+                  "$XDG_RUNTIME_DIR or in the config directory)")
+
+parser.add_option("--map-names", dest="map_names", action="store_true",
+                  help="read file names from stdin and write \"old<TAB>new\" lines to stdout using the file name " +
+                  "rules only: no file is accessed or renamed")
+
+parser.add_option("--null", dest="null", action="store_true",
+                  help="with --map-names: file names are separated by NUL characters instead of newlines; " +
+                  "so are the output lines")
+
+parser.add_option("--jsonl", dest="jsonl", action="store_true",
+                  help="with --map-names: write one JSON object per line instead of \"old<TAB>new\"")
+
+parser.add_option("--recursive", dest="recursive", action="store_true",
+                  help="the arguments are directories: handle the files of them and their subdirectories except \"" +
+                  SUCCESS_DIR + "\" and \"" + ERROR_DIR + "\"; the files are handled while the directories are walked")
+
+parser.add_option("--include", dest="include", metavar="GLOB", action="append",
+                  help="with --recursive: handle only files whose names match GLOB, e.g., \"*.pdf\"; may be repeated")
+
+parser.add_option("--exclude", dest="exclude", metavar="GLOB", action="append",
+                  help="with --recursive: skip files and directories whose names match GLOB; may be repeated")
+
+parser.add_option("--walk-threads", dest="walk_threads", metavar="N", type="int", default=4,
+                  help="with --recursive: read up to N directories in parallel threads (default: 4)")
+
+parser.add_option("--plan", dest="plan", action="store_true",
+                  help="rename the files in batches: derive the new file names of " + str(FILE_BATCH_SIZE) +
+                  " files, skip the files getting the same new file name or the name of an existing file and " +
+                  "rename the others in one pass which is rolled back if it fails")
+
+parser.add_option("--journal", dest="journal", metavar="FILE",
+                  help="journal of the renames of --plan (default: guessfilename/renames.journal in " +
+                  "$XDG_STATE_HOME or ~/.local/state)")
+
+parser.add_option("--rollback", dest="rollback", action="store_true",
+                  help="undo the renames of the batch of an interrupted --plan run recorded in the journal and exit")
+
+parser.add_option("--pdf-cache", dest="pdf_cache", metavar="FILE",
+                  help="SQLite database storing the texts of analysed PDF files for further runs (default: " +
+                  "guessfilename/pdftext.sqlite in $XDG_CACHE_HOME or ~/.cache)")
+
+parser.add_option("--pdf-cache-size", dest="pdf_cache_size", metavar="MB", type="int", default=64,
+                  help="remove the least recently used texts when the PDF cache exceeds MB megabytes (default: 64)")
+
+parser.add_option("--pdf-cache-hash", dest="pdf_cache_hash", action="store_true",
+                  help="identify the texts of the PDF cache by the SHA-256 of the files as well; finds the texts " +
+                  "of copied files and detects modified files with unchanged size and modification time")
+
+parser.add_option("--no-pdf-cache", dest="no_pdf_cache", action="store_true",
+                  help="do not use the PDF cache: always extract the texts of PDF files")
+
+parser.add_option("--exif-cache", dest="exif_cache", metavar="FILE",
+                  help="SQLite database storing the Exif meta-data of Google Pixel camera files for further runs " +
+                  "(default: guessfilename/exif.sqlite in $XDG_CACHE_HOME or ~/.cache)")
+
+parser.add_option("--exif-cache-size", dest="exif_cache_size", metavar="MB", type="int", default=8,
+                  help="remove the least recently used meta-data when the Exif cache exceeds MB megabytes (default: 8)")
+
+parser.add_option("--no-exif-cache", dest="no_exif_cache", action="store_true",
+                  help="do not use the Exif cache: always read the meta-data of Google Pixel camera files")
+
+parser.add_option("--pdf-backend", dest="pdf_backend", metavar="NAME", type="choice", default="pypdf",
+                  choices=["pypdf", "pdftotext"],
+                  help="extract the texts of PDF files with the Python module \"pypdf\" (default) or with the " +
+                  "command \"pdftotext\" of poppler-utils which is usually much faster")
+
+parser.add_option("--jobs", dest="jobs", metavar="N", type="int", default=1,
+                  help="analyse the content of up to N PDF files in parallel worker processes; the files are " +
+                  "still renamed in the given order (default: 1)")
+
+parser.add_option("--content-timeout", dest="content_timeout", metavar="SECONDS", type="float",
+                  help="abandon the content analysis of a PDF file after SECONDS and move it to \"" + ERROR_DIR +
+                  "\" if it exists; the files are analysed in worker processes (see --jobs)")
+
+parser.add_option("--content-memory", dest="content_memory", metavar="MB", type="int",
+                  help="abandon the content analysis of a PDF file needing more than MB megabytes of additional " +
+                  "memory and move it to \"" + ERROR_DIR + "\" if it exists; the files are analysed in worker processes")
+
+parser.add_option("--version", dest="version", action="store_true",
+                  help="display version and exit")
+
+
+
+def handle_logging(options: Values) -> None:
+    """Log handling and configuration"""
+
+    if options.verbose:
+        FORMAT = "%(levelname)-8s %(asctime)-15s %(message)s"
+        logging.basicConfig(level=logging.DEBUG, format=FORMAT)
+    elif options.quiet:
+        FORMAT = "%(levelname)-8s %(message)s"
+        logging.basicConfig(level=logging.ERROR, format=FORMAT)
+    else:
+        FORMAT = "%(levelname)-8s %(message)s"
+        logging.basicConfig(level=logging.INFO, format=FORMAT)
+
+
+def error_exit(errorcode: int, text: str) -> NoReturn:
+    """exits with return value of errorcode and prints to stderr"""
+
+    sys.stdout.flush()
+    logging.error(text)
+
+    sys.exit(errorcode)
+
+
+def import_fuzz() -> Any:
+    """
+    Returns the fuzz module of fuzzywuzzy which is imported on first use
+    only: most files are renamed without fuzzy comparisons.
+    """
+
+    try:
+        from fuzzywuzzy import fuzz  # for fuzzy comparison of strings
+    except ImportError:
+        print("Could not find Python module \"fuzzywuzzy\".\nPlease install it, e.g., with \"sudo pip install fuzzywuzzy\".")
+        sys.exit(1)
+    return fuzz
+
+
+# The components of a file name as returned by GuessFilename.split_filename_entities():
+# (date/time/duration, description, list of tags, extension)
+FilenameEntities = tuple[str | None, str, list[str], str | None]
+
+# The return type of a rule whose duration and hits RuleStatistics.call() records:
+RuleResult = TypeVar('RuleResult')
+
+# An entry of the dispatch index of GuessFilename.derive_new_filename_from_old_filename():
+# (rule name, dispatch prefix, regex, cues, bound rule method)
+FilenameRule = tuple[str, str, re.Pattern[str] | None, tuple[frozenset[str], ...], Callable[..., str | bool | None]]
+
+
+class CombinedRuleMatcher(object):
+    """
+    Matches a list of regular expressions with one single scan.
+
+    The patterns are compiled into one alternation with one capturing
+    group per branch which is tagged with the rule of the pattern. All
+    capturing groups of the original patterns are turned into
+    non-capturing ones, so the index of the matching group identifies
+    the first pattern matching the string. Since the alternation tries
+    its branches from left to right, this is the same result as trying
+    the patterns one after another.
+    """
+
+    def __init__(self, patterns: list[re.Pattern[str]], tags: list[int] | None = None) -> None:
+        if len({pattern.flags for pattern in patterns}) > 1:
+            raise ValueError('CombinedRuleMatcher requires patterns with identical flags')
+        self.patterns = patterns
+        self.tags = tags if tags is not None else list(range(len(patterns)))
+        self.covered = frozenset(self.tags)
+        branches = ['(' + self.get_noncapturing_pattern(pattern.pattern) + ')' for pattern in patterns]
+        self.combined = re.compile('|'.join(branches), patterns[0].flags) if patterns else None
+
+    @staticmethod
+    def supports(regex: re.Pattern[str]) -> bool:
+        """
+        Returns True if regex can be part of a CombinedRuleMatcher:
+        patterns with (inline) flags and back references to groups can
+        not be combined with other patterns.
+        """
+
+        return regex.flags == re.UNICODE and not re.search(r'\\[1-9]|\(\?P=', regex.pattern)
+
+    @staticmethod
+    def get_noncapturing_pattern(pattern: str) -> str:
+        """
+        Returns the pattern with all (named) capturing groups replaced by non-capturing groups.
+        """
+
+        result = []
+        position = 0
+        in_class = False
+        while position < len(pattern):
+            char = pattern[position]
+            if char == '\\':
+                result.append(pattern[position:position + 2])
+                position += 2
+                continue
+            if in_class:
+                if char == ']':
+                    in_class = False
+            elif char == '[':
+                in_class = True
+                # a closing bracket right after the opening one (or its negation) is a literal:
+                end = position + 1
+                if pattern[end:end + 1] == '^':
+                    end += 1
+                if pattern[end:end + 1] == ']':
+                    end += 1
+                result.append(pattern[position:end])
+                position = end
+                continue
+            elif char == '(':
+                if pattern.startswith('(?P<', position):
+                    result.append('(?:')
+                    position = pattern.index('>', position) + 1
+                    continue
+                if not pattern.startswith('(?', position):
+                    result.append('(?:')
+                    position += 1
+                    continue
+            result.append(char)
+            position += 1
+        return ''.join(result)
+
+    def match(self, string: str) -> int | None:
+        """
+        Returns the tag of the first pattern matching the beginning of string or None.
+        """
+
+        if not self.combined:
+            return None
+        components = self.combined.match(string)
+        if components:
+            assert components.lastindex
+            return self.tags[components.lastindex - 1]
+        return None
+
+
+class KeywordMatcher(object):
+    """
+    Finds all keywords of a list which are contained in a string.
+
+    The keywords are compiled into one alternation of literals, longest
+    keywords first. Each search of this alternation finds the next
+    position where a keyword starts with one single scan, so a string
+    without any keyword is scanned once. All shorter keywords which are
+    a prefix of the found keyword start at the same position: they are
+    taken from a table computed in advance. The next search starts
+    right after the found position, which finds overlapping keywords as
+    well.
+
+    Keywords starting with IGNORE_CASE are contained if they are part
+    of the lowercase string, just like "keyword in string.lower()".
+    They are found with a second alternation scanning the lowercase
+    string.
+    """
+
+    IGNORE_CASE = '(?i)'
+
+    def __init__(self, keywords: list[str]) -> None:
+        self.keywords = sorted(set(keywords))
+        self.cased, self.cased_implied = self.get_alternation(
+            {keyword: keyword for keyword in self.keywords if not keyword.startswith(self.IGNORE_CASE)})
+        self.folded, self.folded_implied = self.get_alternation(
+            {keyword: keyword[len(self.IGNORE_CASE):].lower() for keyword in self.keywords
+             if keyword.startswith(self.IGNORE_CASE)})
+
+    @staticmethod
+    def get_alternation(strings: dict[str, str]) -> tuple[re.Pattern[str] | None, dict[str, frozenset[str]]]:
+        """
+        Returns the alternation of the strings of keywords (longest
+        first) and a dict mapping each of these strings to the
+        keywords whose strings are a prefix of it.
+
+        @param strings: dict of keyword: string to search for
+        """
+
+        if not strings:
+            return None, {}
+        alternation = re.compile('|'.join(re.escape(string) for string in sorted(strings.values(), key=len, reverse=True)))
+        implied = {string: frozenset(keyword for keyword, other in strings.items() if string.startswith(other))
+                   for string in strings.values()}
+        return alternation, implied
+
+    @staticmethod
+    def scan(alternation: re.Pattern[str], implied: dict[str, frozenset[str]], string: str) -> set[str]:
+        found: set[str] = set()
+        position = 0
+        while position <= len(string):
+            components = alternation.search(string, position)
+            if not components:
+                break
+            found |= implied[components.group(0)]
+            position = components.start() + 1
+        return found
+
+    def find(self, string: str) -> frozenset[str]:
+        """
+        Returns the keywords contained in string.
+        """
+
+        found = self.scan(self.cased, self.cased_implied, string) if self.cased else set()
+        if self.folded:
+            found |= self.scan(self.folded, self.folded_implied, string.lower())
+        return frozenset(found)
+
+
+class FuzzyIndex(object):
+    """
+    Decides whether strings are similar to a part of one document like
+    "fuzz.partial_ratio(document, string) > threshold" with less work
+    per string. The results are identical to fuzz.partial_ratio() with
+    both backends of fuzzywuzzy: difflib and python-Levenshtein.
+
+    fuzz.partial_ratio() aligns the string with the whole document
+    (with difflib.SequenceMatcher or with the opcodes of
+    python-Levenshtein). Each block of the alignment determines a
+    window of the document whose ratio to the string is computed: the
+    highest one is the result.
+
+    Most strings of the content rules are not part of the document.
+    They are rejected without aligning them: for strings of up to
+    UPPER_BOUND_LENGTH characters, the partial_ratio() of rapidfuzz,
+    which python-Levenshtein is built on, is the highest ratio of all
+    windows of the document, an upper bound of the windows of
+    fuzz.partial_ratio() of both backends.
+
+    The other strings are aligned. With difflib, the index of the
+    positions of all characters of the document is built once and
+    windows whose quick_ratio() (an upper bound of their ratio) does
+    not exceed the threshold are skipped. With python-Levenshtein, its
+    functions are called without the SequenceMatcher-like wrapper of
+    fuzzywuzzy. Each window is verified once and the verification stops
+    with the first window exceeding the threshold.
+
+    Strings which are empty or not shorter than the document are
+    compared by fuzz.partial_ratio() itself.
+    """
+
+    # rapidfuzz checks all windows of the document for strings up to this length only:
+    UPPER_BOUND_LENGTH = 64
+
+    def __init__(self, document: str) -> None:
+        import difflib
+        self.difflib = difflib
+        self.fuzz = import_fuzz()
+        self.document = document
+        self.matcher = difflib.SequenceMatcher(None, '', document) \
+            if self.fuzz.SequenceMatcher is difflib.SequenceMatcher else None
+        self.levenshtein: Any = None
+        if not self.matcher:
+            import Levenshtein  # imported by fuzzywuzzy already when it does not use difflib
+            self.levenshtein = Levenshtein
+        try:
+            from rapidfuzz.fuzz import partial_ratio  # installed along with python-Levenshtein
+            self.upper_bound: Callable[..., float] | None = partial_ratio
+        except ImportError:
+            self.upper_bound = None
+        self.results: dict[tuple[str, int], bool] = {}
+
+    def is_similar(self, string: str, threshold: int = 64) -> bool:
+        """
+        Returns True if fuzz.partial_ratio(document, string) > threshold.
+        """
+
+        key = (string, threshold)
+        if key not in self.results:
+            if 0 < len(string) < len(self.document):
+                self.results[key] = self.has_similar_window(string, threshold)
+            else:
+                self.results[key] = self.fuzz.partial_ratio(self.document, string) > threshold
+        return self.results[key]
+
+    def has_similar_window(self, string: str, threshold: int) -> bool:
+        """
+        Returns True if one of the windows of fuzz.partial_ratio() has a ratio exceeding threshold.
+        """
+
+        if threshold >= 100:
+            return False  # the ratio of a window does not exceed 100
+        # a window exceeding threshold has a ratio of at least threshold + 0.5 before rounding:
+        if self.upper_bound and threshold >= 0 and len(string) <= self.UPPER_BOUND_LENGTH and \
+           not self.upper_bound(string, self.document, score_cutoff=threshold + .49):
+            return False
+
+        if self.matcher:
+            self.matcher.set_seq1(string)
+            blocks = self.matcher.get_matching_blocks()
+        else:
+            blocks = self.levenshtein.matching_blocks(self.levenshtein.opcodes(string, self.document),
+                                                      string, self.document)
+        starts = set()
+        for stringindex, documentindex, _ in blocks:
+            start = max(documentindex - stringindex, 0)
+            if start in starts:
+                continue
+            starts.add(start)
+            window = self.document[start:start + len(string)]
+            if self.matcher:
+                sequencematcher = self.difflib.SequenceMatcher(None, string, window)
+                if int(round(100 * sequencematcher.quick_ratio())) <= threshold:
+                    continue
+                ratio = sequencematcher.ratio()
+            else:
+                # the ratio is 0 below the cutoff which lets python-Levenshtein skip some of the work:
+                ratio = self.levenshtein.ratio(string, window, score_cutoff=max(threshold + .49, 0) / 100)
+            if ratio > .995 or int(round(100 * ratio)) > threshold:
+                return True
+        return False
+
+
+class TableRule(object):
+    """
+    A rule of the rule table which is loaded from RULE_TABLE_FILENAME
+    in the config directory. The rule table is a JSON list of objects
+    with the following keys:
+
+    - name: name of the rule (mandatory)
+    - source: "filename" (default) for rules which are tried after
+      the rules of OLD_FILENAME_RULES or "content" for rules which
+      are tried after the rules of derive_new_filename_from_content()
+    - pattern: regular expression which has to match the beginning of
+      the file name
+    - filename_contains: strings which have to be part of the file name
+    - content_contains: strings which have to be part of the PDF content
+    - content_fuzzy_contains: strings which have to be similar to a
+      part of the PDF content (see fuzzy_contains_all_of())
+    - config: names of the settings of guessfilenameconfig.py the rule
+      requires; the rule is ignored if one of them is missing
+    - charge: [before, after] strings to extract the €-charge of the
+      PDF content with get_euro_charge_from_context_or_basename()
+    - pages: number of pages of the PDF content the rule needs (1 or
+      2, the default): rules whose strings are on the first page only
+      do not cause the extraction of the second page (see PdfDocument)
+    - template: str.format() template of the new file name (mandatory)
+    - tags: tags which are added to the tags of the file name
+
+    The template may use the named groups of pattern, the settings of
+    config, charge and the fields datetimestr, date, description, tags
+    and extension. Templates containing datetimestr or date require the
+    file name to start with a date. The strings of filename_contains,
+    content_contains and content_fuzzy_contains may use the settings
+    of config. They are substituted once when the rule is compiled.
+    """
+
+    SOURCES = ['filename', 'content']
+    KEYS = ['name', 'source', 'pattern', 'filename_contains', 'content_contains',
+            'content_fuzzy_contains', 'config', 'charge', 'pages', 'template', 'tags']
+    FIELDS = ['datetimestr', 'date', 'description', 'tags', 'extension']
+
+    def __init__(self, definition: dict[str, Any], config: Any) -> None:
+        if not isinstance(definition, dict):
+            raise ValueError('rule has to be a JSON object: ' + repr(definition))
+        for key in definition:
+            if key not in self.KEYS:
+                raise ValueError('rule ' + repr(definition.get('name')) + ' has unknown key: ' + key)
+        if not isinstance(definition.get('name'), str) or not isinstance(definition.get('template'), str):
+            raise ValueError('rule needs a name and a template: ' + repr(definition))
+
+        self.name: str = definition['name']
+        self.source: str = definition.get('source', 'filename')
+        if self.source not in self.SOURCES:
+            raise ValueError('rule ' + self.name + ' has unknown source: ' + repr(self.source))
+
+        self.config_keys: list[str] = self.get_string_list(definition, 'config')
+        self.missing_config = [key for key in self.config_keys if not hasattr(config, key)]
+        config_values = {} if self.missing_config else {key: str(getattr(config, key)) for key in self.config_keys}
+        self.config_values: dict[str, str] = config_values
+
+        try:
+            self.regex: re.Pattern[str] | None = re.compile(definition['pattern'], re.UNICODE) \
+                if definition.get('pattern') else None
+        except re.error as e:
+            raise ValueError('rule ' + self.name + ' has an invalid pattern: ' + str(e))
+        if self.source == 'filename' and not self.regex and 'filename_contains' not in definition:
+            raise ValueError('rule ' + self.name + ' needs a pattern or filename_contains')
+
+        self.filename_contains = [entry.format(**config_values) for entry in self.get_string_list(definition, 'filename_contains')]
+        self.content_contains = [entry.format(**config_values) for entry in self.get_string_list(definition, 'content_contains')]
+        self.content_fuzzy_contains = [entry.format(**config_values)
+                                       for entry in self.get_string_list(definition, 'content_fuzzy_contains')]
+        if self.source == 'filename' and (self.content_contains or self.content_fuzzy_contains or 'charge' in definition or
+                                          'pages' in definition):
+            raise ValueError('rule ' + self.name + ' uses the PDF content but its source is not "content"')
+
+        self.charge: list[str] = self.get_string_list(definition, 'charge')
+        if self.charge and len(self.charge) != 2:
+            raise ValueError('rule ' + self.name + ' needs a charge of [before, after]')
+        self.pages: int = definition.get('pages', PdfDocument.MAX_PAGES)
+        if self.pages not in range(1, PdfDocument.MAX_PAGES + 1) or isinstance(self.pages, bool):
+            raise ValueError('rule ' + self.name + ' needs pages from 1 to ' + str(PdfDocument.MAX_PAGES))
+
+        self.template: str = definition['template']
+        self.tags: list[str] = self.get_string_list(definition, 'tags')
+        known_fields = self.FIELDS + self.config_keys + (list(self.regex.groupindex) if self.regex else []) + \
+            (['charge'] if self.charge else [])
+        fields = set()
+        for _, field, _, _ in Formatter().parse(self.template):
+            if field is not None:
+                fields.add(re.match(r'\w*', field).group(0))  # type: ignore[union-attr]
+        for field in fields:
+            if field not in known_fields:
+                raise ValueError('rule ' + self.name + ' has unknown template field: ' + repr(field))
+        self.requires_datetimestr = 'datetimestr' in fields or 'date' in fields
+
+    def get_string_list(self, definition: dict[str, Any], key: str) -> list[str]:
+        """
+        Returns the list of strings of definition[key] or an empty list.
+        """
+
+        value = definition.get(key, [])
+        if not isinstance(value, list) or not all(isinstance(entry, str) for entry in value):
+            raise ValueError('rule ' + self.name + ' needs a list of strings for ' + key)
+        return value
+
+    def get_dispatch_prefix(self) -> str | None:
+        """
+        Returns the dispatch prefix for the index of
+        GuessFilename.build_old_filename_rule_index(): the literal
+        string every file name matching the pattern starts with,
+        r'\\d' for patterns starting with a digit or None.
+        """
+
+        if not self.regex or '|' in self.regex.pattern:
+            return None
+        pattern = self.regex.pattern
+        optional = re.compile(r'[?*]|\{0*[,}]')  # quantifiers allowing zero repetitions
+        if pattern.startswith(r'\d'):
+            return None if optional.match(pattern, 2) else r'\d'
+        prefix = ''
+        for char in pattern:
+            if char in '.^$*+?{}[]|()\\':
+                break
+            prefix += char
+        if optional.match(pattern, len(prefix)):
+            prefix = prefix[:-1]  # the last character is optional
+        return prefix or None
+
+
+class RuleStatistics(object):
+    """
+    Records the attempts, hits and durations of the rules of GuessFilename.
+
+    The rules are identified by "filename/<rule name>" and
+    "content/<rule name>" for the rules of
+    derive_new_filename_from_old_filename() and
+    derive_new_filename_from_content(). The whole methods are recorded
+    as "pixel_files", "filename", "content" (including the extraction
+    of the PDF content) and "json_metadata". Only rules which are
+    actually called are counted: rules skipped by the dispatch index,
+    by their cues or by their regex are no attempts.
+    """
+
+    def __init__(self) -> None:
+        self.durations: dict[str, list[float]] = {}
+        self.hits: dict[str, int] = {}
+
+    def call(self, rulename: str, rule: Callable[..., RuleResult], *args: Any) -> RuleResult:
+        """
+        Returns rule(*args) and records its duration and whether it returned a new file name.
+        """
+
+        start = time.perf_counter()
+        hit = False
+        try:
+            result = rule(*args)
+            hit = bool(result)
+        finally:
+            self.durations.setdefault(rulename, []).append(time.perf_counter() - start)
+            if hit:
+                self.hits[rulename] = self.hits.get(rulename, 0) + 1
+        return result
+
+    def merge(self, other: RuleStatistics) -> None:
+        """
+        Adds the durations and hits recorded by other, e.g., by a worker process of --jobs.
+        """
+
+        for rulename, durations in other.durations.items():
+            self.durations.setdefault(rulename, []).extend(durations)
+        for rulename, hits in other.hits.items():
+            self.hits[rulename] = self.hits.get(rulename, 0) + hits
+
+    def get_percentile(self, durations: list[float], percentile: int) -> float:
+        """
+        Returns the percentile of the sorted list of durations (nearest rank).
+        """
+
+        return durations[max(0, -(-len(durations) * percentile // 100) - 1)]
+
+    def get_rows(self) -> list[dict[str, Any]]:
+        """
+        Returns one dict per rule ordered by the cumulative duration; durations in milliseconds.
+        """
+
+        rows = []
+        for rulename, durations in self.durations.items():
+            durations = sorted(durations)
+            rows.append({'rule': rulename,
+                         'attempts': len(durations),
+                         'hits': self.hits.get(rulename, 0),
+                         'total_ms': sum(durations) * 1000,
+                         'p50_ms': self.get_percentile(durations, 50) * 1000,
+                         'p99_ms': self.get_percentile(durations, 99) * 1000})
+        return sorted(rows, key=lambda row: row['total_ms'], reverse=True)
+
+    def get_table(self) -> str:
+        """
+        Returns the statistics as a plain text table.
+        """
+
+        width = max([len(row['rule']) for row in self.get_rows()] + [4])
+        lines = ['%-*s %9s %9s %12s %10s %10s' % (width, 'rule', 'attempts', 'hits', 'total ms', 'p50 ms', 'p99 ms')]
+        for row in self.get_rows():
+            lines.append('%-*s %9i %9i %12.3f %10.3f %10.3f' % (width, row['rule'], row['attempts'], row['hits'],
+                                                               row['total_ms'], row['p50_ms'], row['p99_ms']))
+        return '\n'.join(lines)
+
+    def write_json(self, filename: str) -> None:
+        """
+        Writes the rows of get_rows() to filename.
+        """
+
+        with open(filename, 'w', encoding='utf-8') as statsfile:
+            json.dump(self.get_rows(), statsfile, indent=2)
+
+
+class FileCache(object):
+    """
+    The base class of the SQLite databases storing data of files for
+    further runs, so that the files are not parsed again.
+
+    The data is stored per file, identified by the device, the inode,
+    the size and the modification time of the file. Renaming a file
+    within a file system keeps its entry. When the data of all entries
+    exceeds max_bytes, the least recently used entries are removed.
+
+    Each subclass has its own database with the TABLE of its SCHEMA
+    which has the columns "bytes" and "used" for removing entries.
+    """
+
+    DESCRIPTION = ''  # the stored data for messages
+    TABLE = ''
+    SCHEMA_VERSION = 1  # databases with another version are emptied
+    SCHEMA: list[str] = []
+
+    def __init__(self, filename: str, max_bytes: int) -> None:
+        self.filename = filename
+        self.max_bytes = max_bytes
+        self.connection: Any = None
+        self.failed = False
+
+    def get_connection(self) -> Any:
+        """
+        Returns the connection to the database which is opened (and
+        created) on first use or None if this is not possible: then the
+        files are parsed without cache.
+        """
+
+        if self.connection or self.failed:
+            return self.connection
+        import sqlite3  # imported on first use only: most invocations do not parse files
+        try:
+            if os.path.dirname(self.filename):
+                os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+            connection = sqlite3.connect(self.filename, timeout=10)
+            connection.execute('PRAGMA journal_mode=WAL')  # other processes may read while one is writing
+            with connection:
+                if connection.execute('PRAGMA user_version').fetchone()[0] != self.SCHEMA_VERSION:
+                    connection.execute('DROP TABLE IF EXISTS ' + self.TABLE)
+                    connection.execute('PRAGMA user_version = %i' % self.SCHEMA_VERSION)
+                for statement in self.SCHEMA:
+                    connection.execute(statement)
+        except (OSError, sqlite3.Error) as e:
+            logging.warning('Could not open the cache of ' + self.DESCRIPTION + ' "' + self.filename +
+                            '", not using it: ' + str(e))
+            self.failed = True
+            return None
+        self.connection = connection
+        return connection
+
+    def get_key(self, filename: str) -> tuple[int, int, int, int]:
+        """
+        Returns (device, inode, size, modification time in ns) of filename.
+        """
+
+        stat = os.stat(filename)
+        return (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+    def remove_least_recently_used(self, connection: Any) -> None:
+        """
+        Removes the least recently used entries exceeding max_bytes within the transaction of connection.
+        """
+
+        connection.execute('DELETE FROM ' + self.TABLE + ' WHERE rowid IN (SELECT rowid FROM (SELECT rowid, ' +
+                           'SUM(bytes) OVER (ORDER BY used DESC, rowid DESC) AS total FROM ' + self.TABLE +
+                           ') WHERE total > ?)', (self.max_bytes,))
+
+    def close(self) -> None:
+        if self.connection:
+            self.connection.close()
+            self.connection = None
+
+
+class PdfTextCache(FileCache):
+    """
+    An SQLite database of the page texts extracted from PDF files by
+    derive_new_filename_from_content(), so that files which are
+    analysed again (e.g., files left in ERROR_DIR) are not parsed again.
+
+    With hash_content, the SHA-256 of the file content is stored as
+    well: it has to match for using an entry and it finds the entry of
+    a file which was copied or modified without changing its content.
+
+    Pages which were not extracted by PdfDocument yet are stored as
+    None. The texts of each PDF backend (see
+    GuessFilename.PDF_BACKENDS) are stored separately.
+    """
+
+    DESCRIPTION = 'PDF texts'
+    TABLE = 'pdftext'
+    SCHEMA_VERSION = 2
+    SCHEMA = [
+        'CREATE TABLE IF NOT EXISTS pdftext (backend TEXT NOT NULL, dev INTEGER NOT NULL, ino INTEGER NOT NULL, ' +
+        'size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, sha256 TEXT, pages TEXT NOT NULL, bytes INTEGER NOT NULL, ' +
+        'used INTEGER NOT NULL, PRIMARY KEY (backend, dev, ino, size, mtime_ns))',
+        'CREATE INDEX IF NOT EXISTS pdftext_sha256 ON pdftext (sha256)',
+        'CREATE INDEX IF NOT EXISTS pdftext_used ON pdftext (used)',
+    ]
+
+    def __init__(self, filename: str, max_bytes: int = 64 * 1024 * 1024, hash_content: bool = False,
+                 backend: str = 'pypdf') -> None:
+        FileCache.__init__(self, filename, max_bytes)
+        self.hash_content = hash_content
+        self.backend = backend
+
+    def get_sha256(self, filename: str) -> str | None:
+        """
+        Returns the SHA-256 of the content of filename if hash_content is set or None.
+        """
+
+        if not self.hash_content:
+            return None
+        import hashlib
+        with open(filename, 'rb') as pdffile:
+            return hashlib.file_digest(pdffile, 'sha256').hexdigest()
+
+    def get(self, filename: str) -> list[str | None] | None:
+        """
+        Returns the stored page texts of filename or None.
+        """
+
+        connection = self.get_connection()
+        if not connection:
+            return None
+        key = self.get_key(filename)
+        sha256 = self.get_sha256(filename)
+        row = connection.execute('SELECT rowid, sha256, pages FROM pdftext WHERE backend = ? AND dev = ? AND ino = ? AND ' +
+                                 'size = ? AND mtime_ns = ?', (self.backend,) + key).fetchone()
+        if row and sha256 and row[1] != sha256:
+            row = None
+        if not row and sha256:
+            row = connection.execute('SELECT rowid, sha256, pages FROM pdftext WHERE backend = ? AND sha256 = ?',
+                                     (self.backend, sha256)).fetchone()
+        if not row:
+            logging.debug('PdfTextCache: no entry for ' + filename)
+            return None
+        with connection:
+            connection.execute('UPDATE pdftext SET used = ? WHERE rowid = ?', (time.time_ns(), row[0]))
+        logging.debug('PdfTextCache: using the stored page texts of ' + filename)
+        pages: list[str | None] = json.loads(row[2])
+        return pages
+
+    def put(self, filename: str, pages: list[str | None]) -> None:
+        """
+        Stores the page texts of filename and removes the least recently used entries exceeding max_bytes.
+        """
+
+        connection = self.get_connection()
+        if not connection:
+            return
+        key = self.get_key(filename)
+        text = json.dumps(pages)
+        with connection:
+            # an older entry of the same file is outdated:
+            connection.execute('DELETE FROM pdftext WHERE backend = ? AND dev = ? AND ino = ?', (self.backend,) + key[:2])
+            connection.execute('INSERT INTO pdftext VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                               (self.backend,) + key + (self.get_sha256(filename), text, len(text.encode('utf-8')),
+                                                        time.time_ns()))
+            self.remove_least_recently_used(connection)
+
+
+class PixelMetadataCache(FileCache):
+    """
+    An SQLite database of the meta-data of Google Pixel camera files
+    (the tags of GuessFilename.PIXEL_METADATA_TAGS), so that files which
+    are renamed again (e.g., files left in ERROR_DIR) are not read by
+    PixelMetadataReader or exiftool again.
+    """
+
+    DESCRIPTION = 'Exif meta-data'
+    TABLE = 'pixelmetadata'
+    SCHEMA = [
+        'CREATE TABLE IF NOT EXISTS pixelmetadata (dev INTEGER NOT NULL, ino INTEGER NOT NULL, size INTEGER NOT NULL, ' +
+        'mtime_ns INTEGER NOT NULL, metadata TEXT NOT NULL, bytes INTEGER NOT NULL, used INTEGER NOT NULL, ' +
+        'PRIMARY KEY (dev, ino, size, mtime_ns))',
+        'CREATE INDEX IF NOT EXISTS pixelmetadata_used ON pixelmetadata (used)',
+    ]
+
+    def __init__(self, filename: str, max_bytes: int = 8 * 1024 * 1024) -> None:
+        FileCache.__init__(self, filename, max_bytes)
+
+    def get(self, filenames: list[str]) -> dict[str, dict[str, Any]]:
+        """
+        Returns the stored meta-data of those filenames which have an
+        entry. Its "SourceFile" is the file name of filenames.
+        """
+
+        connection = self.get_connection()
+        if not connection:
+            return {}
+        found: dict[str, dict[str, Any]] = {}
+        rowids = []
+        for filename in filenames:
+            try:
+                key = self.get_key(filename)
+            except OSError:
+                continue
+            row = connection.execute('SELECT rowid, metadata FROM pixelmetadata WHERE dev = ? AND ino = ? AND size = ? ' +
+                                     'AND mtime_ns = ?', key).fetchone()
+            if row:
+                rowids.append(row[0])
+                found[filename] = dict(json.loads(row[1]), SourceFile=filename)
+        if rowids:
+            now = time.time_ns()
+            with connection:
+                connection.executemany('UPDATE pixelmetadata SET used = ? WHERE rowid = ?', [(now, rowid) for rowid in rowids])
+        logging.debug('PixelMetadataCache: using the stored meta-data of %i of %i files' % (len(found), len(filenames)))
+        return found
+
+    def put(self, metadata: list[dict[str, Any]]) -> None:
+        """
+        Stores the meta-data of the files of its "SourceFile" and
+        removes the least recently used entries exceeding max_bytes.
+        """
+
+        connection = self.get_connection()
+        if not connection or not metadata:
+            return
+        rows = []
+        now = time.time_ns()
+        for entry in metadata:
+            try:
+                key = self.get_key(entry['SourceFile'])
+            except OSError:
+                continue
+            text = json.dumps({tag: value for tag, value in entry.items() if tag != 'SourceFile'})
+            rows.append(key + (text, len(text.encode('utf-8')), now))
+        with connection:
+            # older entries of the same files are outdated:
+            connection.executemany('DELETE FROM pixelmetadata WHERE dev = ? AND ino = ?', [row[:2] for row in rows])
+            connection.executemany('INSERT OR REPLACE INTO pixelmetadata VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+            self.remove_least_recently_used(connection)
+
+
+class PdfDocument(object):
+    """
+    The text of the first MAX_PAGES pages of a PDF file for the rules
+    of derive_new_filename_from_content(). The file is opened when a
+    rule asks for its text for the first time and each page is
+    extracted when a rule asks for it: rules checking the file name
+    first do not open files of other senders and rules which need the
+    first page only (get_text(1)) do not extract the second page.
+
+    The extracted pages are stored in the PdfTextCache by close().
+    """
+
+    MAX_PAGES = 2  # the content rules analyse the first and second page only
+
+    def __init__(self, filename: str, open_pdf: Callable[[str], Any], cache: PdfTextCache | None = None) -> None:
+        self.filename = filename
+        self.open_pdf = open_pdf
+        self.cache = cache
+        self.reader: Any = None
+        self.pages: list[str | None] | None = None  # one entry per page, None for pages not extracted yet
+        self.texts: dict[int, str] = {}  # the results of get_text() by number of pages
+        self.modified = False
+        self.stage = ''  # the running step for messages about exceeded budgets (see ContentBudgetException)
+
+    def get_reader(self) -> Any:
+        """
+        Returns the pypdf.PdfReader of the file which is opened on first use.
+        """
+
+        if self.reader is None:
+            self.stage = 'opening the PDF file'
+            self.reader = self.open_pdf(self.filename)
+            if self.reader is None:
+                raise NoPdfContentException(self.filename)
+            self.stage = ''
+        return self.reader
+
+    def get_pages(self) -> list[str | None]:
+        """
+        Returns the page list from the cache or with the number of pages of the file.
+        """
+
+        if self.pages is None:
+            pages = self.cache.get(self.filename) if self.cache else None
+            if pages is None:
+                pages = [None] * min(len(self.get_reader().pages), self.MAX_PAGES)
+            self.pages = pages
+        return self.pages
+
+    def get_page(self, number: int) -> str:
+        """
+        Returns the text of the page with the index number which is extracted on first use.
+        """
+
+        pages = self.get_pages()
+        page = pages[number]
+        if page is None:
+            logging.debug('PdfDocument: extracting page %i of %s' % (number + 1, self.filename))
+            reader = self.get_reader()
+            self.stage = 'extracting page %i' % (number + 1)
+            page = pages[number] = reader.pages[number].extract_text()
+            self.stage = ''
+            self.modified = True
+        return page
+
+    def get_text(self, pages: int = MAX_PAGES) -> str:
+        """
+        Returns the text of the first pages of the file. If the text
+        of all of its first MAX_PAGES pages is empty, a
+        NoPdfContentException is raised to skip the content analysis.
+
+        @param pages: number of pages from the first one which are needed by the rule
+        @param return: the joined texts of the pages
+        """
+
+        if pages not in self.texts:
+            numbers = range(min(pages, len(self.get_pages())))
+            text = ''.join([self.get_page(number) for number in numbers])
+            if not text and not ''.join([self.get_page(number) for number in range(len(self.get_pages()))]):
+                logging.info('Could read PDF file content but it is empty (skipping content analysis)')
+                raise NoPdfContentException(self.filename)
+            self.texts[pages] = text
+        return self.texts[pages]
+
+    def close(self) -> None:
+        """
+        Stores the extracted pages in the cache if pages were extracted.
+        """
+
+        if self.modified and self.cache and self.pages is not None:
+            stage, self.stage = self.stage, 'storing the texts in the cache'
+            self.cache.put(self.filename, self.pages)
+            self.stage = stage
+        self.modified = False
+
+
+class PdftotextReader(object):
+    """
+    The pages of a PDF file for the PDF backend "pdftotext" (see
+    GuessFilename.open_pdf_with_pdftotext()): like pypdf.PdfReader, it
+    has the list pages whose entries extract their text with
+    extract_text(), here by running the command "pdftotext" for the
+    page.
+    """
+
+    def __init__(self, filename: str, page_count: int, password: list[str]) -> None:
+        self.pages = [PdftotextPage(filename, number, password) for number in range(page_count)]
+
+
+class PdftotextPage(object):
+    """
+    A page of PdftotextReader.
+    """
+
+    def __init__(self, filename: str, number: int, password: list[str]) -> None:
+        self.filename = filename
+        self.number = number
+        self.password = password
+
+    def extract_text(self) -> str:
+        """
+        Returns the text of the page extracted by pdftotext without the form feed ending each page.
+        """
+
+        import subprocess
+        page = str(self.number + 1)
+        output = subprocess.run(['pdftotext', '-f', page, '-l', page, '-enc', 'UTF-8'] + self.password +
+                                [self.filename, '-'], capture_output=True, check=True).stdout
+        text: str = output.decode('utf-8', errors='replace')
+        return text[:-1] if text.endswith('\f') else text
+
+
+class PixelMetadataReader(object):
+    """
+    Reads the tags of GuessFilename.PIXEL_METADATA_TAGS from the files
+    of Google Pixel cameras without exiftool: the XMP tags of JPEG
+    files are taken from their APP1 segments and the QuickTime tags of
+    MP4 files from the boxes of their "moov" box. The file is mapped to
+    memory and only these headers are read, not the image or video
+    data.
+
+    The tags have the names and values exiftool returns with
+    ExifToolHelper: XMP structures are flattened like
+    "XMP:CamerasDepthMapNear" and numbers are converted. read() returns
+    None for files it does not understand: they are read by exiftool.
+    """
+
+    JPEG_MAGIC = b'\xff\xd8\xff'
+    XMP_HEADER = b'http://ns.adobe.com/xap/1.0/\x00'
+    EXTENDED_XMP_HEADER = b'http://ns.adobe.com/xmp/extension/\x00'
+    RDF_NAMESPACE = '{http://www.w3.org/1999/02/22-rdf-syntax-ns#}'
+    XML_NAMESPACE = '{http://www.w3.org/XML/1998/namespace}'
+
+    MP4_BRANDS = [b'isom', b'iso2', b'mp41', b'mp42', b'avc1']  # major brands exiftool reports as file type "MP4"
+    MP4_CONTAINER_BOXES = [b'moov', b'trak', b'mdia', b'minf', b'stbl', b'udta']
+    MP4_CAPTURE_FPS_KEY = 'com.android.capture.fps'
+
+    @classmethod
+    def read(cls, filename: str) -> dict[str, Any] | None:
+        """
+        Returns the meta-data of filename like exiftool or None if the
+        file is no JPEG or MP4 file or its headers can not be parsed.
+        """
+
+        try:
+            with open(filename, 'rb') as mediafile:
+                with mmap.mmap(mediafile.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    if data[:3] == cls.JPEG_MAGIC:
+                        metadata = cls.read_jpeg(data)
+                    elif data[4:8] == b'ftyp' and data[8:12] in cls.MP4_BRANDS:
+                        metadata = cls.read_mp4(data)
+                    else:
+                        return None
+                modified = datetime.datetime.fromtimestamp(os.fstat(mediafile.fileno()).st_mtime).astimezone()
+        except (OSError, ValueError, IndexError, struct.error, SyntaxError) as e:
+            # SyntaxError is the base class of xml.etree.ElementTree.ParseError
+            logging.debug('PixelMetadataReader: could not read ' + filename + ': ' + str(e))
+            return None
+        metadata['SourceFile'] = filename
+        metadata['File:FileModifyDate'] = modified.strftime('%Y:%m:%d %H:%M:%S') + \
+            modified.replace(microsecond=0).isoformat()[19:]
+        return metadata
+
+    @classmethod
+    def read_jpeg(cls, data: mmap.mmap) -> dict[str, Any]:
+        """
+        Returns the XMP tags of the APP1 segments before the image data of a JPEG file.
+        """
+
+        metadata: dict[str, Any] = {'File:FileType': 'JPEG'}
+        packets = []
+        extended: dict[int, bytes] = {}  # the chunks of the extended XMP by their offset
+        position = 2
+        while position + 4 <= len(data):
+            marker, length = struct.unpack_from('>BH', data, position + 1) if data[position] == 0xff else (None, 0)
+            if marker is None or marker in [0xd9, 0xda]:  # no marker, end of image or start of scan
+                break
+            segment = data[position + 4:position + 2 + length]
+            if marker == 0xe1 and segment.startswith(cls.XMP_HEADER):
+                packets.append(segment[len(cls.XMP_HEADER):])
+            elif marker == 0xe1 and segment.startswith(cls.EXTENDED_XMP_HEADER):
+                # GUID (32 bytes), full length and offset of the chunk (4 bytes each):
+                offset = struct.unpack_from('>I', segment, len(cls.EXTENDED_XMP_HEADER) + 36)[0]
+                extended[offset] = segment[len(cls.EXTENDED_XMP_HEADER) + 40:]
+            position += 2 + length
+        if extended:
+            packets.append(b''.join([extended[offset] for offset in sorted(extended)]))
+        for packet in packets:
+            cls.read_xmp(packet, metadata)
+        return metadata
+
+    @classmethod
+    def read_xmp(cls, packet: bytes, metadata: dict[str, Any]) -> None:
+        """
+        Adds the properties of the XMP packet to metadata. The names of
+        nested properties are joined like exiftool does: list items
+        named like the singular of their list are left out, e.g.,
+        Cameras/Camera/DepthMap/Near is "XMP:CamerasDepthMapNear".
+        """
+
+        import xml.etree.ElementTree as ElementTree  # imported on first use only: most invocations do not read XMP
+        for rdf in ElementTree.fromstring(packet).iter(cls.RDF_NAMESPACE + 'RDF'):
+            cls.read_xmp_element(rdf, [], metadata)
+
+    @classmethod
+    def read_xmp_element(cls, element: Any, path: list[str], metadata: dict[str, Any]) -> None:
+        """
+        Adds the attributes and the text of element and its children to
+        metadata. RDF elements like rdf:Description or rdf:li do not add
+        to the path of property names.
+        """
+
+        for name, value in element.attrib.items():
+            if not name.startswith(cls.RDF_NAMESPACE) and not name.startswith(cls.XML_NAMESPACE):
+                metadata.setdefault(cls.get_xmp_tag(path + [name]), cls.get_value(value))
+        if path and len(element) == 0 and element.text and element.text.strip():
+            metadata.setdefault(cls.get_xmp_tag(path), cls.get_value(element.text.strip()))
+        for child in element:
+            if isinstance(child.tag, str):  # no comment or processing instruction
+                cls.read_xmp_element(child, path if child.tag.startswith(cls.RDF_NAMESPACE) else path + [child.tag],
+                                     metadata)
+
+    @staticmethod
+    def get_xmp_tag(path: list[str]) -> str:
+        """
+        Returns the exiftool tag name of the path of XMP element names in Clark notation.
+        """
+
+        names: list[str] = []
+        for name in [name.rpartition('}')[2] for name in path]:
+            if not names or names[-1] != name + 's':
+                names.append(name[:1].upper() + name[1:])
+        return 'XMP:' + ''.join(names)
+
+    @staticmethod
+    def get_value(value: str) -> Any:
+        """
+        Returns value as int or float if it is a number like exiftool -n does.
+        """
+
+        for number in [int, float]:
+            try:
+                return number(value)
+            except ValueError:
+                pass
+        return value
+
+    @classmethod
+    def get_boxes(cls, data: mmap.mmap, start: int, end: int) -> Iterator[tuple[bytes, int, int]]:
+        """
+        Yields the type, the start of the content and the end of the boxes of an MP4 file between start and end.
+        """
+
+        position = start
+        while position + 8 <= end:
+            size, boxtype = struct.unpack_from('>I4s', data, position)
+            header = 8
+            if size == 1:
+                size = struct.unpack_from('>Q', data, position + 8)[0]
+                header = 16
+            elif size == 0:
+                size = end - position
+            if size < header or position + size > end:
+                raise ValueError('invalid size of MP4 box "%s" at %i' % (boxtype.decode('latin-1'), position))
+            yield boxtype, position + header, position + size
+            position += size
+
+    @classmethod
+    def read_mp4(cls, data: mmap.mmap) -> dict[str, Any]:
+        """
+        Returns the QuickTime tags of the "moov" box of an MP4 file: the
+        AudioChannels of its sound track and the Android capture rate of
+        its "meta" box with "keys" and "ilst". The "mdat" boxes with the
+        media data are skipped.
+        """
+
+        metadata: dict[str, Any] = {'File:FileType': 'MP4'}
+        for boxtype, start, end in cls.get_boxes(data, 0, len(data)):
+            if boxtype == b'moov':
+                cls.read_mp4_boxes(data, start, end, metadata)
+        return metadata
+
+    @classmethod
+    def read_mp4_boxes(cls, data: mmap.mmap, start: int, end: int, metadata: dict[str, Any],
+                       handler: bytes | None = None) -> None:
+        """
+        Adds the tags of the boxes between start and end to metadata.
+
+        @param handler: the handler type of the track of the boxes like "soun" or "vide"
+        """
+
+        boxes = list(cls.get_boxes(data, start, end))
+        for boxtype, boxstart, boxend in boxes:
+            if boxtype == b'hdlr':
+                handler = data[boxstart + 8:boxstart + 12]  # after version, flags and pre_defined
+        for boxtype, boxstart, boxend in boxes:
+            if boxtype in cls.MP4_CONTAINER_BOXES:
+                cls.read_mp4_boxes(data, boxstart, boxend, metadata, handler)
+            elif boxtype == b'stsd' and handler == b'soun' and 'QuickTime:AudioChannels' not in metadata:
+                # the channel count of the first sample description (see ISO/IEC 14496-12):
+                metadata['QuickTime:AudioChannels'] = struct.unpack_from('>H', data, boxstart + 8 + 24)[0]
+            elif boxtype == b'meta':
+                # the meta box of QuickTime has no version and flags like the one of ISO/IEC 14496-12:
+                if data[boxstart + 4:boxstart + 8] != b'hdlr':
+                    boxstart += 4
+                cls.read_mp4_keys(data, boxstart, boxend, metadata)
+
+    @classmethod
+    def read_mp4_keys(cls, data: mmap.mmap, start: int, end: int, metadata: dict[str, Any]) -> None:
+        """
+        Adds the Android capture rate of the "keys" and "ilst" boxes of a "meta" box to metadata.
+        """
+
+        keys: list[str] = []
+        for boxtype, boxstart, boxend in cls.get_boxes(data, start, end):
+            if boxtype == b'keys':
+                position = boxstart + 8  # after version, flags and the number of keys
+                while position + 8 <= boxend:
+                    size = struct.unpack_from('>I', data, position)[0]
+                    if size < 8:
+                        raise ValueError('invalid size of MP4 key at %i' % position)
+                    keys.append(data[position + 8:position + size].decode('utf-8', errors='replace'))
+                    position += size
+            elif boxtype == b'ilst':
+                for index, itemstart, itemend in cls.get_boxes(data, boxstart, boxend):
+                    number = struct.unpack('>I', index)[0]
+                    if not 0 < number <= len(keys) or keys[number - 1] != cls.MP4_CAPTURE_FPS_KEY:
+                        continue
+                    for datatype, datastart, dataend in cls.get_boxes(data, itemstart, itemend):
+                        if datatype == b'data':
+                            metadata['QuickTime:ComAndroidCaptureFps'] = cls.get_mp4_value(
+                                struct.unpack_from('>I', data, datastart)[0] & 0xffffff, data[datastart + 8:dataend])
+
+    @staticmethod
+    def get_mp4_value(datatype: int, value: bytes) -> Any:
+        """
+        Returns the value of an MP4 "data" box with one of the well-known types of QuickTime.
+        """
+
+        if datatype == 23 and len(value) == 4:
+            return struct.unpack('>f', value)[0]
+        if datatype == 24 and len(value) == 8:
+            return struct.unpack('>d', value)[0]
+        if datatype in [21, 22] and len(value) in [1, 2, 4, 8]:
+            return int.from_bytes(value, 'big', signed=datatype == 21)
+        return value.decode('utf-8', errors='replace')
+
+
+class JsonKeyReader(object):
+    """
+    Reads the values of a few keys of the top-level object of a JSON
+    stream like the .info.json files of youtube-dl and yt-dlp without
+    holding all of it in memory: the values of other keys like the
+    large lists "formats", "thumbnails" or "subtitles" are decoded and
+    dropped element by element (see skip()) and reading stops as soon
+    as all keys are found or the caller needs no further keys (see
+    read()). The stream is read in chunks of CHUNK_SIZE characters.
+
+    Since the skipped values are decoded by the C scanner of the json
+    module as well, reading is not faster than json.load() unless it
+    stops early.
+    """
+
+    CHUNK_SIZE = 64 * 1024
+    WHITESPACE_REGEX = re.compile(r'[ \t\n\r]*')
+    SCALAR_REGEX = re.compile(r'[^,:\[\]{}" \t\n\r]*')  # numbers, true, false and null
+
+    def __init__(self, stream: TextIO) -> None:
+        self.stream = stream
+        self.text = ''  # the read characters from the last chunk whose value was not parsed yet
+        self.position = 0  # the parsed characters of text
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def read(self, keys: Iterable[str], complete: Callable[[dict[str, Any]], bool] | None = None) -> dict[str, Any]:
+        """
+        Returns the values of those keys the top-level object has. If
+        the JSON value is no object, an empty dict is returned. Invalid
+        JSON raises json.JSONDecodeError as far as it is read.
+
+        @param complete: optional function returning True for the values
+                         read so far when the caller needs no further
+                         keys: reading stops before the end of the object
+        """
+
+        missing = set(keys)
+        values: dict[str, Any] = {}
+        if self.peek() != '{':
+            return values
+        self.position += 1
+        if self.peek() == '}':
+            return values
+        while missing:
+            if self.peek() != '"':
+                raise json.JSONDecodeError('Expecting property name enclosed in double quotes', self.text, self.position)
+            key = self.decode()
+            self.expect(':')
+            self.peek()
+            if key in missing:
+                values[key] = self.decode()
+                missing.discard(key)
+                if complete and complete(values):
+                    break
+            else:
+                self.skip()
+            if self.peek() == '}':
+                break
+            self.expect(',')
+        return values
+
+    def fill(self) -> bool:
+        """
+        Appends the next chunk of the stream to text without its parsed
+        characters. Returns False at the end of the stream.
+        """
+
+        if self.eof:
+            return False
+        chunk = self.stream.read(self.CHUNK_SIZE)
+        if not chunk:
+            self.eof = True
+            return False
+        self.text = self.text[self.position:] + chunk
+        self.position = 0
+        return True
+
+    def peek(self) -> str:
+        """
+        Returns the next character after white space or '' at the end of the stream.
+        """
+
+        while True:
+            self.position = self.WHITESPACE_REGEX.match(self.text, self.position).end()  # type: ignore[union-attr]
+            if self.position < len(self.text) or not self.fill():
+                return self.text[self.position:self.position + 1]
+
+    def expect(self, character: str) -> None:
+        if self.peek() != character:
+            raise json.JSONDecodeError('Expecting ' + repr(character), self.text, self.position)
+        self.position += 1
+
+    def decode(self) -> Any:
+        """
+        Returns the JSON value at position which is read until it is complete.
+        """
+
+        while True:
+            if self.text[self.position:self.position + 1] not in ['"', '[', '{']:
+                # a number or literal may continue in the next chunk:
+                end = self.SCALAR_REGEX.match(self.text, self.position).end()  # type: ignore[union-attr]
+                if end == len(self.text) and self.fill():
+                    continue
+            try:
+                value, self.position = self.decoder.raw_decode(self.text, self.position)
+                return value
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+
+    def skip(self) -> None:
+        """
+        Skips the JSON value at position. Lists and objects are decoded
+        element by element: only the Python objects of one element exist
+        at a time instead of those of the whole list or object.
+        """
+
+        closing = {'[': ']', '{': '}'}.get(self.text[self.position:self.position + 1])
+        if not closing:
+            self.decode()
+            return
+        self.position += 1
+        if self.peek() == closing:
+            self.position += 1
+            return
+        while True:
+            if closing == '}':
+                if self.peek() != '"':
+                    raise json.JSONDecodeError('Expecting property name enclosed in double quotes', self.text, self.position)
+                self.decode()
+                self.expect(':')
+                self.peek()
+            self.decode()
+            if self.peek() == closing:
+                self.position += 1
+                return
+            self.expect(',')
+            self.peek()
+
+
+class DirectoryIndex(object):
+    """
+    The entries of the directories of the handled files: each directory
+    is read once with os.scandir() instead of checking each file, its
+    .info.json file and the directories SUCCESS_DIR and ERROR_DIR with
+    stat() calls of their own. On network file systems, these round
+    trips are the main cost of handling many files.
+
+    The renames and moves of guessfilename update the index (see
+    rename()). Other changes of the directories are only noticed after
+    refresh().
+    """
+
+    def __init__(self) -> None:
+        # the entries by name by absolute directory name; None for files renamed by guessfilename:
+        self.directories: dict[str, dict[str, os.DirEntry[str] | None]] = {}
+
+    def get_entries(self, dirname: str) -> dict[str, os.DirEntry[str] | None]:
+        """
+        Returns the entries of the absolute directory dirname which is read on first use.
+        """
+
+        entries = self.directories.get(dirname)
+        if entries is None:
+            try:
+                with os.scandir(dirname) as iterator:
+                    entries = {entry.name: entry for entry in iterator}
+            except OSError as e:
+                logging.debug('DirectoryIndex: could not read directory %s: %s' % (dirname, str(e)))
+                entries = {}
+            self.directories[dirname] = entries
+        return entries
+
+    def get_entry(self, path: str) -> tuple[bool, os.DirEntry[str] | None]:
+        """
+        Returns whether path exists according to the index and its entry.
+        """
+
+        dirname, name = os.path.split(os.path.abspath(path))
+        entries = self.get_entries(dirname)
+        return name in entries, entries.get(name)
 
-try:
-    import pypdf
-except ImportError:
-    print("Could not find Python module \"pypdf\".\nPlease install it, e.g., with \"sudo pip install pypdf\".")
-    sys.exit(1)
+    def is_file(self, path: str) -> bool:
+        """
+        Returns True if path is a file (or a symbolic link to a file) like os.path.isfile().
+        """
 
-PROG_VERSION_DATE = PROG_VERSION[13:23]
-INVOCATION_TIME = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime())
+        exists, entry = self.get_entry(path)
+        return exists and (entry is None or entry.is_file())
 
-USAGE = "\n\
-    guessfilename [<options>] <list of files>\n\
-\n\
-This little Python script tries to rename files according to pre-defined rules.\n\
-\n\
-It does this with several methods: first, the current file name is analyzed and\n\
-any ISO date/timestamp and filetags are re-used. Secondly, if the parsing of the\n\
-file name did not lead to any new file name, the content of the file is analyzed.\n\
-\n\
-You have to adapt the rules in the Python script to meet your requirements.\n\
-The default rule-set follows the filename convention described on\n\
-http://karl-voit.at/managing-digital-photographs/\n\
-\n\
-\n\
-:copyright: (c) by Karl Voit\n\
-:license: GPL v3 or any later version\n\
-:URL: https://github.com/novoid/guess-filename.py\n\
-:bugreports: via github or <tools@Karl-Voit.at>\n\
-:version: " + PROG_VERSION_DATE + "\n"
+    def is_dir(self, path: str) -> bool:
+        """
+        Returns True if path is a directory (or a symbolic link to one) like os.path.isdir().
+        """
 
-ERROR_DIR = 'guess-filename_fails'
-SUCCESS_DIR = 'guess-filename_success'
+        if not os.path.basename(os.path.abspath(path)):
+            return os.path.isdir(path)  # the root directory has no entry
+        exists, entry = self.get_entry(path)
+        return exists and entry is not None and entry.is_dir()
 
-parser = OptionParser(usage=USAGE)
+    def rename(self, dirname: str, oldname: str, newdirname: str, newname: str) -> None:
+        """
+        Updates the index after the file oldname of the directory
+        dirname was renamed to newname in the directory newdirname.
+        """
 
-parser.add_option("-d", "--dryrun", dest="dryrun", action="store_true",
-                  help="enable dryrun mode: just simulate what would happen, do not modify files")
+        self.directories.get(os.path.abspath(dirname), {}).pop(oldname, None)
+        entries = self.directories.get(os.path.abspath(newdirname))
+        if entries is not None:
+            entries[newname] = None
 
-parser.add_option("-v", "--verbose", dest="verbose", action="store_true",
-                  help="enable verbose mode")
+    def refresh(self, dirname: str) -> None:
+        """
+        Removes the directory from the index so that it is read again on next use.
+        """
 
-parser.add_option("-q", "--quiet", dest="quiet", action="store_true",
-                  help="enable quiet mode")
+        self.directories.pop(os.path.abspath(dirname), None)
 
-parser.add_option("--debug", dest="debug", action="store_true",
-                  help="enable debug mode, printing debug information on selected file formats. Currently: just PXL files.")
+    def retain(self, dirnames: Iterable[str]) -> None:
+        """
+        Removes all directories but the absolute directory names of
+        dirnames from the index: it keeps the memory constant while
+        handling the files of many directories (see walk_files()).
+        """
 
-parser.add_option("--version", dest="version", action="store_true",
-                  help="display version and exit")
+        keep = set(dirnames)
+        for dirname in [dirname for dirname in self.directories if dirname not in keep]:
+            del self.directories[dirname]
 
-(options, args) = parser.parse_args()
+    def clear(self) -> None:
+        self.directories.clear()
 
 
-def handle_logging() -> None:
-    """Log handling and configuration"""
+class RenamePlan(object):
+    """
+    The renames of a batch of files for --plan: handle_file() adds the
+    renames and the moves to SUCCESS_DIR and ERROR_DIR of the files
+    instead of carrying them out. apply() then checks the whole batch
+    in memory (see check()) and carries out the renames without a
+    conflict in one pass.
+
+    Before renaming, the steps are written to a journal which is
+    removed after the last step. If a step fails, the steps done so far
+    are rolled back right away; if guessfilename is killed in between,
+    rollback_journal() of --rollback undoes them.
+    """
 
-    if options.verbose:
-        FORMAT = "%(levelname)-8s %(asctime)-15s %(message)s"
-        logging.basicConfig(level=logging.DEBUG, format=FORMAT)
-    elif options.quiet:
-        FORMAT = "%(levelname)-8s %(message)s"
-        logging.basicConfig(level=logging.ERROR, format=FORMAT)
-    else:
-        FORMAT = "%(levelname)-8s %(message)s"
-        logging.basicConfig(level=logging.INFO, format=FORMAT)
+    def __init__(self, index: DirectoryIndex, journal: str) -> None:
+        self.index = index
+        self.journal = journal
+        self.renames: dict[str, str] = {}  # the new path by old path in the order of the files
 
+    def add(self, dirname: str, oldbasename: str, newbasename: str, subdir: str) -> None:
+        """
+        Adds the rename of the file oldbasename of the directory dirname
+        to newbasename within the directory subdir (SUCCESS_DIR or
+        ERROR_DIR) of dirname if it exists according to the index or
+        within dirname otherwise.
+        """
 
-def error_exit(errorcode: int, text: str) -> NoReturn:
-    """exits with return value of errorcode and prints to stderr"""
+        newdirname = os.path.join(dirname, subdir)
+        if not self.index.is_dir(newdirname):
+            newdirname = dirname
+        if (dirname, oldbasename) != (newdirname, newbasename):
+            self.renames[os.path.join(dirname, oldbasename)] = os.path.join(newdirname, newbasename)
 
-    sys.stdout.flush()
-    logging.error(text)
+    def check(self) -> tuple[list[tuple[str, str]], list[tuple[str, str, str]]]:
+        """
+        Returns the steps carrying out the renames without a conflict
+        and the renames with a conflict, i.e., several files getting the
+        same new path or a new path existing already. Like without
+        --plan, a file moved to SUCCESS_DIR may not get the name of an
+        existing file of its own directory either (see
+        get_existing_paths()). The steps are
+        ordered so that files are renamed to paths of files which are
+        renamed as well only after these: a → b and b → c is carried out
+        as b → c, a → b. Cycles like a → b, b → a get a temporary name.
+
+        @param return: (list of (old path, new path), list of (old path, new path, reason))
+        """
+
+        targets: dict[str, int] = {}
+        for newfile in self.renames.values():
+            targets[newfile] = targets.get(newfile, 0) + 1
+        conflicts = [(oldfile, newfile, 'it is the new file name of %i files' % targets[newfile])
+                     for oldfile, newfile in self.renames.items() if targets[newfile] > 1]
+        pending = {oldfile: newfile for oldfile, newfile in self.renames.items() if targets[newfile] == 1}
+
+        # a new path may only exist if its file is renamed as well, which a conflict may prevent:
+        while blocked := [oldfile for oldfile, newfile in pending.items()
+                          if any(path not in pending and self.index.get_entry(path)[0]
+                                 for path in self.get_existing_paths(oldfile, newfile))]:
+            for oldfile in blocked:
+                conflicts.append((oldfile, pending.pop(oldfile), 'a file with this name exists already'))
+
+        steps = []
+        for oldfile in list(pending):
+            if oldfile not in pending:
+                continue  # part of the chain of a previous file
+            # the chain of renames whose new path is the old path of the following one:
+            chain: list[tuple[str, str]] = []
+            path = oldfile
+            while path in pending and (not chain or path != oldfile):
+                chain.append((path, pending[path]))
+                path = pending[path]
+            for step in chain:
+                del pending[step[0]]
+            if path == oldfile:
+                temporary = os.path.join(os.path.dirname(oldfile),
+                                         '.guessfilename-%i-%s' % (os.getpid(), os.path.basename(oldfile)))
+                steps.append((oldfile, temporary))
+                steps.extend(reversed(chain[1:]))
+                steps.append((temporary, chain[0][1]))
+            else:
+                steps.extend(reversed(chain))
+        return steps, conflicts
+
+    @staticmethod
+    def get_existing_paths(oldfile: str, newfile: str) -> list[str]:
+        """
+        Returns the paths which may not exist for renaming oldfile to
+        newfile: newfile and, if the file is renamed and moved to a
+        subdirectory like SUCCESS_DIR, its new name in the directory of
+        oldfile. Without --plan, handle_file() renames the file within
+        its directory before moving it.
+        """
+
+        sibling = os.path.join(os.path.dirname(oldfile), os.path.basename(newfile))
+        if sibling in [oldfile, newfile]:
+            return [newfile]
+        return [newfile, sibling]
+
+    def apply(self, dryrun: bool = False) -> int:
+        """
+        Carries out the renames added since the last call of apply()
+        which do not have a conflict (see check()) and reports the
+        others.
+
+        @param dryrun: boolean which defines if files should be changed (False) or not (True)
+        @param return: number of files which are not renamed
+        """
+
+        steps, conflicts = self.check()
+        for oldfile, newfile, reason in conflicts:
+            logging.error('"%s" can\'t be renamed to "%s" since %s' % (oldfile, newfile, reason))
+        failed = len(conflicts)
+        renamed = len(self.renames) - failed
+        self.renames = {}
+        if dryrun or not steps:
+            return failed
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.journal)), exist_ok=True)
+        with open(self.journal, 'x', encoding='utf-8') as journal:
+            for oldfile, newfile in steps:
+                journal.write(json.dumps({'old': oldfile, 'new': newfile}) + '\n')
+            journal.flush()
+            os.fsync(journal.fileno())
+
+        done: list[tuple[str, str]] = []
+        try:
+            for oldfile, newfile in steps:
+                rename_no_replace(oldfile, newfile)
+                done.append((oldfile, newfile))
+                self.index.rename(os.path.dirname(oldfile), os.path.basename(oldfile),
+                                  os.path.dirname(newfile), os.path.basename(newfile))
+                logging.debug('RenamePlan: renamed "%s" to "%s"' % (oldfile, newfile))
+        except BaseException as e:
+            logging.error('Rolling back %i renames of the batch: %s' % (len(done), str(e) or e.__class__.__name__))
+            for oldfile, newfile in reversed(done):
+                rename_no_replace(newfile, oldfile)
+                self.index.rename(os.path.dirname(newfile), os.path.basename(newfile),
+                                  os.path.dirname(oldfile), os.path.basename(oldfile))
+            os.remove(self.journal)
+            if not isinstance(e, OSError):
+                raise
+            return failed + renamed
+        os.remove(self.journal)
+        return failed
+
+
+class NoPdfContentException(Exception):
+    """
+    Exception for PDF files whose content can not be analysed: they
+    can not be decrypted, have no pages or their pages contain no text.
+    It ends the content analysis of PdfDocument.
+    """
 
-    sys.exit(errorcode)
+
+class ContentBudgetException(Exception):
+    """
+    Exception for PDF files whose content analysis exceeds the time or
+    memory budget of --content-timeout or --content-memory. Its message
+    names the budget and the stage of the analysis.
+    """
 
 
 class FileSizePlausibilityException(Exception):
@@ -130,6 +1731,9 @@ class GuessFilename(object):
     TIMESTAMP_DELIMITERS = '[.;:-]?'
     DATETIMESTAMP_DELIMITERS = '[T.;:-_]?'
 
+    # dispatch prefix of OLD_FILENAME_RULES for file names starting with a digit
+    DIGIT_PREFIX = r'\d'
+
     DATESTAMP_REGEX = r'(?P<year>[12]\d{3})' + TIMESTAMP_DELIMITERS + r'(?P<month>[01]\d)' + TIMESTAMP_DELIMITERS + r'(?P<day>[0123]\d)'
     TIMESTAMP_REGEX = r'(?P<hour>[012]\d)' + TIMESTAMP_DELIMITERS + r'(?P<minute>[012345]\d)(' + TIMESTAMP_DELIMITERS + r'(?P<second>[012345]\d))?'
 
@@ -145,10 +1749,21 @@ class GuessFilename(object):
 
     DATETIME_DURATION_REGEX = DATETIMESTAMP_REGEX + r'(--?' + DATETIMESTAMP2_REGEX + ')?'
 
+    # The tags are words separated by single BETWEEN_TAG_SEPARATOR
+    # characters with an optional trailing one. Do not nest the
+    # quantifiers like in "(\w+[ ]?)+": such a group can split a word
+    # in exponentially many ways and file names which almost match
+    # take forever (see "guessfilename_benchmark.py redos").
     ISO_NAME_TAGS_EXTENSION_REGEX = re.compile(r'((?P<daytimeduration>' + DATETIME_DURATION_REGEX + \
                                                r')[ -_])?(?P<description>.+?)(' + FILENAME_TAG_SEPARATOR + \
-                                               r'(?P<tags>(\w+[' + BETWEEN_TAG_SEPARATOR + \
-                                               r']?)+))?(\.(?P<extension>\w+))?$', re.UNICODE)
+                                               r'(?P<tags>\w+(?:' + BETWEEN_TAG_SEPARATOR + r'\w+)*' + \
+                                               BETWEEN_TAG_SEPARATOR + r'?))?(\.(?P<extension>\w+))?$', re.UNICODE)
+
+    # the net salary following "•Auszahlung  " in the first line of a salary statement (see content_rule_salary()):
+    SALARY_WINDOW_REGEX = re.compile(r'(?P<salary>\d\.\d{3},\d{2})•.')
+
+    # characters of regular expressions: strings without them mean the same as literal strings (see is_literal())
+    REGEX_SPECIAL_CHARACTERS = '.^$*+?{}[]\\|()'
 
     RAW_EURO_CHARGE_REGEX = r'(?P<charge>\d+([,.]\d+)?)[-_ ]?(EUR|€)'
     EURO_CHARGE_REGEX = re.compile(r'^(.+[-_ ])?' + RAW_EURO_CHARGE_REGEX + r'([-_ .].+)?$', re.UNICODE)
@@ -245,6 +1860,7 @@ class GuessFilename(object):
     MEDIATHEKVIEW_RAW_ENDING = TIMESTAMP2_REGEX + r'\d\dP_' + TIMESTAMP3_REGEX + r'\d\dP_(?P<qualityindicator>Q4A|Q6A|Q8C).mp4'  # e.g., "21050604P_21533212P_Q8C.mp4"
     MEDIATHEKVIEW_RAW_REGEX_STRING = MEDIATHEKVIEW_RAW_DATETIME + MEDIATHEKVIEW_RAW_TITLE + \
                                      MEDIATHEKVIEW_RAW_NUMBERS + MEDIATHEKVIEW_RAW_ENDING
+    MEDIATHEKVIEW_RAW_REGEX = re.compile(MEDIATHEKVIEW_RAW_REGEX_STRING)
 
     # URL has format like: http://apasfpd.sf.apa.at/cms-worldwide/online/7db1010b02753288e65ff61d5e1dff58/1528531468/2018-06-08_2140_tl_01_Was-gibt-es-Neu_Promifrage-gest__13979244__o__1391278651__s14313058_8__BCK1HD_22050122P_22091314P_Q4A.mp4
     # 2020-02-29: updated example URL:
@@ -315,14 +1931,178 @@ class GuessFilename(object):
 
     # CallRecord_20240925-225756_+4366012345678.abc=
     CALLRECORD_REGEX = re.compile(r'CallRecord_' + DATESTAMP_REGEX + r'-' + TIMESTAMP_REGEX + r'_(?P<number>\+\d+)\.(?P<extension>.+)')
+
+    # The rules of derive_new_filename_from_old_filename() in their order of
+    # precedence: (rule name, dispatch prefix, regex)
+    #   rule name:       the rule is implemented by method "filename_rule_<rule name>"
+    #   dispatch prefix: literal start of all file names the rule is able to match,
+    #                    DIGIT_PREFIX for file names starting with a digit (such as
+    #                    ISO datestamps which are required for "datetimestr") or None
+    #                    when the rule has to be tried for any file name
+    #   regex:           if not None, the rule is only applied when this regex matches
+    #                    and gets its match as parameter regex_match
+    OLD_FILENAME_RULES: list[tuple[str, str | None, re.Pattern[str] | None]] = [
+        ('bankaustria_bank_statement', 'C1', BANKAUSTRIA_BANK_STATEMENT_REGEX),
+        ('bankaustria_bank_transactions', DIGIT_PREFIX, BANKAUSTRIA_BANK_TRANSACTIONS_REGEX),
+        ('mediathekview_long_with_detailed_timestamps', DIGIT_PREFIX, MEDIATHEKVIEW_LONG_WITH_DETAILED_TIMESTAMPS_REGEX),
+        ('mediathekview_raw', DIGIT_PREFIX, MEDIATHEKVIEW_RAW_REGEX),
+        ('mediathekview_long_without_detailed_timestamps', DIGIT_PREFIX, MEDIATHEKVIEW_LONG_WITHOUT_DETAILED_TIMESTAMPS_REGEX),
+        ('mediathekview_short', DIGIT_PREFIX, MEDIATHEKVIEW_SHORT_REGEX),
+        ('img', 'IMG_', IMG_REGEX),
+        ('vid', 'VID_', VID_REGEX),
+        ('signal', 'signal-', SIGNAL_REGEX),
+        ('modet', 'modet_', MODET_REGEX),
+        ('recorder', 'rec_', RECORDER_REGEX),
+        ('oekostrom_teilbetragsrechnung', DIGIT_PREFIX, None),
+        ('a1_festnetz_internet', DIGIT_PREFIX, None),
+        ('gvb_10er_block', DIGIT_PREFIX, None),
+        ('bill', DIGIT_PREFIX, None),
+        ('games', None, None),
+        ('vbv_kontoinformation', DIGIT_PREFIX, None),
+        ('verbrauchsablesung_wasser', DIGIT_PREFIX, None),
+        ('hipster_pda', DIGIT_PREFIX, None),
+        ('misc_screenshot', 'Screenshot', MISC_SCREENSHOT_REGEX),
+        ('easy_screenshot', 'Firefox_Screenshot_', EASY_SCREENSHOT_REGEX),
+        ('osmtrack', DIGIT_PREFIX, OSMTRACK_REGEX),
+        ('boox_exported', None, None),
+        ('newspaper1', None, NEWSPAPER1_REGEX),
+        ('smartrec', DIGIT_PREFIX, SMARTREC_REGEX),
+        ('presse', DIGIT_PREFIX, PRESSE_REGEX),
+        ('anwesenheitsbestaetigung', DIGIT_PREFIX, None),
+        ('konicaminolta', DIGIT_PREFIX, KonicaMinolta_TIME_REGEX),
+        ('gif_screencast', 'output-', GIF_SCREENCAST_REGEX),
+        ('voltino', DIGIT_PREFIX, None),
+        ('rechtschutzversicherung', DIGIT_PREFIX, None),
+        ('kvr', 'KVR-', KVR_REGEX),
+        ('oemag', DIGIT_PREFIX, OEMAG_REGEX),
+        ('callrecord', 'CallRecord_', None),
+    ]
+
+    # Literal cues of the rules of OLD_FILENAME_RULES: a rule is only
+    # applied when the file name contains at least one cue of each of its
+    # lists of cues. All cues are found with one single scan of a
+    # KeywordMatcher. Cues starting with "(?i)" ignore case, "{SETTING}"
+    # is replaced by the setting of the config. Rules with cues using
+    # missing settings are never applied.
+    OLD_FILENAME_RULE_CUES: dict[str, list[list[str]]] = {
+        'oekostrom_teilbetragsrechnung': [['(?i)teilbetragsrechnung'], ['(?i)oekostrom']],
+        'a1_festnetz_internet': [[' A1 ', ' a1 ']],
+        'gvb_10er_block': [['10er']],
+        'bill': [['bill']],
+        'games': [['Hive', 'Rage', 'Stratego']],
+        'vbv_kontoinformation': [['VBV'], ['Kontoinformation']],
+        'verbrauchsablesung_wasser': [['Verbrauchsablesung'], ['Wasser']],
+        'hipster_pda': [['hipster', 'Hipster']],
+        'anwesenheitsbestaetigung': [['Anwesenheitsbest']],
+        'voltino': [['TZ-Vorschreibung'], ['{VOLTINO_Kundennummer}']],
+        'rechtschutzversicherung': [['{RECHTSCHUTZVERSICHERUNG}'], ['Wertanpassung']],
+    }
+
+    # The rules of derive_new_filename_from_content() in their order of
+    # precedence: each rule is implemented by method "content_rule_<rule name>"
+    CONTENT_RULES: list[str] = [
+        'salary',
+        'easybank_tan_list',
+        'kirchenbeitrag',
+        'generali_dynamikklausel',
+        'merkur_lebensversicherung',
+        'loan',
+        'a1_festnetz_internet',
+        'oemag',
+        'oebb_ticket',
+        'netcup',
+        'sevenenergy',
+    ]
+
+    # The backends extracting the texts of PDF files for PdfDocument:
+    # each backend is implemented by method "open_pdf_with_<backend name>"
+    PDF_BACKENDS: list[str] = ['pypdf', 'pdftotext']
+
+    # number of files of one exiftool call of prefetch_pixel_metadata()
+    PIXEL_METADATA_BATCH_SIZE = 500
+
+    # the only keys of .info.json files derive_new_filename_from_json_metadata() uses (see JsonKeyReader):
+    JSON_METADATA_KEYS = ['upload_date', 'extractor', 'extractor_key', 'display_id', 'ext', 'duration_string',
+                          'fulltitle', 'url', 'webpage_url_domain']
+
+    # .info.json files from this size on are read by JsonKeyReader instead of json.load(): below it, the
+    # memory of json.load() does not matter and it is faster since JsonKeyReader decodes the skipped values, too
+    JSON_STREAM_SIZE = 1024 * 1024
+
+    # the keys derive_new_filename_from_json_metadata() needs for the files of each extractor (see has_json_metadata_keys()):
+    JSON_METADATA_KEYS_BY_EXTRACTOR = {
+        'Youtube': ['upload_date', 'extractor', 'extractor_key', 'display_id', 'ext', 'duration_string', 'fulltitle'],
+        'PeerTube': ['upload_date', 'extractor', 'extractor_key', 'display_id', 'ext', 'duration_string', 'fulltitle',
+                     'webpage_url_domain'],
+        'ORFTVthek': ['extractor_key', 'fulltitle', 'url', 'ext'],
+    }
+
+    # the only Exif meta-data derive_new_filename_for_pixel_files() uses (see read_pixel_metadata()):
+    PIXEL_METADATA_TAGS = ['File:FileType', 'File:FileModifyDate', 'XMP:SpecialTypeID', 'XMP:FullPanoWidthPixels',
+                           'XMP:IsPhotosphere', 'XMP:CamerasDepthMapNear', 'XMP:ProfilesType',
+                           'QuickTime:AudioChannels', 'QuickTime:ComAndroidCaptureFps']
     
     logger: logging.Logger | None = None
     config: Any = None
-
-
-    def __init__(self, config: Any, logger: logging.Logger) -> None:
+    old_filename_rule_index: dict[str, tuple[FilenameRule, ...]] = {}
+    old_filename_rule_fallback: tuple[FilenameRule, ...] = ()
+    old_filename_rule_matchers: dict[str, CombinedRuleMatcher] = {}
+    old_filename_rule_fallback_matcher: CombinedRuleMatcher | None = None
+    table_rules: list[TableRule] = []
+    content_rules: list[tuple[str, Callable[..., str | bool]]] = []
+    stats: RuleStatistics | None = None  # set to record the statistics of the rules
+    pdf_text_cache: PdfTextCache | None = None  # set to store the texts of PDF files for further runs
+    pixel_metadata_cache: PixelMetadataCache | None = None  # set to store the meta-data of Pixel files for further runs
+    pdf_backend: str = 'pypdf'  # the entry of PDF_BACKENDS extracting the texts of PDF files
+    fuzzy_index: FuzzyIndex | None = None  # the FuzzyIndex of the last document (see get_fuzzy_index())
+    debug: bool = False  # print debug information on selected file formats
+    interactive: bool = True  # rules may ask the user via stdin
+    content_stage: str = ''  # the running step of derive_new_filename_from_content() (see get_content_stage())
+    content_document: PdfDocument | None = None  # the PdfDocument of derive_new_filename_from_content()
+    exiftool_session: Any = None  # the exiftool.ExifToolHelper of all files (see get_exiftool())
+    rename_plan: RenamePlan | None = None  # set to add the renames to a plan instead of carrying them out
+
+
+    def __init__(self, config: Any, logger: logging.Logger, rule_table: list[dict[str, Any]] | None = None) -> None:
         self.logger = logger
         self.config = config
+        self.content_futures: dict[str, Any] = {}  # results of worker processes of --jobs (see get_content_result())
+        self.context_patterns: dict[str, re.Pattern[str]] = {}  # see get_context_pattern()
+        self.pixel_metadata: dict[str, dict[str, Any]] = {}  # see prefetch_pixel_metadata()
+        self.directory_index = DirectoryIndex()  # the entries of the directories of the handled files
+        self.build_table_rules(rule_table or [])
+        self.build_old_filename_rule_cues()
+        self.build_old_filename_rule_index()
+        self.build_content_rules()
+
+    def build_table_rules(self, rule_table: list[dict[str, Any]]) -> None:
+        """
+        Compiles the rule definitions of the rule table (see TableRule).
+        Rules requiring settings which are missing in the config are
+        ignored.
+
+        @param rule_table: list of rule definitions as loaded by load_rule_table()
+        """
+
+        self.table_rules = []
+        for definition in rule_table:
+            tablerule = TableRule(definition, self.config)
+            if tablerule.missing_config:
+                logging.warning('Ignoring rule "' + tablerule.name + '" of the rule table because of missing ' +
+                                'settings in the config: ' + ', '.join(tablerule.missing_config))
+                continue
+            self.table_rules.append(tablerule)
+
+    def build_content_rules(self) -> None:
+        """
+        Builds the list of rules of derive_new_filename_from_content():
+        the rules of CONTENT_RULES followed by the rules of the rule
+        table with the source "content".
+        """
+
+        self.content_rules = [(rulename, getattr(self, 'content_rule_' + rulename)) for rulename in self.CONTENT_RULES]
+        self.content_rules += [(tablerule.name, functools.partial(self.content_rule_from_table, tablerule))
+                               for tablerule in self.table_rules if tablerule.source == 'content']
 
     def get_unique_show_and_title(self, show: str, title: str) -> str:
         """If show starts with title (or vice versa), omit the redundant one and use the longer string"""
@@ -343,26 +2123,176 @@ class GuessFilename(object):
         Analyses the old filename and returns a new one if feasible.
         If not, False is returned instead.
 
+        The rules of OLD_FILENAME_RULES are tried in their order of
+        precedence. Only the candidate rules of the dispatch index (see
+        build_old_filename_rule_index()) are considered: the first rule
+        returning a new file name wins. A rule returning None recognized
+        the file name but can not derive a new one: the remaining rules
+        are not tried. The regular expressions of the candidates are checked with one single scan of the combined
+        matcher of the candidates first: rules preceding the first
+        matching regular expression can not match and are skipped.
+        Likewise, the cues of OLD_FILENAME_RULE_CUES contained in the
+        file name are found with one single scan when the first rule
+        with cues is reached: rules missing their cues are skipped.
+
         @param oldfilename: string containing one file name
         @param return: False or new filename
         """
 
         logging.debug("derive_new_filename_from_old_filename called")
-        datetimestr, basefilename, tags, extension = self.split_filename_entities(oldfilename)
+        entities = self.split_filename_entities(oldfilename)
+        matcher = self.get_old_filename_rule_matcher(oldfilename)
+        first_match = matcher.match(oldfilename)
+        found_cues: frozenset[str] | None = None
+
+        for position, (rulename, prefix, regex, cues, rule) in enumerate(self.get_old_filename_rule_candidates(oldfilename)):
+            if prefix != self.DIGIT_PREFIX and not oldfilename.startswith(prefix):
+                continue
+            if cues:
+                if found_cues is None:
+                    found_cues = self.old_filename_cue_matcher.find(oldfilename)
+                if not all(alternatives & found_cues for alternatives in cues):
+                    continue
+            regex_match = None
+            if regex:
+                if position in matcher.covered and (first_match is None or position < first_match):
+                    continue
+                regex_match = regex.match(oldfilename)
+                if not regex_match:
+                    continue
+            if self.stats:
+                newfilename = self.stats.call('filename/' + rulename, rule, oldfilename, entities, regex_match)
+            else:
+                newfilename = rule(oldfilename, entities, regex_match)
+            if newfilename:
+                return newfilename
+            if newfilename is None:
+                return False
+
+        # FIXXME: more cases!
+
+        return False  # no new filename found
+
+    def build_old_filename_rule_cues(self) -> None:
+        """
+        Builds the cues of the rules of OLD_FILENAME_RULE_CUES and the
+        KeywordMatcher finding all of them. The settings of the config
+        used by the cues are substituted once. A rule with a cue using a
+        missing setting gets an empty list of cues which is never met.
+        """
+
+        self.old_filename_rule_cues: dict[str, tuple[frozenset[str], ...]] = {}
+        for rulename, alternatives in self.OLD_FILENAME_RULE_CUES.items():
+            try:
+                self.old_filename_rule_cues[rulename] = tuple(
+                    frozenset(re.sub(r'\{(\w+)\}', lambda setting: str(getattr(self.config, setting.group(1))), cue)
+                              for cue in cues)
+                    for cues in alternatives)
+            except AttributeError as e:
+                logging.debug('Rule "' + rulename + '" is never applied because of a missing setting in the config: ' + str(e))
+                self.old_filename_rule_cues[rulename] = (frozenset(),)
+        self.old_filename_cue_matcher = KeywordMatcher([cue for cues in self.old_filename_rule_cues.values()
+                                                        for alternatives in cues for cue in alternatives])
+
+    def build_old_filename_rule_index(self) -> None:
+        """
+        Builds the dispatch index for derive_new_filename_from_old_filename().
+
+        The index maps the first character of a file name to the
+        ordered tuple of rules which might match such a file name: all
+        rules whose dispatch prefix starts with this character (or
+        DIGIT_PREFIX for digits) and all rules without any prefix. This
+        way, the order of precedence of OLD_FILENAME_RULES is kept. The
+        rules of the rule table with the source "filename" follow the
+        rules of OLD_FILENAME_RULES.
+
+        Additionally, a CombinedRuleMatcher is built for the regular
+        expressions of each tuple of rules. Its tags are the positions
+        of the rules within the tuple.
+        """
+
+        index: dict[str, list[FilenameRule]] = {}
+        anyprefix: list[FilenameRule] = []
+        rules: list[tuple[str, str | None, re.Pattern[str] | None, tuple[frozenset[str], ...],
+                          Callable[..., str | bool | None]]] = \
+            [(rulename, prefix, regex, self.old_filename_rule_cues.get(rulename, ()), getattr(self, 'filename_rule_' + rulename))
+             for rulename, prefix, regex in self.OLD_FILENAME_RULES]
+        rules += [(tablerule.name, tablerule.get_dispatch_prefix(), tablerule.regex, (),
+                   functools.partial(self.derive_new_filename_from_table_rule, tablerule))
+                  for tablerule in self.table_rules if tablerule.source == 'filename']
+        for rulename, prefix, regex, cues, rule in rules:
+            if prefix is None:
+                for entries in index.values():
+                    entries.append((rulename, '', regex, cues, rule))
+                anyprefix.append((rulename, '', regex, cues, rule))
+            else:
+                key = prefix if prefix == self.DIGIT_PREFIX else self.get_old_filename_rule_key(prefix)
+                if key not in index:
+                    index[key] = list(anyprefix)
+                index[key].append((rulename, prefix, regex, cues, rule))
+
+        self.old_filename_rule_index = {key: tuple(entries) for key, entries in index.items()}
+        self.old_filename_rule_fallback = tuple(anyprefix)
+        self.old_filename_rule_matchers = {key: self.get_combined_rule_matcher(entries)
+                                           for key, entries in self.old_filename_rule_index.items()}
+        self.old_filename_rule_fallback_matcher = self.get_combined_rule_matcher(self.old_filename_rule_fallback)
+
+    def get_combined_rule_matcher(self, rules: tuple[FilenameRule, ...]) -> CombinedRuleMatcher:
+        """
+        Returns a CombinedRuleMatcher for the regular expressions of rules, tagged with their positions.
+        """
+
+        patterns: list[re.Pattern[str]] = []
+        positions: list[int] = []
+        for position, (_, _, regex, _, _) in enumerate(rules):
+            if regex and CombinedRuleMatcher.supports(regex):
+                patterns.append(regex)
+                positions.append(position)
+        return CombinedRuleMatcher(patterns, positions)
+
+    def get_old_filename_rule_key(self, oldfilename: str) -> str:
+        """
+        Returns the key of the dispatch index for oldfilename.
+        """
+
+        first = oldfilename[0]
+        if first.isdecimal():
+            return self.DIGIT_PREFIX
+        return first
+
+    def get_old_filename_rule_candidates(self, oldfilename: str) -> tuple[FilenameRule, ...]:
+        """
+        Returns the rules of the dispatch index which might match oldfilename in their order of precedence.
+        """
+
+        return self.old_filename_rule_index.get(self.get_old_filename_rule_key(oldfilename),
+                                                self.old_filename_rule_fallback)
+
+    def get_old_filename_rule_matcher(self, oldfilename: str) -> CombinedRuleMatcher:
+        """
+        Returns the CombinedRuleMatcher for the candidates of get_old_filename_rule_candidates().
+        """
 
+        matcher = self.old_filename_rule_matchers.get(self.get_old_filename_rule_key(oldfilename),
+                                                      self.old_filename_rule_fallback_matcher)
+        assert matcher
+        return matcher
+
+    def filename_rule_bankaustria_bank_statement(self, oldfilename: str, entities: FilenameEntities,
+                                                 regex_match: re.Match[str]) -> str | bool:
         # C110014365208EUR20150930001.pdf -> 2015-09-30 Bank Austria Kontoauszug 2015-001 10014365208.pdf
-        regex_match = re.match(self.BANKAUSTRIA_BANK_STATEMENT_REGEX, oldfilename)
-        if regex_match:
-            return self.get_date_string_from_named_groups(regex_match) + ' Bank Austria Kontoauszug ' + \
-                regex_match.group('year') + '-' + regex_match.group('issue') + ' ' + \
-                regex_match.group('number') + '.pdf'
+        return self.get_date_string_from_named_groups(regex_match) + ' Bank Austria Kontoauszug ' + \
+            regex_match.group('year') + '-' + regex_match.group('issue') + ' ' + \
+            regex_match.group('number') + '.pdf'
 
+    def filename_rule_bankaustria_bank_transactions(self, oldfilename: str, entities: FilenameEntities,
+                                                    regex_match: re.Match[str]) -> str | bool:
         # 2017-11-05T10.56.11_IKS-00000000512345678901234567890.csv -> 2017-11-05T10.56.11 Bank Austria Umsatzliste IKS-00000000512345678901234567890.csv
-        regex_match = re.match(self.BANKAUSTRIA_BANK_TRANSACTIONS_REGEX, oldfilename)
-        if regex_match:
-            return self.get_datetime_string_from_named_groups(regex_match) + ' Bank Austria Umsatzliste IKS-' + \
-                regex_match.group('iks') + '.csv'
+        return self.get_datetime_string_from_named_groups(regex_match) + ' Bank Austria Umsatzliste IKS-' + \
+            regex_match.group('iks') + '.csv'
 
+    def filename_rule_mediathekview_long_with_detailed_timestamps(self, oldfilename: str, entities: FilenameEntities,
+                                                                  regex_match: re.Match[str]) -> str | bool:
         # MediathekView: Settings > modify Set > Targetfilename: "%DT%d %s %t - %T -ORIGINAL- %N.mp4" (without any limitation of the maximum numbers of characters)
         # results in files like:
         # with the detailed start- and end-time-stamp information of the chunks:
@@ -381,83 +2311,82 @@ class GuessFilename(object):
         #             the full length original file name at the end of the file name which ends
         #             with the quality indicator Q4A or Q8C when used with the ORF sender file format.
         #
-        regex_match = re.match(self.MEDIATHEKVIEW_LONG_WITH_DETAILED_TIMESTAMPS_REGEX, oldfilename)
-        if regex_match:
 
-            logging.debug('Filename did contain detailed start- and end-timestamps. Using the full-blown time-stamp ' + \
-                          'information of the chunk itself: MEDIATHEKVIEW_LONG_WITH_DETAILED_TIMESTAMPS_REGEX')
-
-            start_hrs = regex_match.group('hour2')
-            start_min = regex_match.group('minute2')
-            start_sec = regex_match.group('second2')
-            end_hrs = regex_match.group('hour3')
-            end_min = regex_match.group('minute3')
-            end_sec = regex_match.group('second3')
-            qualitytag = self.translate_ORF_quality_string_to_tag(regex_match.group('qualityindicator'))
-            self.warn_if_ORF_file_seems_to_small_according_to_duration_and_quality_indicator(oldfilename,
-                                                                                             regex_match.group('qualityindicator'),
-                                                                                             start_hrs, start_min, start_sec,
-                                                                                             end_hrs, end_min, end_sec)
-
-            if regex_match.group('sexpression'):
-                # the file name contained the optional chunk time-stamp(s)
-
-                ## Extra handling of this case:
-                ##     20230303T232946 ORF - Gute Nacht Österreich mit Peter Klien - Wirtschaftliche Probleme in Großbritannien -ORIGINALlow- 2023-03-03_2329_tl_01_Gute-Nacht-Oest_Wirtschaftliche__14170146__o__3365936366__s15349885_5__ORF1HD_00005621P_00105414P_Q4A.mp4
-                ##     2023-03-04T00.00.56 ORF - Gute Nacht Österreich mit Peter Klien - Wirtschaftliche Probleme in Großbritannien -- lowquality.mp4
-                ## ... the day should be incremented because this did start shortly before midnight but this part was started after midnight
-                ## -> When the actual start time (2nd timestamp in filename) is older than 10 hours compared to the file name start time, assume it is actually started after midnight.
-                ## exception: first time-stamp is "00:00:00" which stands for "unknown".
-                if (regex_match.group('hour') != '00' and regex_match.group('minute') != '00') and \
-                   int(regex_match.group('hour')) > int(regex_match.group('hour2')) and \
-                   int(regex_match.group('hour')) > int(regex_match.group('hour2')) + 10:
-                    logging.debug('Correcting day of MediathekView file: file started after midnight, so I increment the day here.')
-                    new_datestamp = self.get_incremented_date_string_from_named_groups(regex_match)
-                else:
-                    new_datestamp = self.get_date_string_from_named_groups(regex_match)
-                
-                newname = new_datestamp + 'T' + \
-                    regex_match.group('hour2') + '.' + regex_match.group('minute2') + '.' + regex_match.group('second2') + ' ' + \
-                    regex_match.group('channel') + ' - ' + self.get_unique_show_and_title(regex_match.group('show'), regex_match.group('title')) + ' -- ' + \
-                    qualitytag + '.mp4'
+        logging.debug('Filename did contain detailed start- and end-timestamps. Using the full-blown time-stamp ' + \
+                      'information of the chunk itself: MEDIATHEKVIEW_LONG_WITH_DETAILED_TIMESTAMPS_REGEX')
+
+        start_hrs = regex_match.group('hour2')
+        start_min = regex_match.group('minute2')
+        start_sec = regex_match.group('second2')
+        end_hrs = regex_match.group('hour3')
+        end_min = regex_match.group('minute3')
+        end_sec = regex_match.group('second3')
+        qualitytag = self.translate_ORF_quality_string_to_tag(regex_match.group('qualityindicator'))
+        self.warn_if_ORF_file_seems_to_small_according_to_duration_and_quality_indicator(oldfilename,
+                                                                                         regex_match.group('qualityindicator'),
+                                                                                         start_hrs, start_min, start_sec,
+                                                                                         end_hrs, end_min, end_sec)
+
+        if regex_match.group('sexpression'):
+            # the file name contained the optional chunk time-stamp(s)
+
+            ## Extra handling of this case:
+            ##     20230303T232946 ORF - Gute Nacht Österreich mit Peter Klien - Wirtschaftliche Probleme in Großbritannien -ORIGINALlow- 2023-03-03_2329_tl_01_Gute-Nacht-Oest_Wirtschaftliche__14170146__o__3365936366__s15349885_5__ORF1HD_00005621P_00105414P_Q4A.mp4
+            ##     2023-03-04T00.00.56 ORF - Gute Nacht Österreich mit Peter Klien - Wirtschaftliche Probleme in Großbritannien -- lowquality.mp4
+            ## ... the day should be incremented because this did start shortly before midnight but this part was started after midnight
+            ## -> When the actual start time (2nd timestamp in filename) is older than 10 hours compared to the file name start time, assume it is actually started after midnight.
+            ## exception: first time-stamp is "00:00:00" which stands for "unknown".
+            if (regex_match.group('hour') != '00' and regex_match.group('minute') != '00') and \
+               int(regex_match.group('hour')) > int(regex_match.group('hour2')) and \
+               int(regex_match.group('hour')) > int(regex_match.group('hour2')) + 10:
+                logging.debug('Correcting day of MediathekView file: file started after midnight, so I increment the day here.')
+                new_datestamp = self.get_incremented_date_string_from_named_groups(regex_match)
             else:
-                # the file name did NOT contain the optional chunk time-stamp(s), so we have to use the main time-stamp
-                newname = self.get_datetime_string_from_named_groups(regex_match) + \
-                    regex_match.group('channel') + ' - ' + self.get_unique_show_and_title(regex_match.group('show'), regex_match.group('title')) + ' -- ' + \
-                    qualitytag + '.mp4'
-            return newname.replace('_', ' ')
+                new_datestamp = self.get_date_string_from_named_groups(regex_match)
+
+            newname = new_datestamp + 'T' + \
+                regex_match.group('hour2') + '.' + regex_match.group('minute2') + '.' + regex_match.group('second2') + ' ' + \
+                regex_match.group('channel') + ' - ' + self.get_unique_show_and_title(regex_match.group('show'), regex_match.group('title')) + ' -- ' + \
+                qualitytag + '.mp4'
+        else:
+            # the file name did NOT contain the optional chunk time-stamp(s), so we have to use the main time-stamp
+            newname = self.get_datetime_string_from_named_groups(regex_match) + \
+                regex_match.group('channel') + ' - ' + self.get_unique_show_and_title(regex_match.group('show'), regex_match.group('title')) + ' -- ' + \
+                qualitytag + '.mp4'
+        return newname.replace('_', ' ')
 
+    def filename_rule_mediathekview_raw(self, oldfilename: str, entities: FilenameEntities,
+                                        regex_match: re.Match[str]) -> str | bool:
         # MEDIATHEKVIEW_RAW_REGEX_STRING:
         #             MediathekView ORF raw file name
         #
-        regex_match = re.match(self.MEDIATHEKVIEW_RAW_REGEX_STRING, oldfilename)
-        if regex_match:
-
-            logging.debug('Filename looks like ORF raw file name: MEDIATHEKVIEW_RAW_REGEX_STRING')
-
-            start_hrs = regex_match.group('hour2')
-            start_min = regex_match.group('minute2')
-            start_sec = regex_match.group('second2')
-            end_hrs = regex_match.group('hour3')
-            end_min = regex_match.group('minute3')
-            end_sec = regex_match.group('second3')
-            qualitytag = self.translate_ORF_quality_string_to_tag(regex_match.group('qualityindicator'))
-            self.warn_if_ORF_file_seems_to_small_according_to_duration_and_quality_indicator(oldfilename,
-                                                                                             regex_match.group('qualityindicator'),
-                                                                                             start_hrs, start_min, start_sec,
-                                                                                             end_hrs, end_min, end_sec)
-            # transform ...
-            # 'Am-Schauplatz_-_Alles f\xc3\xbcr die Katz-____'
-            # ... into ...
-            # 'Am Schauplatz - Alles f\xc3\xbcr die Katz'
-            title = regex_match.group('description').replace('-', ' ').replace('_ _', ' - ').replace('   ', ' - ').replace('_', '').strip()
-
-            newname = self.get_date_string_from_named_groups(regex_match) + 'T' + \
-                regex_match.group('hour2') + '.' + regex_match.group('minute2') + '.' + regex_match.group('second2') + ' ' + \
-                title + ' -- ' + qualitytag + '.mp4'
-            return newname.replace('_', ' ')
-
 
+        logging.debug('Filename looks like ORF raw file name: MEDIATHEKVIEW_RAW_REGEX_STRING')
+
+        start_hrs = regex_match.group('hour2')
+        start_min = regex_match.group('minute2')
+        start_sec = regex_match.group('second2')
+        end_hrs = regex_match.group('hour3')
+        end_min = regex_match.group('minute3')
+        end_sec = regex_match.group('second3')
+        qualitytag = self.translate_ORF_quality_string_to_tag(regex_match.group('qualityindicator'))
+        self.warn_if_ORF_file_seems_to_small_according_to_duration_and_quality_indicator(oldfilename,
+                                                                                         regex_match.group('qualityindicator'),
+                                                                                         start_hrs, start_min, start_sec,
+                                                                                         end_hrs, end_min, end_sec)
+        # transform ...
+        # 'Am-Schauplatz_-_Alles f\xc3\xbcr die Katz-____'
+        # ... into ...
+        # 'Am Schauplatz - Alles f\xc3\xbcr die Katz'
+        title = regex_match.group('description').replace('-', ' ').replace('_ _', ' - ').replace('   ', ' - ').replace('_', '').strip()
+
+        newname = self.get_date_string_from_named_groups(regex_match) + 'T' + \
+            regex_match.group('hour2') + '.' + regex_match.group('minute2') + '.' + regex_match.group('second2') + ' ' + \
+            title + ' -- ' + qualitytag + '.mp4'
+        return newname.replace('_', ' ')
+
+    def filename_rule_mediathekview_long_without_detailed_timestamps(self, oldfilename: str, entities: FilenameEntities,
+                                                                     regex_match: re.Match[str]) -> str | bool:
         # MEDIATHEKVIEW_LONG_WITHOUT_DETAILED_TIMESTAMPS_REGEX:
         # MediathekView was able to generate the full length file name including
         # the full length original file name which DOES NOT contain the detailed begin- and
@@ -465,17 +2394,17 @@ class GuessFilename(object):
         # with the quality indicator Q4A or Q8C when used with the ORF sender file format.
         #
         # example: 20180608T193000 ORF - Österreich Heute HD 10min - Das Magazin - Österreich Heute - Das Magazin -ORIGINAL- 13979231_0007_Q8C.mp4
-        regex_match = re.match(self.MEDIATHEKVIEW_LONG_WITHOUT_DETAILED_TIMESTAMPS_REGEX, oldfilename)
-        if regex_match:
-            logging.debug('Filename did not contain detailed start- and end-timestamps. Using the time-stamp ' + \
-                          'of the chunk itself as a fall-back: MEDIATHEKVIEW_LONG_WITHOUT_DETAILED_TIMESTAMPS_REGEX')
-            qualitytag = self.translate_ORF_quality_string_to_tag(regex_match.group('qualityindicator'))
+        logging.debug('Filename did not contain detailed start- and end-timestamps. Using the time-stamp ' + \
+                      'of the chunk itself as a fall-back: MEDIATHEKVIEW_LONG_WITHOUT_DETAILED_TIMESTAMPS_REGEX')
+        qualitytag = self.translate_ORF_quality_string_to_tag(regex_match.group('qualityindicator'))
 
-            newname = self.get_datetime_string_from_named_groups(regex_match) + ' ' + \
-                regex_match.group('channel') + ' - ' + self.get_unique_show_and_title(regex_match.group('show'), regex_match.group('title')) + ' -- ' + \
-                qualitytag + '.mp4'
-            return newname.replace('_', ' ')
+        newname = self.get_datetime_string_from_named_groups(regex_match) + ' ' + \
+            regex_match.group('channel') + ' - ' + self.get_unique_show_and_title(regex_match.group('show'), regex_match.group('title')) + ' -- ' + \
+            qualitytag + '.mp4'
+        return newname.replace('_', ' ')
 
+    def filename_rule_mediathekview_short(self, oldfilename: str, entities: FilenameEntities,
+                                          regex_match: re.Match[str]) -> str | bool | None:
         # SHORT_REGEX: if MediathekView is NOT able to generate the full length file name because
         #              of file name length restrictions, this RegEx is a fall-back in order to
         #              recognize the situation. This is clearly visible due to the missing closing
@@ -493,131 +2422,136 @@ class GuessFilename(object):
         # http://apasfpd.apa.at/cms-worldwide/online/549c11b7cf10c9a232361003d78e5335/1528531468/2018-06-08_2140_tl_01_Was-gibt-es-Neu_Promifrage-gest__13979244__o__1391278651__s14313058_8__BCK1HD_22050122P_22091314P_Q6A.mp4
         # HD URL:
         # http://apasfpd.apa.at/cms-worldwide/online/6ade5772382b0833525870b4a290692c/1528531468/2018-06-08_2140_tl_01_Was-gibt-es-Neu_Promifrage-gest__13979244__o__1391278651__s14313058_8__BCK1HD_22050122P_22091314P_Q8C.mp4
-        regex_match = re.match(self.MEDIATHEKVIEW_SHORT_REGEX, oldfilename)
-        if regex_match:
 
-            logging.debug('Filename did not contain detailed start- and end-timestamps and no quality indicators. Using the time-stamp '
-                          + 'of the "Film-URL" as a fall-back: MEDIATHEKVIEW_SHORT_REGEX + FILM_URL_REGEX')
+        logging.debug('Filename did not contain detailed start- and end-timestamps and no quality indicators. Using the time-stamp '
+                      + 'of the "Film-URL" as a fall-back: MEDIATHEKVIEW_SHORT_REGEX + FILM_URL_REGEX')
 
-            if regex_match.group('details') == 'playlist.m3u8' and regex_match.group('qualityshort'):
-                # We got this simple case of failing to get "original filename" from MediathekView download source:
-                # '20181028T201400 ORF - Tatort - Tatort_ Blut -ORIGINALhd- playlist.m3u8.mp4'
-                # There is NO original filename containing the starting time :-(
-                # (see unit tests for details)
+        if regex_match.group('details') == 'playlist.m3u8' and regex_match.group('qualityshort'):
+            # We got this simple case of failing to get "original filename" from MediathekView download source:
+            # '20181028T201400 ORF - Tatort - Tatort_ Blut -ORIGINALhd- playlist.m3u8.mp4'
+            # There is NO original filename containing the starting time :-(
+            # (see unit tests for details)
 
-                # "lowquality" or "highquality" or "UNKNOWNQUALITY"
-                qualitytag = self.translate_ORF_quality_string_to_tag(regex_match.group('qualityshort').upper())
+            # "lowquality" or "highquality" or "UNKNOWNQUALITY"
+            qualitytag = self.translate_ORF_quality_string_to_tag(regex_match.group('qualityshort').upper())
 
-                return self.get_datetime_string_from_named_groups(regex_match) + ' ' + regex_match.group('channel') + \
-                    ' - ' + self.get_unique_show_and_title(regex_match.group('show'), regex_match.group('title')) + ' -- ' + qualitytag + '.mp4'
+            return self.get_datetime_string_from_named_groups(regex_match) + ' ' + regex_match.group('channel') + \
+                ' - ' + self.get_unique_show_and_title(regex_match.group('show'), regex_match.group('title')) + ' -- ' + qualitytag + '.mp4'
 
-            else:
-                # we got the ability to derive starting time from "original filename"
-                logging.warning('I recognized a MediathekView file which has a cut-off time-stamp because ' +
-                                'of file name length restrictions.\nYou can fix it manually:')
-
-                url_valid = False
-                while not url_valid:
-
-                    film_url = input("\nPlease enter: MediathekView > context menu of the " +
-                                     "corresponding chunk > \"Film-URL kopieren\":\n")
-
-                    # URL has format like: http://apasfpd.apa.at/cms-worldwide/online/7db1010b02753288e65ff61d5e1dff58/1528531468/2018-06-08_2140_tl_01_Was-gibt-es-Neu_Promifrage-gest__13979244__o__1391278651__s14313058_8__BCK1HD_22050122P_22091314P_Q4A.mp4
-                    # but with varying quality indicator: Q4A (low), Q6A (high), Q8C (HD)
-                    film_regex_match = re.match(self.FILM_URL_REGEX, film_url)
-
-                    def compare_YMDhm(regex_match: re.Match[str], film_regex_match: re.Match[str]) -> bool:
-                        "Compare, if date and time are same in both regex_match"
-                        return regex_match.group('year') == film_regex_match.group('year') and \
-                            regex_match.group('month') == film_regex_match.group('month') and \
-                            regex_match.group('day') == film_regex_match.group('day') and \
-                            regex_match.group('hour') == film_regex_match.group('hour') and \
-                            regex_match.group('minute') == film_regex_match.group('minute')
-
-                    if not film_regex_match:
-                        print()
-                        logging.warning(self.FILM_URL_REGEX_MISMATCH_HELP_TEXT)
-                        logging.debug('entered film_url:\n' + film_url)
-                    elif not compare_YMDhm(regex_match, film_regex_match):
-                        # example: ('2020', '02', '29', '19', '30')
-                        logging.debug('plausibility check fails: date and time of the chunks differ: \nselected regex_match.groups is   "' +
-                                      self.get_datetime_string_from_named_groups(regex_match) + '" which does not match\nselected film_regex_match.groups "' +
-                                      self.get_datetime_string_from_named_groups(film_regex_match) + '". Maybe adapt the potentially changed index group numbers due to changed RegEx?')
-                        logging.warning('Sorry, there is a mismatch of the date and time contained between the filename (' +
-                                        self.get_datetime_string_from_named_groups(regex_match) +
-                                        ') and the URL pasted (' +
-                                        self.get_datetime_string_from_named_groups(film_regex_match) +
-                                        '). Please try again with the correct URL ...')
-                    else:
-                        url_valid = True
+        else:
+            # we got the ability to derive starting time from "original filename"
+            logging.warning('I recognized a MediathekView file which has a cut-off time-stamp because ' +
+                            'of file name length restrictions.\nYou can fix it manually:')
+
+            if not self.interactive:
+                # no other rule should rename the file before it is fixed manually:
+                logging.warning('I can not ask for the "Film-URL" because I am running non-interactively.')
+                return None
+
+            url_valid = False
+            while not url_valid:
+
+                film_url = input("\nPlease enter: MediathekView > context menu of the " +
+                                 "corresponding chunk > \"Film-URL kopieren\":\n")
+
+                # URL has format like: http://apasfpd.apa.at/cms-worldwide/online/7db1010b02753288e65ff61d5e1dff58/1528531468/2018-06-08_2140_tl_01_Was-gibt-es-Neu_Promifrage-gest__13979244__o__1391278651__s14313058_8__BCK1HD_22050122P_22091314P_Q4A.mp4
+                # but with varying quality indicator: Q4A (low), Q6A (high), Q8C (HD)
+                film_regex_match = re.match(self.FILM_URL_REGEX, film_url)
+
+                def compare_YMDhm(regex_match: re.Match[str], film_regex_match: re.Match[str]) -> bool:
+                    "Compare, if date and time are same in both regex_match"
+                    return regex_match.group('year') == film_regex_match.group('year') and \
+                        regex_match.group('month') == film_regex_match.group('month') and \
+                        regex_match.group('day') == film_regex_match.group('day') and \
+                        regex_match.group('hour') == film_regex_match.group('hour') and \
+                        regex_match.group('minute') == film_regex_match.group('minute')
+
+                if not film_regex_match:
+                    print()
+                    logging.warning(self.FILM_URL_REGEX_MISMATCH_HELP_TEXT)
+                    logging.debug('entered film_url:\n' + film_url)
+                elif not compare_YMDhm(regex_match, film_regex_match):
+                    # example: ('2020', '02', '29', '19', '30')
+                    logging.debug('plausibility check fails: date and time of the chunks differ: \nselected regex_match.groups is   "' +
+                                  self.get_datetime_string_from_named_groups(regex_match) + '" which does not match\nselected film_regex_match.groups "' +
+                                  self.get_datetime_string_from_named_groups(film_regex_match) + '". Maybe adapt the potentially changed index group numbers due to changed RegEx?')
+                    logging.warning('Sorry, there is a mismatch of the date and time contained between the filename (' +
+                                    self.get_datetime_string_from_named_groups(regex_match) +
+                                    ') and the URL pasted (' +
+                                    self.get_datetime_string_from_named_groups(film_regex_match) +
+                                    '). Please try again with the correct URL ...')
+                else:
+                    url_valid = True
 
-                # "lowquality" or "highquality" or "UNKNOWNQUALITY"
-                assert film_regex_match
-                qualitytag = self.translate_ORF_quality_string_to_tag(film_regex_match.group(len(film_regex_match.groups())).upper())
+            # "lowquality" or "highquality" or "UNKNOWNQUALITY"
+            assert film_regex_match
+            qualitytag = self.translate_ORF_quality_string_to_tag(film_regex_match.group(len(film_regex_match.groups())).upper())
 
-                # e.g., "2018-06-08T"
-                #datestamp = self.build_string_via_indexgroups(regex_match, [1, '-', 2, '-', 3, 'T'])
-                datestamp = self.get_date_string_from_named_groups(regex_match) + 'T'
+            # e.g., "2018-06-08T"
+            #datestamp = self.build_string_via_indexgroups(regex_match, [1, '-', 2, '-', 3, 'T'])
+            datestamp = self.get_date_string_from_named_groups(regex_match) + 'T'
 
-                # e.g., "22.05.01 "
-                #timestamp = self.build_string_via_indexgroups(film_regex_match, [10, '.', 11, '.', 12, ' '])
-                timestamp = film_regex_match.group('hour2') + '.' + film_regex_match.group('minute2') + '.' + film_regex_match.group('second2') + ' '
+            # e.g., "22.05.01 "
+            #timestamp = self.build_string_via_indexgroups(film_regex_match, [10, '.', 11, '.', 12, ' '])
+            timestamp = film_regex_match.group('hour2') + '.' + film_regex_match.group('minute2') + '.' + film_regex_match.group('second2') + ' '
 
-                # e.g., "ORF - Was gibt es Neues? - Promifrage gestellt von Helmut Bohatsch_ Wie vergewisserte sich der Bischof von New York 1877, dass das erste Tonaufnahmegerät kein Teufelswerk ist? -- lowquality.mp4"
-                #description = self.build_string_via_indexgroups(regex_match, [8, ' - ', 9, ' - ', 10, ' -- ', qualitytag, '.mp4'])
-                description = regex_match.group('channel') + ' - ' + regex_match.group('show') + ' - ' + \
-                    regex_match.group('title') + ' -- ' + qualitytag + '.mp4'
+            # e.g., "ORF - Was gibt es Neues? - Promifrage gestellt von Helmut Bohatsch_ Wie vergewisserte sich der Bischof von New York 1877, dass das erste Tonaufnahmegerät kein Teufelswerk ist? -- lowquality.mp4"
+            #description = self.build_string_via_indexgroups(regex_match, [8, ' - ', 9, ' - ', 10, ' -- ', qualitytag, '.mp4'])
+            description = regex_match.group('channel') + ' - ' + regex_match.group('show') + ' - ' + \
+                regex_match.group('title') + ' -- ' + qualitytag + '.mp4'
 
-                # combining them all to one final filename:
-                return datestamp + timestamp + description
+            # combining them all to one final filename:
+            return datestamp + timestamp + description
 
+    def filename_rule_img(self, oldfilename: str, entities: FilenameEntities,
+                          regex_match: re.Match[str]) -> str | bool:
         # digital camera images: IMG_20161014_214404 foo bar.jpg -> 2016-10-14T21.44.04 foo bar.jpg  OR
-        regex_match = re.match(self.IMG_REGEX, oldfilename)
-        if regex_match:
-            if regex_match.group('bokeh') and regex_match.group('description'):
-                return self.get_datetime_string_from_named_groups(regex_match) + ' Bokeh' + regex_match.group('description') + '.jpg'
-            elif not regex_match.group('bokeh') and regex_match.group('description'):
-                return self.get_datetime_string_from_named_groups(regex_match) + regex_match.group('description') + '.jpg'
-            elif regex_match.group('bokeh') and not regex_match.group('description'):
-                return self.get_datetime_string_from_named_groups(regex_match) + ' Bokeh' + '.jpg'
-            else:
-                return self.get_datetime_string_from_named_groups(regex_match) + '.jpg'
+        if regex_match.group('bokeh') and regex_match.group('description'):
+            return self.get_datetime_string_from_named_groups(regex_match) + ' Bokeh' + regex_match.group('description') + '.jpg'
+        elif not regex_match.group('bokeh') and regex_match.group('description'):
+            return self.get_datetime_string_from_named_groups(regex_match) + regex_match.group('description') + '.jpg'
+        elif regex_match.group('bokeh') and not regex_match.group('description'):
+            return self.get_datetime_string_from_named_groups(regex_match) + ' Bokeh' + '.jpg'
+        else:
+            return self.get_datetime_string_from_named_groups(regex_match) + '.jpg'
+
+    def filename_rule_vid(self, oldfilename: str, entities: FilenameEntities,
+                          regex_match: re.Match[str]) -> str | bool:
         # VID_20170105_173104.mp4         -> 2017-01-05T17.31.04.mp4
-        regex_match = re.match(self.VID_REGEX, oldfilename)
-        if regex_match:
-            return self.get_datetime_description_extension_filename(regex_match, replace_description_underscores=True)
+        return self.get_datetime_description_extension_filename(regex_match, replace_description_underscores=True)
 
+    def filename_rule_signal(self, oldfilename: str, entities: FilenameEntities,
+                             regex_match: re.Match[str]) -> str | bool:
         # 2018-04-01:
         # signal-2018-03-08-102332.jpg → 2018-03-08T10.23.32.jpg
         # signal-2018-03-08-102332 foo bar.jpg → 2018-03-08T10.23.32 foo bar.jpg
         # signal-attachment-2019-11-23-090716_001.jpeg -> 2019-11-23T09.07.16_001.jpeg
-        regex_match = re.match(self.SIGNAL_REGEX, oldfilename)
-        if regex_match:
-            return self.get_datetime_description_extension_filename(regex_match, replace_description_underscores=True)
+        return self.get_datetime_description_extension_filename(regex_match, replace_description_underscores=True)
 
+    def filename_rule_modet(self, oldfilename: str, entities: FilenameEntities,
+                            regex_match: re.Match[str]) -> str | bool:
         # 2018-03-27:
         # modet_2018-03-27_16-10.mkv
         # modet_2018-03-27_17-44-1.mkv
-        regex_match = re.match(self.MODET_REGEX, oldfilename)
-        if regex_match:
-            if regex_match.group('description'):
-                return self.get_datetime_string_from_named_groups(regex_match) + ' modet ' + regex_match.group('description') + '.mkv'
-            else:
-                return self.get_datetime_string_from_named_groups(regex_match) + ' modet' + '.mkv'
+        if regex_match.group('description'):
+            return self.get_datetime_string_from_named_groups(regex_match) + ' modet ' + regex_match.group('description') + '.mkv'
+        else:
+            return self.get_datetime_string_from_named_groups(regex_match) + ' modet' + '.mkv'
 
+    def filename_rule_recorder(self, oldfilename: str, entities: FilenameEntities,
+                               regex_match: re.Match[str]) -> str | bool:
         # 2017-11-30:
         # rec_20171129-0902 A nice recording .wav -> 2017-11-29T09.02 A nice recording.wav
         # rec_20171129-0902 A nice recording.wav  -> 2017-11-29T09.02 A nice recording.wav
         # rec_20171129-0902.wav -> 2017-11-29T09.02.wav
         # rec_20171129-0902.mp3 -> 2017-11-29T09.02.mp3
-        regex_match = re.match(self.RECORDER_REGEX, oldfilename)
-        if regex_match:
-            return self.get_datetime_description_extension_filename(regex_match, replace_description_underscores=True)
+        return self.get_datetime_description_extension_filename(regex_match, replace_description_underscores=True)
 
+    def filename_rule_oekostrom_teilbetragsrechnung(self, oldfilename: str, entities: FilenameEntities,
+                                                    regex_match: re.Match[str] | None) -> str | bool:
         # 2019-04-01 oekostrom AG - Teilbetragsrechnung Stromverbrauch 54 EUR -- scan bill.pdf
-        if 'teilbetragsrechnung' in oldfilename.lower() and \
-           'oekostrom' in oldfilename.lower() and \
-           datetimestr and self.has_euro_charge(oldfilename):
+        datetimestr, _, tags, _ = entities
+        if datetimestr and self.has_euro_charge(oldfilename):
             euro_charge = self.get_euro_charge(oldfilename)
             assert isinstance(euro_charge, str)
             return datetimestr + \
@@ -625,29 +2559,42 @@ class GuessFilename(object):
                 euro_charge + \
                 "€ -- " + ' '.join(self.adding_tags(tags, ['scan', 'bill'])) + \
                 ".pdf"
+        return False
 
+    def filename_rule_a1_festnetz_internet(self, oldfilename: str, entities: FilenameEntities,
+                                           regex_match: re.Match[str] | None) -> str | bool:
         # 2015-11-24 Rechnung A1 Festnetz-Internet 12,34€ -- scan bill.pdf
-        if self.contains_one_of(oldfilename, [" A1 ", " a1 "]) and self.has_euro_charge(oldfilename) and datetimestr:
+        datetimestr, _, tags, _ = entities
+        if self.has_euro_charge(oldfilename) and datetimestr:
             euro_charge = self.get_euro_charge(oldfilename)
             assert isinstance(euro_charge, str)
             return datetimestr + \
                 " A1 Festnetz-Internet " + euro_charge + \
                 "€ -- " + ' '.join(self.adding_tags(tags, ['scan', 'bill'])) + \
                 ".pdf"
+        return False
 
+    def filename_rule_gvb_10er_block(self, oldfilename: str, entities: FilenameEntities,
+                                     regex_match: re.Match[str] | None) -> str | bool:
         # 2016-01-19--2016-02-12 benutzter GVB 10er Block -- scan transportation graz.pdf
-        if self.contains_one_of(oldfilename, ["10er"]) and datetimestr:
+        datetimestr, _, tags, _ = entities
+        if datetimestr:
             return datetimestr + \
                 " benutzter GVB 10er Block" + \
                 " -- " + ' '.join(self.adding_tags(tags, ['scan', 'transportation', 'graz'])) + \
                 ".pdf"
+        return False
 
+    def filename_rule_bill(self, oldfilename: str, entities: FilenameEntities,
+                           regex_match: re.Match[str] | None) -> str | bool:
         # 2016-01-19 bill foobar baz 12,12EUR.pdf -> 2016-01-19 foobar baz 12,12€ -- scan bill.pdf
-        if 'bill' in oldfilename and datetimestr and self.has_euro_charge(oldfilename):
+        datetimestr, basefilename, tags, _ = entities
+        if datetimestr and self.has_euro_charge(oldfilename):
             return datetimestr + ' ' + \
                 basefilename.replace(' bill', ' ').replace('bill ', ' ').replace('  ', ' ').replace('EUR', '€').strip() + \
                 " -- " + ' '.join(self.adding_tags(tags, ['scan', 'bill'])) + \
                 ".pdf"
+        return False
 
 #        # 2015-04-30 FH St.Poelten - Abrechnungsbeleg 12,34 EUR - Honorar -- scan fhstp.pdf
 #        if self.contains_all_of(oldfilename, [" FH ", "Abrechnungsbeleg"]) and self.has_euro_charge(oldfilename) and datetimestr:
@@ -670,58 +2617,77 @@ class GuessFilename(object):
 #                "€ -- " + ' '.join(self.adding_tags(tags, ['scan', 'rise'])) + \
 #                ".pdf"
 
+    def filename_rule_games(self, oldfilename: str, entities: FilenameEntities,
+                            regex_match: re.Match[str] | None) -> str | bool:
         # 2012-05-26T22.25.12_IMAG0861 Rage Ergebnis - MITSPIELER -- games.jpg
+        datetimestr, basefilename, _, extension = entities
         if self.contains_one_of(basefilename, ["Hive", "Rage", "Stratego"]) and \
            extension is not None and extension.lower() == 'jpg' and not self.has_euro_charge(oldfilename):
             assert datetimestr is not None
             return datetimestr + basefilename + \
                 " - Ergebnis -- games" + \
                 ".jpg"
+        return False
 
+    def filename_rule_vbv_kontoinformation(self, oldfilename: str, entities: FilenameEntities,
+                                           regex_match: re.Match[str] | None) -> str | bool:
         # 2015-03-11 VBV Kontoinformation 123 EUR -- scan finance infonova.pdf
-        if self.contains_all_of(oldfilename, ["VBV", "Kontoinformation"]) and self.has_euro_charge(oldfilename) and datetimestr:
+        datetimestr, _, tags, _ = entities
+        if self.has_euro_charge(oldfilename) and datetimestr:
             euro_charge = self.get_euro_charge(oldfilename)
             assert isinstance(euro_charge, str)
             return datetimestr + \
                 " VBV Kontoinformation " + euro_charge + \
                 "€ -- " + ' '.join(self.adding_tags(tags, ['scan', 'finance', 'infonova'])) + \
                 ".pdf"
+        return False
 
+    def filename_rule_verbrauchsablesung_wasser(self, oldfilename: str, entities: FilenameEntities,
+                                                regex_match: re.Match[str] | None) -> str | bool:
         # 2015-03-11 Verbrauchsablesung Wasser - Holding Graz -- scan bwg.pdf
-        if self.contains_all_of(oldfilename, ["Verbrauchsablesung", "Wasser"]) and datetimestr:
+        datetimestr, _, tags, _ = entities
+        if datetimestr:
             return datetimestr + \
                 " Verbrauchsablesung Wasser - Holding Graz -- " + \
                 ' '.join(self.adding_tags(tags, ['scan', 'bwg'])) + \
                 ".pdf"
+        return False
 
+    def filename_rule_hipster_pda(self, oldfilename: str, entities: FilenameEntities,
+                                  regex_match: re.Match[str] | None) -> str | bool:
         # 2017-09-23 Hipster-PDA file: 2017-08-16-2017-09-23 Hipster-PDA vollgeschrieben -- scan notes.(png|pdf)
-        if datetimestr and self.contains_one_of(oldfilename, ["hipster", "Hipster"]):
+        datetimestr, _, _, extension = entities
+        if datetimestr:
             assert extension is not None
             return datetimestr + ' Hipster-PDA vollgeschrieben -- scan notes.' + extension
+        return False
 
+    def filename_rule_misc_screenshot(self, oldfilename: str, entities: FilenameEntities,
+                                      regex_match: re.Match[str]) -> str | bool:
         # Screenshot_2013-03-05-08-14-09.png -> 2013-03-05T08.14.09 -- android screenshots.png
-        regex_match = re.match(self.MISC_SCREENSHOT_REGEX, oldfilename)
-        if regex_match:
-            if regex_match.group('description'):
-                return self.get_datetime_string_from_named_groups(regex_match) + regex_match.group('description') + ' -- screenshots.' + regex_match.group('extension')
-            else:
-                return self.get_datetime_string_from_named_groups(regex_match) + ' -- screenshots.' + regex_match.group('extension')
+        if regex_match.group('description'):
+            return self.get_datetime_string_from_named_groups(regex_match) + regex_match.group('description') + ' -- screenshots.' + regex_match.group('extension')
+        else:
+            return self.get_datetime_string_from_named_groups(regex_match) + ' -- screenshots.' + regex_match.group('extension')
 
+    def filename_rule_easy_screenshot(self, oldfilename: str, entities: FilenameEntities,
+                                      regex_match: re.Match[str]) -> str | bool:
         # 2018-05-05: Files generated by "Easy Screenshot" (Firefox add-on)
         # Firefox_Screenshot_2018-05-03T20-07-14.972Z.png
-        regex_match = re.match(self.EASY_SCREENSHOT_REGEX, oldfilename)
-        if regex_match:
-            return self.get_datetime_string_from_named_groups(regex_match) + ' Firefox - -- screenshots.' + regex_match.group('extension')
+        return self.get_datetime_string_from_named_groups(regex_match) + ' Firefox - -- screenshots.' + regex_match.group('extension')
 
+    def filename_rule_osmtrack(self, oldfilename: str, entities: FilenameEntities,
+                               regex_match: re.Match[str]) -> str | bool:
         # 2017-12-07_09-23_Thu Went for a walk .gpx
         # 2015-05-27T09;00;15_foo_bar.gpx -> 2015-05-27T09.00.15 foo bar.gpx
-        regex_match = re.match(self.OSMTRACK_REGEX, oldfilename)
-        if regex_match:
-            return self.get_datetime_description_extension_filename(regex_match, replace_description_underscores=True)
+        return self.get_datetime_description_extension_filename(regex_match, replace_description_underscores=True)
 
+    def filename_rule_boox_exported(self, oldfilename: str, entities: FilenameEntities,
+                                    regex_match: re.Match[str] | None) -> str | bool:
         # 2019-10-10: '2019-10-10 a file exported by Boox Max 2-Exported.pdf' or
         #             '2019-10-10 a file exported by Boox Max 2 -- notes-Exported.pdf' become
         #         ->  '2019-10-10 a file exported by Boox Max 2 -- notes.pdf'
+        _, _, _, extension = entities
         if extension is not None and extension.upper() == "PDF" and oldfilename.upper().endswith('-EXPORTED.PDF'):
             if self.contains_all_of(oldfilename, [" -- ", " notes"]):
                 # FIXXME: assumption is that "notes" is within the
@@ -737,72 +2703,87 @@ class GuessFilename(object):
                     # no filetags found so far:
                     # '2019-10-10 a file exported by Boox Max 2-Exported.pdf'
                     return oldfilename[:-13] + ' -- notes.pdf'
+        return False
 
+    def filename_rule_newspaper1(self, oldfilename: str, entities: FilenameEntities,
+                                 regex_match: re.Match[str]) -> str | bool:
         # 2019-12-04: NEWSPAPER1_REGEX such as : "Die Presse (31.10.2019) - Unknown.pdf" -> "2019-10-31 Die Presse.pdf"
-        regex_match = re.match(self.NEWSPAPER1_REGEX, oldfilename)
-        if regex_match:
-            return self.get_date_description_extension_filename(regex_match, replace_description_underscores=True)
+        return self.get_date_description_extension_filename(regex_match, replace_description_underscores=True)
 
+    def filename_rule_smartrec(self, oldfilename: str, entities: FilenameEntities,
+                               regex_match: re.Match[str]) -> str | bool:
         # 20200224-0914_Foo_bar.wav
-        regex_match = re.match(self.SMARTREC_REGEX, oldfilename)
-        if regex_match:
-            return self.get_datetime_description_extension_filename(regex_match, replace_description_underscores=True)
+        return self.get_datetime_description_extension_filename(regex_match, replace_description_underscores=True)
 
+    def filename_rule_presse(self, oldfilename: str, entities: FilenameEntities,
+                             regex_match: re.Match[str]) -> str | bool:
         # 2020-03-04: "2020-03-04_DiePresse_Faktura-123456789.pdf" → "2020-03-04 Die Presse - Aborechnung Faktura-123456789 -- bill.pdf"
         # PRESSE_REGEX = re.compile(DATESTAMP_REGEX + '.+Presse.+Faktura-(.+)\.pdf'
-        regex_match = re.match(self.PRESSE_REGEX, oldfilename)
-        if regex_match:
-            return self.get_date_string_from_named_groups(regex_match) + ' Die Presse - Aborechnung Faktura-' + regex_match.group('number') + " -- bill.pdf"
+        return self.get_date_string_from_named_groups(regex_match) + ' Die Presse - Aborechnung Faktura-' + regex_match.group('number') + " -- bill.pdf"
 
+    def filename_rule_anwesenheitsbestaetigung(self, oldfilename: str, entities: FilenameEntities,
+                                               regex_match: re.Match[str] | None) -> str | bool:
         # 2020-03-05: "2020-03-03 Anwesenheitsbestaetigung.pdf"
-        if extension is not None and extension.upper() == "PDF" and datetimestr and 'Anwesenheitsbest' in oldfilename:
+        datetimestr, _, _, extension = entities
+        if extension is not None and extension.upper() == "PDF" and datetimestr:
             return datetimestr + ' BHAK Anwesenheitsbestaetigung -- scan.' + extension
+        return False
 
+    def filename_rule_konicaminolta(self, oldfilename: str, entities: FilenameEntities,
+                                    regex_match: re.Match[str]) -> str | bool:
         # 2020-05-29: Konica Minolta scan file-names: YYMMDDHHmmx
         # KonicaMinolta_TIME_REGEX = re.compile('(?P<truncatedyear>\d{2})(?P<month>[01]\d)(?P<day>[0123]\d)(?P<hour>[012]\d)(?P<minute>[012345]\d)(?P<index>\d)(_(?P<subindex>\d\d\d\d))?.pdf')
-        regex_match = re.match(self.KonicaMinolta_TIME_REGEX, oldfilename)
-        if regex_match:
-            if regex_match.group('subindex'):
-                subindex_str = ' ' + regex_match.group('subindex')
-            else:
-                subindex_str = ''
-            ## re-use index number at the end as first digit of seconds and hope that not more than 5 documents are scanned within a minute:
-            return '20' + regex_match.group('truncatedyear') + '-' + regex_match.group('month') + '-' + regex_match.group('day') + 'T' + \
-                regex_match.group('hour') + '.' + regex_match.group('minute') + '.' + regex_match.group('index') + '0' + subindex_str +' -- scan.pdf'
+        if regex_match.group('subindex'):
+            subindex_str = ' ' + regex_match.group('subindex')
+        else:
+            subindex_str = ''
+        ## re-use index number at the end as first digit of seconds and hope that not more than 5 documents are scanned within a minute:
+        return '20' + regex_match.group('truncatedyear') + '-' + regex_match.group('month') + '-' + regex_match.group('day') + 'T' + \
+            regex_match.group('hour') + '.' + regex_match.group('minute') + '.' + regex_match.group('index') + '0' + subindex_str +' -- scan.pdf'
 
+    def filename_rule_gif_screencast(self, oldfilename: str, entities: FilenameEntities,
+                                     regex_match: re.Match[str]) -> str | bool:
         # 2020-06-05: Emacs gif-screencast: output-2020-06-05-11:28:16.gif
-        regex_match = re.match(self.GIF_SCREENCAST_REGEX, oldfilename)
-        if regex_match:
-            ## re-use index number at the end as first digit of seconds and hope that not more than 5 documents are scanned within a minute:
-            return regex_match.group('year') + '-' + regex_match.group('month') + '-' + regex_match.group('day') + 'T' + \
-                regex_match.group('hour') + '.' + regex_match.group('minute') + '.' + regex_match.group('second') + " -- emacs screencasts.gif"
+        ## re-use index number at the end as first digit of seconds and hope that not more than 5 documents are scanned within a minute:
+        return regex_match.group('year') + '-' + regex_match.group('month') + '-' + regex_match.group('day') + 'T' + \
+            regex_match.group('hour') + '.' + regex_match.group('minute') + '.' + regex_match.group('second') + " -- emacs screencasts.gif"
 
+    def filename_rule_voltino(self, oldfilename: str, entities: FilenameEntities,
+                              regex_match: re.Match[str] | None) -> str | bool:
         # 2021-07-04 Stromrechnung Voltino
-        if datetimestr and self.contains_all_of(oldfilename, ["TZ-Vorschreibung", self.config.VOLTINO_Kundennummer]):
+        datetimestr, _, tags, _ = entities
+        if datetimestr:
             result: str = datetimestr + \
                 " Voltino Vorschreibung Teilbetrag " + self.config.VOLTINO_Teilbetrag + " -- " + ' '.join(self.adding_tags(tags, ['bill'])) + \
                 ".pdf"
             return result
+        return False
 
+    def filename_rule_rechtschutzversicherung(self, oldfilename: str, entities: FilenameEntities,
+                                              regex_match: re.Match[str] | None) -> str | bool:
         # 2022-06-17 Rechtschutzversicherung
-        if self.config.RECHTSCHUTZVERSICHERUNG in oldfilename and 'Wertanpassung' in oldfilename and datetimestr and self.has_euro_charge(oldfilename):
+        datetimestr, _, _, _ = entities
+        if datetimestr and self.has_euro_charge(oldfilename):
             euro_charge = self.get_euro_charge(oldfilename)
             assert isinstance(euro_charge, str)
             result2: str = datetimestr + ' ' + self.config.RECHTSCHUTZVERSICHERUNG + ' ' + self.config.RECHTSCHUTZPOLIZZE + \
                 ' - Wertanpassung monatliche Versicherungspraemie auf ' + euro_charge + '€ -- scan.pdf'
             return result2
+        return False
 
+    def filename_rule_kvr(self, oldfilename: str, entities: FilenameEntities,
+                          regex_match: re.Match[str]) -> str | bool:
         # KVR-2022-08-09-14-00-16.txt -> 2022-08-09T14.00.16.mp4
-        regex_match = re.match(self.KVR_REGEX, oldfilename)
-        if regex_match:
-            return self.get_datetime_description_extension_filename(regex_match, replace_description_underscores=True)
+        return self.get_datetime_description_extension_filename(regex_match, replace_description_underscores=True)
 
+    def filename_rule_oemag(self, oldfilename: str, entities: FilenameEntities,
+                            regex_match: re.Match[str]) -> str | bool:
         # ÖMAG "2023-09-27_OeMAG_Einspeisentgelt Nr. 0004313038.PDF" → "2023-09-27 OeMAG Einspeisentgelt Nr. 0004313038 15,70€ -- bill.pdf"
-        regex_match = re.match(self.OEMAG_REGEX, oldfilename)
-        if regex_match:
-            return regex_match.group('year') + '-' + regex_match.group('month') + '-' + regex_match.group('day') + \
-                ' OeMAG Einspeisentgelt Nr. 0004313038 € -- bill.pdf'
+        return regex_match.group('year') + '-' + regex_match.group('month') + '-' + regex_match.group('day') + \
+            ' OeMAG Einspeisentgelt Nr. 0004313038 € -- bill.pdf'
 
+    def filename_rule_callrecord(self, oldfilename: str, entities: FilenameEntities,
+                                 regex_match: re.Match[str] | None) -> str | bool:
         # CallRecord_20240925-225756_+4366012345678.abc → 2024-09-25T22.57.56 Call record - +4366012345678.abc
         if oldfilename.startswith('CallRecord_'):
             regex_match = re.match(self.CALLRECORD_REGEX, oldfilename)
@@ -811,11 +2792,7 @@ class GuessFilename(object):
                     regex_match.group('hour') + '.' + regex_match.group('minute') + '.' + regex_match.group('second') + f" Call record - {regex_match.group('number')}.{regex_match.group('extension')}"
             else:
                 logging.warning('File name starts with "CallRecord_" but CALLRECORD_REGEX did not match: ' + oldfilename)
-
-        
-        # FIXXME: more cases!
-
-        return False  # no new filename found
+        return False
 
     def derive_new_filename_from_content(self, dirname: str, basename: str) -> str | bool:
         """
@@ -837,7 +2814,68 @@ class GuessFilename(object):
             logging.debug("File is not a PDF file and thus can't be parsed by this script: %s" % filename)
             return False
 
-#        try:
+        # the pages are extracted when the rules ask for them (see PdfDocument):
+        document = PdfDocument(filename, self.open_pdf, self.pdf_text_cache)
+        self.content_document = document
+
+        #import pudb; pu.db
+        
+        entities: FilenameEntities = (datetimestr, basefilename, tags, extension)
+        try:
+            for rulename, rule in self.content_rules:
+                self.content_stage = 'rule "' + rulename + '"'
+                if self.stats:
+                    newfilename = self.stats.call('content/' + rulename, rule, dirname, basename, entities, document)
+                else:
+                    newfilename = rule(dirname, basename, entities, document)
+                if newfilename:
+                    return newfilename
+        except NoPdfContentException:
+            return False
+        finally:
+            document.close()
+
+        # FIXXME: more file documents
+
+        return False
+
+    def get_content_stage(self) -> str:
+        """
+        Returns the running step of derive_new_filename_from_content()
+        for the message of a ContentBudgetException, e.g.,
+        'rule "loan" while extracting page 2'.
+        """
+
+        stage = self.content_stage or 'starting the analysis'
+        if self.content_document and self.content_document.stage:
+            stage += ' while ' + self.content_document.stage
+        return stage
+
+    def open_pdf(self, filename: str) -> Any:
+        """
+        Opens the PDF file filename with the backend pdf_backend for
+        PdfDocument and returns an object with the attribute "pages":
+        the list of its pages with the method extract_text(). If the
+        file can not be decrypted or has no pages, None is returned.
+
+        @param filename: string containing the path of a PDF file
+        @param return: None or the pypdf.PdfReader-like object of the file
+        """
+
+        backend: Callable[[str], Any] = getattr(self, 'open_pdf_with_' + self.pdf_backend)
+        return backend(filename)
+
+    def open_pdf_with_pypdf(self, filename: str) -> Any:
+        """
+        Returns the pypdf.PdfReader of the PDF file filename or None (see open_pdf()).
+        """
+
+        try:
+            import pypdf  # imported on first use only: it dominates the start-up time
+        except ImportError:
+            print("Could not find Python module \"pypdf\".\nPlease install it, e.g., with \"sudo pip install pypdf\".")
+            sys.exit(1)
+
         pdffile = pypdf.PdfReader(open(filename, "rb"))
         #pdffile = PyPDF2.PdfFileReader(open(filename, "rb"))
 
@@ -847,31 +2885,50 @@ class GuessFilename(object):
             if returncode < 1:
                 logging.error('PDF file is encrypted and could NOT be decrypted using ' +
                               'config.DEFAULT_PDF_PASSWORD. Skipping content analysis.')
-                return False
+                return None
             else:
                 logging.debug('PDF file is encrypted and could be decrypted using ' +
                               'config.DEFAULT_PDF_PASSWORD. Return code = ' + str(returncode))
         else:
             logging.debug("derive_new_filename_from_content: PDF is not encryped")
 
-            # use first and second page of content only:
-            if len(pdffile.pages) > 1:
-                content = pdffile.pages[0].extract_text() + pdffile.pages[1].extract_text()
-            elif len(pdffile.pages) == 1:
-                content = pdffile.pages[0].extract_text()
-            else:
-                logging.error('Could not determine number of pages of PDF content! (skipping content analysis)')
-                return False
-#        except:
-#            logging.error('Could not read PDF file content. Skipping its content.')
-#            return False
+        if len(pdffile.pages) == 0:
+            logging.error('Could not determine number of pages of PDF content! (skipping content analysis)')
+            return None
+        return pdffile
 
-        if len(content) == 0:
-            logging.info('Could read PDF file content but it is empty (skipping content analysis)')
-            return False
+    def open_pdf_with_pdftotext(self, filename: str) -> Any:
+        """
+        Returns the pages of the PDF file filename extracted by the
+        commands "pdfinfo" and "pdftotext" of poppler-utils or None (see
+        open_pdf()). Each page is extracted by its own pdftotext process
+        when PdfDocument asks for it. main() checks that both commands are
+        installed before any file is analysed.
+        """
 
-        #import pudb; pu.db
-        
+        import subprocess  # imported on first use only: most invocations do not analyse PDF files
+        password: list[str] = []
+        info = subprocess.run(['pdfinfo', filename], capture_output=True, text=True, errors='replace')
+        if info.returncode != 0 and 'password' in info.stderr.lower():
+            logging.debug("open_pdf_with_pdftotext: PDF is encryped, trying password stored in config file")
+            password = ['-opw', self.config.DEFAULT_PDF_PASSWORD, '-upw', self.config.DEFAULT_PDF_PASSWORD]
+            info = subprocess.run(['pdfinfo'] + password + [filename], capture_output=True, text=True, errors='replace')
+            if info.returncode != 0:
+                logging.error('PDF file is encrypted and could NOT be decrypted using ' +
+                              'config.DEFAULT_PDF_PASSWORD. Skipping content analysis.')
+                return None
+        if info.returncode != 0:
+            logging.error('Could not read PDF file (skipping content analysis): ' + info.stderr.strip())
+            return None
+
+        pages_match = re.search(r'^Pages:\s+(\d+)$', info.stdout, re.MULTILINE)
+        if not pages_match or int(pages_match.group(1)) == 0:
+            logging.error('Could not determine number of pages of PDF content! (skipping content analysis)')
+            return None
+        return PdftotextReader(filename, int(pages_match.group(1)), password)
+
+    def content_rule_salary(self, dirname: str, basename: str, entities: FilenameEntities,
+                            document: PdfDocument) -> str | bool:
         # Salary - NOTE: this is highly specific to the PDF file
         # structure of the author's salary processing software.
         # Therefore, this most likely does not work for your salary
@@ -880,7 +2937,7 @@ class GuessFilename(object):
         regex_match = re.match(self.config.SALARY_IDSTRING + r'-(?P<sal_month>\d{2})-(?P<sal_year>\d{4}).pdf', basename)
         if regex_match:
             logging.debug('PARSING SALARY FILE ...')
-            content = content.replace('\n', '•')  # to simplify regex match below
+            content = document.get_text().replace('\n', '•')  # to simplify regex match below
 
             # determine datestamp which should be the 1st of the followup month: 2023-12 → 2024-01-01
             month_str = regex_match.group('sal_month')
@@ -898,42 +2955,55 @@ class GuessFilename(object):
             # trying to extract the net salary value:
             try:
                 #import pudb; pu.db
-                salary_match = re.match(r'.+•Auszahlung  (?P<salary>\d\.\d{3},\d{2})•.+', content)
+                # like re.match(r'.+•Auszahlung  (?P<salary>\d\.\d{3},\d{2})•.+', content):
+                salary_match = self.search_context(content, '•Auszahlung  ', self.SALARY_WINDOW_REGEX, at_start=True)
                 assert salary_match
                 net_salary = salary_match.group('salary')
                 logging.debug('found salary: ' + str(net_salary))
             except:
-                logging.error('derive_new_filename_from_content(' + filename + '): I recognized pattern ' +
+                logging.error('derive_new_filename_from_content(' + os.path.join(dirname, basename) + '): I recognized pattern ' +
                               'for salary file but content format for extracting net salary must have changed.')
                 net_salary = 'FIXXME'
 
             salary_result: str = datestring + ' ' + self.config.SALARY_IDSTRING + ' ' + year_str + '-' +  month_str + ' ' + \
                 net_salary + '€ -- ' + self.config.SALARY_COMPANY_NAME + ' private.pdf'
             return salary_result
+        return False
 
+    def content_rule_easybank_tan_list(self, dirname: str, basename: str, entities: FilenameEntities,
+                                       document: PdfDocument) -> str | bool:
         # 2010-06-08 easybank - neue TAN-Liste -- scan private.pdf
-        if self.fuzzy_contains_all_of(content, ["Transaktionsnummern (TANs)", "Ihre TAN-Liste in Verlust geraten"]) and \
-           datetimestr:
+        datetimestr, _, tags, _ = entities
+        if datetimestr and \
+           self.fuzzy_contains_all_of(document.get_text(), ["Transaktionsnummern (TANs)", "Ihre TAN-Liste in Verlust geraten"]):
             return datetimestr + \
                 " easybank - neue TAN-Liste -- " + \
                 ' '.join(self.adding_tags(tags, ['scan', 'private'])) + \
                 ".pdf"
+        return False
 
+    def content_rule_kirchenbeitrag(self, dirname: str, basename: str, entities: FilenameEntities,
+                                    document: PdfDocument) -> str | bool:
         # 2015-11-20 Kirchenbeitrag 12,34 EUR -- scan taxes bill.pdf
-        if self.fuzzy_contains_all_of(content, ["4294-0208", "AT086000000007042401"]) and \
-           datetimestr:
-            floatstr = self.get_euro_charge_from_context_or_basename(content, "Offen", "Zahlungen", basename)
+        datetimestr, _, tags, _ = entities
+        if datetimestr and \
+           self.fuzzy_contains_all_of(document.get_text(), ["4294-0208", "AT086000000007042401"]):
+            floatstr = self.get_euro_charge_from_context_or_basename(document.get_text(), "Offen", "Zahlungen", basename)
             return datetimestr + \
                 " Kirchenbeitrag " + floatstr + "€ -- " + \
                 ' '.join(self.adding_tags(tags, ['scan', 'taxes', 'bill'])) + \
                 ".pdf"
+        return False
 
+    def content_rule_generali_dynamikklausel(self, dirname: str, basename: str, entities: FilenameEntities,
+                                             document: PdfDocument) -> str | bool:
         # 2015-11-24 Generali Erhoehung Dynamikklausel - Praemie nun 12,34 - Polizze 12345 -- scan bill.pdf
-        if self.config and self.config.GENERALI1_POLIZZE_NUMBER in content and \
-           self.fuzzy_contains_all_of(content, ["ImHinblickaufdievereinbarteDynamikklauseltritteineWertsteigerunginKraft",
-                                                "IhreangepasstePrämiebeträgtdahermonatlich",
-                                                "AT44ZZZ00000002054"]) and datetimestr:
-            floatstr = self.get_euro_charge_from_context_or_basename(content,
+        datetimestr, _, tags, _ = entities
+        if self.config and datetimestr and self.config.GENERALI1_POLIZZE_NUMBER in document.get_text() and \
+           self.fuzzy_contains_all_of(document.get_text(), ["ImHinblickaufdievereinbarteDynamikklauseltritteineWertsteigerunginKraft",
+                                                            "IhreangepasstePrämiebeträgtdahermonatlich",
+                                                            "AT44ZZZ00000002054"]):
+            floatstr = self.get_euro_charge_from_context_or_basename(document.get_text(),
                                                                      "IndiesemBetragistauchdiegesetzlicheVersicherungssteuerenthalten.EUR",
                                                                      "Wird",
                                                                      basename)
@@ -943,12 +3013,16 @@ class GuessFilename(object):
                 ' '.join(self.adding_tags(tags, ['scan', 'bill'])) + \
                 ".pdf"
             return generali_result
+        return False
 
+    def content_rule_merkur_lebensversicherung(self, dirname: str, basename: str, entities: FilenameEntities,
+                                               document: PdfDocument) -> str | bool:
         # 2015-11-30 Merkur Lebensversicherung 123456 - Praemienzahlungsaufforderung 12,34€ -- scan bill.pdf
-        if self.config and self.config.MERKUR_GESUNDHEITSVORSORGE_NUMBER in content and \
-           self.fuzzy_contains_all_of(content, ["Prämienvorschreibung",
-                                                self.config.MERKUR_GESUNDHEITSVORSORGE_ZAHLUNGSREFERENZ]) and datetimestr:
-            floatstr = self.get_euro_charge_from_context_or_basename(content,
+        datetimestr, _, tags, _ = entities
+        if self.config and datetimestr and self.config.MERKUR_GESUNDHEITSVORSORGE_NUMBER in document.get_text() and \
+           self.fuzzy_contains_all_of(document.get_text(), ["Prämienvorschreibung",
+                                                            self.config.MERKUR_GESUNDHEITSVORSORGE_ZAHLUNGSREFERENZ]):
+            floatstr = self.get_euro_charge_from_context_or_basename(document.get_text(),
                                                                      "EUR",
                                                                      "Gesundheit ist ein kostbares Gut",
                                                                      basename)
@@ -959,18 +3033,28 @@ class GuessFilename(object):
                 ' '.join(self.adding_tags(tags, ['scan', 'bill'])) + \
                 ".pdf"
             return merkur_result
+        return False
 
+    def content_rule_loan(self, dirname: str, basename: str, entities: FilenameEntities,
+                          document: PdfDocument) -> str | bool:
         # 2016-02-22 BANK - Darlehnen - Kontomitteilung -- scan taxes.pdf
-        if self.config and self.fuzzy_contains_all_of(content, [self.config.LOAN_INSTITUTE, self.config.LOAN_ID]) and datetimestr:
+        datetimestr, _, tags, _ = entities
+        if self.config and datetimestr and \
+           self.fuzzy_contains_all_of(document.get_text(), [self.config.LOAN_INSTITUTE, self.config.LOAN_ID]):
             loan_result: str = datetimestr + \
                 " " + self.config.LOAN_INSTITUTE + " - Darlehnen - Kontomitteilung -- " + \
                 ' '.join(self.adding_tags(tags, ['scan', 'taxes'])) + \
                 ".pdf"
             return loan_result
+        return False
 
+    def content_rule_a1_festnetz_internet(self, dirname: str, basename: str, entities: FilenameEntities,
+                                          document: PdfDocument) -> str | bool:
         # 2015-11-24 Rechnung A1 Festnetz-Internet 12,34€ -- scan bill.pdf
-        if self.config and self.fuzzy_contains_all_of(content, [self.config.PROVIDER_CONTRACT, self.config.PROVIDER_CUE]) and datetimestr:
-            floatstr = self.get_euro_charge_from_context_or_basename(content,
+        datetimestr, _, tags, _ = entities
+        if self.config and datetimestr and \
+           self.fuzzy_contains_all_of(document.get_text(), [self.config.PROVIDER_CONTRACT, self.config.PROVIDER_CUE]):
+            floatstr = self.get_euro_charge_from_context_or_basename(document.get_text(),
                                                                      "\u2022",
                                                                      "Bei Online Zahlungen geben Sie",
                                                                      basename)
@@ -978,46 +3062,61 @@ class GuessFilename(object):
                 " A1 Festnetz-Internet " + floatstr + \
                 "€ -- " + ' '.join(self.adding_tags(tags, ['scan', 'bill'])) + \
                 ".pdf"
+        return False
 
-
+    def content_rule_oemag(self, dirname: str, basename: str, entities: FilenameEntities,
+                           document: PdfDocument) -> str | bool:
         # 2023-11-28_Einspeisentgelt Nr. 0001234567.PDF → 2023-11-28 OeMAG Einspeisentgelt Nr. 0001234567 - 12,34€ -- bill.pdf
         # basename[11:-4] == "Einspeisentgelt Nr. 0001234567"
+        datetimestr, _, tags, _ = entities
         if self.config and "Einspeisentgelt" in basename:
             assert datetimestr is not None
-            floatstr = self.get_euro_charge_from_context_or_basename(content, "Entgelt Brutto              ", "GUTSCHRIFT", basename)
+            floatstr = self.get_euro_charge_from_context_or_basename(document.get_text(), "Entgelt Brutto              ", "GUTSCHRIFT", basename)
             return datetimestr + \
                 ' OeMAG ' + basename[11:-4] + ' - ' + floatstr + \
                 "€ -- " + ' '.join(self.adding_tags(tags, ['bill'])) + \
                 ".pdf"
+        return False
 
+    def content_rule_oebb_ticket(self, dirname: str, basename: str, entities: FilenameEntities,
+                                 document: PdfDocument) -> str | bool:
         # VSt-Bescheinigung_OEBB-Ticket_0396161939296598.pdf → 2024-02-12 ÖBB Ticket 0396161939296598 12,34€ -- bill.pdf
+        datetimestr, _, tags, _ = entities
         if self.config and datetimestr and "VSt-Bescheinigung_OEBB-Ticket" in basename:
             ticket_match = re.match(r".*VSt-Bescheinigung_OEBB-Ticket_(\d+).pdf", basename)
             assert ticket_match
             ticketnumber = ticket_match.group(1)
-            floatstr = self.get_euro_charge_from_context_or_basename(content, "endet, mit € ", "belastet.", basename)
+            floatstr = self.get_euro_charge_from_context_or_basename(document.get_text(), "endet, mit € ", "belastet.", basename)
             return datetimestr + \
                 ' ÖBB Ticket ' + ticketnumber + ' ' + floatstr + \
                 "€ -- " + ' '.join(self.adding_tags(tags, ['bill'])) + \
                 ".pdf"
+        return False
 
+    def content_rule_netcup(self, dirname: str, basename: str, entities: FilenameEntities,
+                            document: PdfDocument) -> str | bool:
         # 2024-05-29: 2024-05-28_Rechnung-nc-3584729.pdf
+        datetimestr, _, tags, _ = entities
         if self.config and datetimestr and "Rechnung-nc-" in basename:
             bill_match = re.match(r".*nc-(\d+).pdf", basename)
             assert bill_match
             billnumber = bill_match.group(1)
-            floatstr = self.get_euro_charge_from_context_or_basename(content, "Rechnungsbetrag ", "EUR", basename)
+            floatstr = self.get_euro_charge_from_context_or_basename(document.get_text(), "Rechnungsbetrag ", "EUR", basename)
             return datetimestr + \
                 ' netcup Rechnung ' + billnumber + ' ' + floatstr + \
                 "€ -- " + ' '.join(self.adding_tags(tags, ['bill'])) + \
                 ".pdf"
-        
+        return False
+
+    def content_rule_sevenenergy(self, dirname: str, basename: str, entities: FilenameEntities,
+                                 document: PdfDocument) -> str | bool:
         # 2024-09-09: 20240901-123_7Energy_Karl-Voit_Rechnung-02-2024.pdf → 2024-09-01 7Energy Verbrauch Rechnung für 2024-02 - 1,23€ - Re-Nr. 20240904-123 -- bill.pdf
+        datetimestr, _, _, _ = entities
         if self.config and datetimestr and "_7Energy" in basename:
             regex_match = re.match(self.SEVENENERGY_REGEX, basename)
             if regex_match:
-                billamount = self.get_euro_charge_from_context_or_basename(content, "GESAMTSUMME ", " €", basename)
-                billtypeindicator = self.get_string_from_context(content,
+                billamount = self.get_euro_charge_from_context_or_basename(document.get_text(), "GESAMTSUMME ", " €", basename)
+                billtypeindicator = self.get_string_from_context(document.get_text(),
                                                                  "du hast in der 7Energy - BEG momentan folgende Zählpunkte angemeldet:\n",
                                                                  ":\nAT")
                 if billtypeindicator == 'Verbrauchszählpunkt':
@@ -1027,12 +3126,82 @@ class GuessFilename(object):
                 else:
                     billtype = 'FIXXME nicht erkannt (Verbrauch oder Einspeisung)'
                 return f"{self.get_date_string_short_date_string(datetimestr)} 7Energy {billtype} Rechnung für {regex_match.group('billyear')}-{regex_match.group('billmonth')} - {billamount}€ - Re-Nr. {basename[:12]} -- bill.pdf"
+        return False
+
+    def content_rule_from_table(self, tablerule: TableRule, dirname: str, basename: str, entities: FilenameEntities,
+                                document: PdfDocument) -> str | bool:
+        """
+        Applies a rule of the rule table with the source "content" (see derive_new_filename_from_table_rule()).
+        """
 
+        regex_match = tablerule.regex.match(basename) if tablerule.regex else None
+        if tablerule.regex and not regex_match:
+            return False
+        return self.derive_new_filename_from_table_rule(tablerule, basename, entities, regex_match, document)
 
-            
-        # FIXXME: more file documents
+    def derive_new_filename_from_table_rule(self, tablerule: TableRule, basename: str, entities: FilenameEntities,
+                                            regex_match: re.Match[str] | None, document: PdfDocument | None = None) -> str | bool:
+        """
+        Returns the new file name of a rule of the rule table if its
+        guards are met or False. The pattern of the rule has to be
+        matched by the caller already.
 
-        return False
+        @param tablerule: the TableRule
+        @param basename: string containing one file name
+        @param entities: the result of split_filename_entities(basename)
+        @param regex_match: the match of the pattern of tablerule or None
+        @param document: the PdfDocument for rules with the source "content"
+        @param return: False or new filename
+        """
+
+        datetimestr, description, tags, extension = entities
+        if tablerule.requires_datetimestr and not datetimestr:
+            return False
+        if tablerule.filename_contains and not self.contains_all_of(basename, tablerule.filename_contains):
+            return False
+        if tablerule.content_contains and \
+           not (document and self.contains_all_of(document.get_text(tablerule.pages), tablerule.content_contains)):
+            return False
+        if tablerule.content_fuzzy_contains and \
+           not (document and self.fuzzy_contains_all_of(document.get_text(tablerule.pages), tablerule.content_fuzzy_contains)):
+            return False
+
+        fields = dict(tablerule.config_values)
+        if regex_match:
+            fields.update({name: value or '' for name, value in regex_match.groupdict().items()})
+        fields.update({'datetimestr': datetimestr or '',
+                       'date': (datetimestr or '')[:10],
+                       'description': description,
+                       'tags': ' '.join(self.adding_tags(list(tags), tablerule.tags)),
+                       'extension': extension or ''})
+        if tablerule.charge:
+            assert document
+            fields['charge'] = self.get_euro_charge_from_context_or_basename(document.get_text(tablerule.pages), tablerule.charge[0],
+                                                                             tablerule.charge[1], basename)
+        logging.debug('derive_new_filename_from_table_rule: rule "' + tablerule.name + '" matches')
+        return tablerule.template.format(**fields)
+
+    def has_json_metadata_keys(self, data: dict[str, Any]) -> bool:
+        """
+        Returns True if the keys read from an .info.json file so far
+        determine the result of derive_new_filename_from_json_metadata():
+        all keys of its extractor (see JSON_METADATA_KEYS_BY_EXTRACTOR)
+        are found. The .info.json files of yt-dlp have no top-level "url"
+        for YouTube, so JsonKeyReader would read them to the end otherwise.
+
+        @param data: dict with the keys of JSON_METADATA_KEYS read so far
+        @param return: True if no further keys are needed
+        """
+
+        extractor = data.get('extractor_key')
+        if not isinstance(extractor, str) or extractor not in self.JSON_METADATA_KEYS_BY_EXTRACTOR:
+            return False
+        if not all(key in data for key in self.JSON_METADATA_KEYS_BY_EXTRACTOR[extractor]):
+            return False
+        if extractor == 'ORFTVthek':
+            return True
+        # with another upload_date, the keys of ORF TVthek are checked as well:
+        return bool(data['upload_date']) and len(data['upload_date']) == 8
 
     def derive_new_filename_from_json_metadata(self, dirname: str, basename: str, json_metadata_file: str) -> str | bool | None:
         """
@@ -1047,8 +3216,13 @@ class GuessFilename(object):
         @param return: False or new filename
         """
 
-        json_data = open(os.path.join(dirname, json_metadata_file))
-        data = json.load(json_data)
+        with open(os.path.join(dirname, json_metadata_file), encoding='utf-8') as json_data:
+            if os.fstat(json_data.fileno()).st_size < self.JSON_STREAM_SIZE:
+                text = json_data.read()
+                # like JsonKeyReader, no object is no meta-data:
+                data = json.loads(text) if text.lstrip(' \t\n\r').startswith('{') else {}
+            else:
+                data = JsonKeyReader(json_data).read(self.JSON_METADATA_KEYS, self.has_json_metadata_keys)
 
         if "upload_date" in data.keys() and \
            "extractor" in data.keys() and \
@@ -1129,9 +3303,99 @@ class GuessFilename(object):
                           'understand this type of JSON meta data')
             return False
 
-        json_data.close()
         return None
 
+    def get_exiftool(self) -> Any:
+        """
+        Returns the exiftool.ExifToolHelper which is started on first
+        use: one exiftool process in -stay_open mode reads the Exif
+        meta-data of all files until close_exiftool() is called.
+        """
+
+        if self.exiftool_session is None:
+            try:
+                import exiftool  # for reading image/video Exif meta-data
+            except ImportError:
+                print("Could not find Python module \"exiftool\".\nPlease install it, e.g., with \"sudo pip install pyexiftool\".")
+                sys.exit(1)
+            self.exiftool_session = exiftool.ExifToolHelper()
+        return self.exiftool_session
+
+    def close_exiftool(self) -> None:
+        """
+        Terminates the exiftool process of get_exiftool() if it was started.
+        """
+
+        if self.exiftool_session is not None:
+            if self.exiftool_session.running:
+                self.exiftool_session.terminate()
+            self.exiftool_session = None
+
+    def get_pixel_match(self, basename: str) -> re.Match[str] | None:
+        """
+        Returns the match of PXL_REGEX if basename is a file of a Google
+        Pixel camera which is renamed using its Exif meta-data or None.
+        """
+
+        if os.path.splitext(basename)[1].lower() in ['.jpg', '.mp4'] and basename.startswith('PXL_'):
+            return self.PXL_REGEX.match(basename)
+        return None
+
+    def read_pixel_metadata(self, filenames: list[str]) -> list[dict[str, Any]]:
+        """
+        Returns the Exif meta-data of filenames: only the tags of
+        PIXEL_METADATA_TAGS which are taken from the pixel_metadata_cache
+        or read by PixelMetadataReader without exiftool and stored in the
+        cache. Files it can not read are read by the exiftool session
+        in the fast mode of exiftool which does not scan the files for
+        trailers. With debug, all tags are read by exiftool for the
+        debug output.
+
+        @param filenames: list of paths of Google Pixel camera files
+        @param return: list of dicts of the tags with their group names and SourceFile
+        """
+
+        if self.debug:
+            metadata: list[dict[str, Any]] = self.get_exiftool().get_metadata(files=filenames)
+            return metadata
+        cached = self.pixel_metadata_cache.get(filenames) if self.pixel_metadata_cache else {}
+        metadata = [cached.get(filename) or PixelMetadataReader.read(filename) or {} for filename in filenames]
+        unread = [filename for filename, entry in zip(filenames, metadata) if not entry]
+        if unread:
+            logging.debug('read_pixel_metadata: reading %i files with exiftool' % len(unread))
+            entries = iter(self.get_exiftool().get_tags(unread, self.PIXEL_METADATA_TAGS, params=['-fast']))
+            metadata = [entry or next(entries) for entry in metadata]
+        if self.pixel_metadata_cache:
+            self.pixel_metadata_cache.put([entry for filename, entry in zip(filenames, metadata) if filename not in cached])
+        return metadata
+
+    def prefetch_pixel_metadata(self, files: Iterable[str]) -> None:
+        """
+        Reads the Exif meta-data of the Google Pixel camera files of files
+        with one exiftool call per PIXEL_METADATA_BATCH_SIZE files and keeps
+        it for derive_new_filename_for_pixel_files(). If a batch fails,
+        e.g., because of an unreadable file, its files are read one by one
+        later on.
+
+        @param files: list of file names as given on the command line
+        """
+
+        filenames = [os.path.join(os.path.abspath(os.path.dirname(filename)), os.path.basename(filename))
+                     for filename in files if self.get_pixel_match(os.path.basename(filename)) and
+                     self.directory_index.is_file(filename)]
+        for start in range(0, len(filenames), self.PIXEL_METADATA_BATCH_SIZE):
+            batch = filenames[start:start + self.PIXEL_METADATA_BATCH_SIZE]
+            try:
+                metadata = self.read_pixel_metadata(batch)
+            except Exception as e:
+                logging.warning('prefetch_pixel_metadata: reading the meta-data of %i files one by one: %s' % (len(batch), str(e)))
+                continue
+            for entry in metadata:
+                if isinstance(entry.get('SourceFile'), str):
+                    self.pixel_metadata[entry['SourceFile']] = entry
+        if filenames:
+            logging.debug('prefetch_pixel_metadata: read the meta-data of %i files' % len(self.pixel_metadata))
+
     def derive_new_filename_for_pixel_files(self, dirname: str, basename: str, pxl_match: re.Match[str]) -> str | bool:
         """
         Analyzes the content of Pixel 4a camera files using the exif meta data and returns a new file name if feasible.
@@ -1142,14 +3406,10 @@ class GuessFilename(object):
         @param return: False or new filename
         """
 
-        try:
-            import exiftool  # for reading image/video Exif meta-data
-        except ImportError:
-            print("Could not find Python module \"exiftool\".\nPlease install it, e.g., with \"sudo pip install pyexiftool\".")
-            sys.exit(1)
-
-        myexiftool = exiftool.ExifToolHelper()
-        metadata = myexiftool.get_metadata(files = [os.path.join(dirname, basename)])[0]
+        filename = os.path.join(dirname, basename)
+        metadata = self.pixel_metadata.pop(filename, None)
+        if metadata is None:
+            metadata = self.read_pixel_metadata([filename])[0]
 
         extension = os.path.splitext(basename)[1]
 
@@ -1165,7 +3425,7 @@ class GuessFilename(object):
             else:
                 print("| " + str(value) + " | KeyError |")
         
-        if options.debug and metadata['File:FileType'] == 'JPEG':
+        if self.debug and metadata['File:FileType'] == 'JPEG':
             print("|| " + basename + "|")
             print("| metadata['File:FileType'] | JPEG |\n|-")
             print_metadata_table_line('XMP:SpecialTypeID')
@@ -1211,7 +3471,7 @@ class GuessFilename(object):
             not is_portraitoriginal_photo and \
             not is_portraitcover_photo
 
-        if options.debug and metadata['File:FileType'] == 'MP4':
+        if self.debug and metadata['File:FileType'] == 'MP4':
             print("|| " + basename + "|")
             print("| metadata['File:FileType'] | MP4 |\n|-")
             print_metadata_table_line('QuickTime:MatrixStructure')
@@ -1331,10 +3591,12 @@ class GuessFilename(object):
         if dryrun:
             assert dryrun.__class__ == bool
 
-        if os.path.isdir(oldfilename):
+        if not self.directory_index.get_entry(oldfilename)[0]:
+            self.directory_index.refresh(os.path.dirname(oldfilename))  # the file may be created after reading its directory
+        if self.directory_index.is_dir(oldfilename):
             logging.debug("handle_file: Skipping directory \"%s\" because this tool only renames file names." % oldfilename)
             return None
-        elif not os.path.isfile(oldfilename):
+        elif not self.directory_index.is_file(oldfilename):
             logging.debug("handle_file: file type error in folder [%s]: file type: is file? %s  -  is dir? %s  -  is mount? %s" %
                           (os.getcwd(), str(os.path.isfile(oldfilename)), str(os.path.isdir(oldfilename)), str(os.path.islink(oldfilename))))
             logging.error("Skipping \"%s\" because this tool only renames existing file names." % oldfilename)
@@ -1348,15 +3610,15 @@ class GuessFilename(object):
         logging.debug("————→ basename [%s]" % basename)
         newfilename: str | bool | None = ''
 
-        pxl_match = self.PXL_REGEX.match(basename)
-        if extension in ['.jpg', '.mp4'] and basename.startswith('PXL_') and pxl_match:
+        pxl_match = self.get_pixel_match(basename)
+        if pxl_match:
             logging.debug('I recognized the file name pattern of a Google Pixel (4a?) camera image or video, extracting from Exif data and file name')
-            newfilename = self.derive_new_filename_for_pixel_files(dirname, basename, pxl_match)
+            newfilename = self.call_with_stats('pixel_files', self.derive_new_filename_for_pixel_files, dirname, basename, pxl_match)
             if not newfilename:
                 logging.debug('I failed to derive a new file name from the Exif meta-data. Continue trying with the other methods.')
 
         if not newfilename:
-            newfilename = self.derive_new_filename_from_old_filename(basename)
+            newfilename = self.call_with_stats('filename', self.derive_new_filename_from_old_filename, basename)
             if newfilename:
                 logging.debug("handle_file: derive_new_filename_from_old_filename returned new filename: %s" % newfilename)
             else:
@@ -1364,28 +3626,113 @@ class GuessFilename(object):
 
         if not newfilename:
             if extension == '.pdf':
-                newfilename = self.derive_new_filename_from_content(dirname, basename)
+                try:
+                    newfilename = self.get_content_result(dirname, basename)
+                except ContentBudgetException as e:
+                    logging.error('Abandoned the content analysis of "%s": %s' % (basename, str(e)))
+                    if self.rename_plan:
+                        self.rename_plan.add(dirname, basename, basename, ERROR_DIR)
+                    elif not dryrun:
+                        move_to_error_dir(dirname, basename, self.directory_index)
+                    return False
                 logging.debug("handle_file: derive_new_filename_from_content returned new filename: %s" % newfilename)
             else:
                 logging.debug("handle_file: file extension is not PDF and therefore I skip analyzing file content")
 
         if not newfilename:
             json_metadata_file = os.path.join(dirname, os.path.splitext(basename)[0] + '.info.json')
-            if os.path.isfile(json_metadata_file):
+            if self.directory_index.is_file(json_metadata_file):
                 logging.debug("handle_file: found a json metadata file: %s   … parsing it …" % json_metadata_file)
-                newfilename = self.derive_new_filename_from_json_metadata(dirname, basename, json_metadata_file)
+                newfilename = self.call_with_stats('json_metadata', self.derive_new_filename_from_json_metadata,
+                                                   dirname, basename, json_metadata_file)
                 logging.debug("handle_file: derive_new_filename_from_json_metadata returned new filename: %s" % newfilename)
             else:
                 logging.debug("handle_file: No json metadata file found")
 
         if isinstance(newfilename, str) and newfilename:
-            self.rename_file(dirname, basename, newfilename, dryrun)
-            move_to_success_dir(dirname, newfilename)
+            if self.rename_plan:
+                # the new file name is checked against the other files of the batch before renaming:
+                if newfilename == basename:
+                    logging.info("Old filename is same as new filename: skipping file")
+                else:
+                    print('       →  ' + colorama.Style.BRIGHT + colorama.Fore.GREEN + newfilename + colorama.Style.RESET_ALL)
+                self.rename_plan.add(dirname, basename, newfilename, SUCCESS_DIR)
+                return newfilename
+            renamed = self.rename_file(dirname, basename, newfilename, dryrun)
+            if renamed and not dryrun:
+                self.directory_index.rename(dirname, basename, dirname, newfilename)
+            # a file which could not be renamed is not moved, neither is the existing file of its new name:
+            if not dryrun and (renamed or newfilename == basename):
+                move_to_success_dir(dirname, newfilename, self.directory_index)
             return newfilename
         else:
             logging.warning("I failed to derive new filename: not enough cues in file name or PDF file content")
-            move_to_error_dir(dirname, basename)
+            if self.rename_plan:
+                self.rename_plan.add(dirname, basename, basename, ERROR_DIR)
+            elif not dryrun:
+                move_to_error_dir(dirname, basename, self.directory_index)
+            return False
+
+    def needs_content_analysis(self, filename: str) -> bool:
+        """
+        Returns True if handle_file() is going to analyse the content of
+        filename: PDF files whose file names are not recognized by
+        derive_new_filename_from_old_filename(). Rules which would ask
+        questions are not applied and no statistics are recorded.
+
+        @param filename: string containing one file name
+        @param return: True if the content of filename is going to be analysed
+        """
+
+        if os.path.splitext(filename)[1].lower() != '.pdf' or not self.directory_index.is_file(filename):
             return False
+        interactive, stats = self.interactive, self.stats
+        self.interactive, self.stats = False, None
+        try:
+            return not self.derive_new_filename_from_old_filename(os.path.basename(filename))
+        finally:
+            self.interactive, self.stats = interactive, stats
+
+    def get_content_result(self, dirname: str, basename: str) -> str | bool:
+        """
+        Returns the result of derive_new_filename_from_content(). If a
+        worker process of --jobs analysed the file (see
+        start_content_workers()), its output, log messages and statistics
+        are passed on at this point, so they appear in the order of the
+        files just like without workers. If the worker exceeded the
+        budget of the file, a ContentBudgetException is raised. If the
+        analysis of the worker exited, main() exits the same way.
+
+        @param dirname: string containing the directory of file within basename
+        @param basename: string containing one file name
+        @param return: False or new filename
+        """
+
+        future = self.content_futures.pop(os.path.join(dirname, basename), None)
+        if not future:
+            result: str | bool = self.call_with_stats('content', self.derive_new_filename_from_content, dirname, basename)
+            return result
+        newfilename: str | bool
+        newfilename, output, records, stats, exceeded, exitcode = future.result()
+        sys.stdout.write(output)
+        for record in records:
+            logging.getLogger().handle(record)
+        if self.stats and stats:
+            self.stats.merge(stats)
+        if exitcode is not None:
+            sys.exit(exitcode)
+        if exceeded:
+            raise ContentBudgetException(exceeded)
+        return newfilename
+
+    def call_with_stats(self, rulename: str, function: Callable[..., RuleResult], *args: Any) -> RuleResult:
+        """
+        Returns function(*args) and records it in the statistics if enabled.
+        """
+
+        if self.stats:
+            return self.stats.call(rulename, function, *args)
+        return function(*args)
 
     def adding_tags(self, tagarray: list[str], newtags: list[str]) -> list[str]:
         """
@@ -1463,6 +3810,17 @@ class GuessFilename(object):
 
         return True
 
+    def get_fuzzy_index(self, document: str) -> FuzzyIndex:
+        """
+        Returns the FuzzyIndex of document. The index of the last
+        document is kept, so all rules comparing their strings with the
+        same PDF content share it.
+        """
+
+        if not self.fuzzy_index or self.fuzzy_index.document != document:
+            self.fuzzy_index = FuzzyIndex(document)
+        return self.fuzzy_index
+
     def fuzzy_contains_one_of(self, string: str, entries: list[str]) -> bool:
         """
         Returns true, if the string contains a similar one of the strings within entries array
@@ -1473,9 +3831,9 @@ class GuessFilename(object):
         assert(len(string) > 0)
         assert(len(entries) > 0)
 
+        index = self.get_fuzzy_index(string)
         for entry in entries:
-            similarity = fuzz.partial_ratio(string, entry)
-            if similarity > 64:
+            if index.is_similar(entry):
                 # logging.debug(u"MATCH   fuzzy_contains_one_of(%s, %s) == %i" % (string, str(entry), similarity))
                 return True
             else:
@@ -1494,14 +3852,14 @@ class GuessFilename(object):
         assert(len(string) > 0)
         assert(len(entries) > 0)
 
+        index = self.get_fuzzy_index(string)
         for entry in entries:
             assert(type(entry) == str or type(entry) == str)
             # logging.debug(u"fuzzy_contains_all_of(%s..., %s...) ... " % (string[:30], str(entry[:30])))
             if entry not in string:
                 # if entry is found in string (exactly), try with fuzzy search:
 
-                similarity = fuzz.partial_ratio(string, entry)
-                if similarity > 64:
+                if index.is_similar(entry):
                     # logging.debug(u"MATCH   fuzzy_contains_all_of(%s..., %s) == %i" % (string[:30], str(entry), similarity))
                     pass
                 else:
@@ -1540,6 +3898,63 @@ class GuessFilename(object):
         else:
             return False
 
+    def get_context_pattern(self, pattern: str) -> re.Pattern[str]:
+        """
+        Returns the compiled pattern which is cached for all further documents.
+        """
+
+        if pattern not in self.context_patterns:
+            self.context_patterns[pattern] = re.compile(pattern)
+        return self.context_patterns[pattern]
+
+    @staticmethod
+    def is_literal(string: str) -> bool:
+        """
+        Returns True if string has the same meaning as literal string and as regular expression.
+        """
+
+        return not any(char in string for char in GuessFilename.REGEX_SPECIAL_CHARACTERS)
+
+    @staticmethod
+    def search_context(string: str, before: str, window: re.Pattern[str], at_start: bool = False) -> re.Match[str] | None:
+        """
+        Returns the match of window right after the literal string before
+        which re.search(".*" + before + window.pattern + ".*", string)
+        would choose or None. With at_start, the match of
+        re.match(".+" + before + window.pattern, string) is returned.
+
+        The occurrences of before are found with str.find() and window
+        is matched right after each of them only, which is linear in the
+        length of string instead of the backtracking of the leading ".*"
+        over each line. Just like with the leading ".*", the last
+        occurrence within the first line containing one followed by a
+        match of window is chosen. With at_start, only occurrences within
+        the first line and not at its start are considered.
+
+        @param string: the document to search
+        @param before: literal string (see is_literal()) preceding window
+        @param window: compiled pattern (see get_context_pattern()) without the leading ".*"
+        @param at_start: True for a match of the first line only
+        @param return: the match of window or None
+        """
+
+        position = string.find(before, 1 if at_start else 0)
+        line_end = string.find('\n') if at_start else -1
+        if line_end == -1 and at_start:
+            line_end = len(string)
+        found = None
+        while position != -1 and (line_end == -1 or position <= line_end):
+            components = window.match(string, position + len(before))
+            if components:
+                found = components
+                if line_end == -1:
+                    # the first match: later occurrences have to be in the same line
+                    line_end = string.find('\n', position)
+                    if line_end == -1:
+                        line_end = len(string)
+            position = string.find(before, position + 1)
+        return found
+
     def get_euro_charge_from_context_or_basename(self, string: str, before: str, after: str, basename: str) -> str:
         """
         Returns the included €-currency which is between before and after
@@ -1568,7 +3983,11 @@ class GuessFilename(object):
         context_range = '5'  # range of characters where before/after is valid
 
         # for testing: re.search(".*" + before + r"\D{0,6}(\d{1,6}[,.]\d{2})\D{0,6}" + after + ".*", string).groups()
-        components = re.search(".*" + before + r"\D{0," + context_range + r"}((\d{1,6})[,.](\d{2}))\D{0," + context_range + "}" + after + ".*", string)
+        window = r"\D{0," + context_range + r"}((\d{1,6})[,.](\d{2}))\D{0," + context_range + "}" + after
+        if self.is_literal(before) and self.is_literal(after):
+            components = self.search_context(string, before, self.get_context_pattern(window))
+        else:
+            components = re.search(".*" + before + window + ".*", string)
 
         if components:
             floatstring = components.group(2) + ',' + components.group(3)
@@ -1590,7 +4009,10 @@ class GuessFilename(object):
         assert(type(after) == str or type(after) == str)
         assert(len(string) > 0)
 
-        components = re.search(".*" + before + r"(.*)" + after + ".*", string)
+        if self.is_literal(before) and self.is_literal(after):
+            components = self.search_context(string, before, self.get_context_pattern(r"(.*)" + after))
+        else:
+            components = re.search(".*" + before + r"(.*)" + after + ".*", string)
 
         if components:
             mystring = components.group(1)
@@ -1602,7 +4024,8 @@ class GuessFilename(object):
 
     def rename_file(self, dirname: str, oldbasename: str, newbasename: str, dryrun: bool = False, quiet: bool = False) -> bool:
         """
-        Renames a file from oldbasename to newbasename in dirname.
+        Renames a file from oldbasename to newbasename in dirname unless
+        a file named newbasename exists (see rename_no_replace()).
 
         Only simulates result if dryrun is True.
 
@@ -1619,11 +4042,18 @@ class GuessFilename(object):
         oldfile = os.path.join(dirname, oldbasename)
         newfile = os.path.join(dirname, newbasename)
 
-        if not os.path.isfile(oldfile):
+        try:
+            if dryrun:
+                if not os.path.isfile(oldfile):
+                    raise FileNotFoundError(oldfile)
+                if os.path.isfile(newfile):
+                    raise FileExistsError(newfile)
+            else:
+                rename_no_replace(oldfile, newfile)
+        except FileNotFoundError:
             logging.error("file to rename does not exist: [%s]" % oldfile)
             return False
-
-        if os.path.isfile(newfile):
+        except FileExistsError:
             logging.error("file can't be renamed since new file name already exists: [%s]" % newfile)
             return False
 
@@ -1634,8 +4064,6 @@ class GuessFilename(object):
 
         if '[' in newfile or ']' in newfile:
             logging.warning('Brackets found in filename which may cause issues when used in Orgdown links. Think of getting rid of them.')
-        if not dryrun:
-            os.rename(oldfile, newfile)
         return True
 
     def get_datetime_string_from_named_groups(self, regex_match: re.Match[str]) -> str:
@@ -1848,51 +4276,697 @@ class GuessFilename(object):
                           ')')
 
 
-def move_to_success_dir(dirname: str, newfilename: str) -> None:
+def load_rule_table(filename: str) -> list[dict[str, Any]]:
+    """
+    Returns the rule definitions of the rule table file or an empty list if it does not exist.
+    """
+
+    if not os.path.isfile(filename):
+        return []
+    with open(filename, encoding='utf-8') as rule_table_file:
+        rule_table = json.load(rule_table_file)
+    if not isinstance(rule_table, list):
+        raise ValueError('the rule table has to be a JSON list of rules')
+    logging.debug('loaded %i rule(s) from the rule table %s' % (len(rule_table), filename))
+    return rule_table
+
+
+@functools.cache
+def get_renameat2() -> Any:
+    """
+    Returns renameat2() of the C library for rename_no_replace() or None
+    if it is not available: on other systems than Linux and with C
+    libraries older than glibc 2.28.
+    """
+
+    if not sys.platform.startswith('linux'):
+        return None
+    import ctypes
+    import ctypes.util
+    try:
+        renameat2 = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True).renameat2
+    except (OSError, AttributeError):
+        return None
+    renameat2.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_int, ctypes.c_char_p, ctypes.c_uint]
+    renameat2.restype = ctypes.c_int
+    return renameat2
+
+
+def rename_no_replace(oldfile: str, newfile: str) -> None:
+    """
+    Renames oldfile to newfile like os.rename() but raises
+    FileExistsError instead of replacing an existing newfile.
+
+    On Linux, this is a single renameat2() call with RENAME_NOREPLACE:
+    checking and renaming is one atomic step, so other guessfilename
+    processes handling the same directory or other writers can't create
+    newfile in between. Otherwise (and on file systems not supporting
+    RENAME_NOREPLACE), newfile is checked before os.rename().
+    """
+
+    renameat2 = get_renameat2()
+    if renameat2:
+        if renameat2(AT_FDCWD, os.fsencode(oldfile), AT_FDCWD, os.fsencode(newfile), RENAME_NOREPLACE) == 0:
+            return
+        import ctypes
+        error = ctypes.get_errno()
+        if error not in (errno.EINVAL, errno.ENOSYS):
+            raise OSError(error, os.strerror(error), oldfile, None, newfile)
+    if os.path.lexists(newfile):
+        raise FileExistsError(errno.EEXIST, os.strerror(errno.EEXIST), oldfile, None, newfile)
+    os.rename(oldfile, newfile)
+
+
+def move_to_success_dir(dirname: str, newfilename: str, index: DirectoryIndex) -> None:
     """
-    Moves a file to SUCCESS_DIR
+    Moves a file to SUCCESS_DIR if dirname contains it according to index
     """
-    if os.path.isdir(SUCCESS_DIR):
+    if index.is_dir(os.path.join(dirname, SUCCESS_DIR)):
         logging.debug('using hidden feature: if a folder named \"' + SUCCESS_DIR +
                       '\" exists, move renamed files into it')
-        os.rename(os.path.join(dirname, newfilename), os.path.join(dirname, SUCCESS_DIR,
-                                                                   newfilename))
+        try:
+            rename_no_replace(os.path.join(dirname, newfilename), os.path.join(dirname, SUCCESS_DIR, newfilename))
+        except FileExistsError:
+            logging.error('file can\'t be moved to sub-directory "' + SUCCESS_DIR + '" since it already contains ' +
+                          'a file with its name: [%s]' % newfilename)
+            return
+        index.rename(dirname, newfilename, os.path.join(dirname, SUCCESS_DIR), newfilename)
         logging.info('moved file to sub-directory "' + SUCCESS_DIR + '"')
 
 
-def move_to_error_dir(dirname: str, basename: str) -> None:
+def move_to_error_dir(dirname: str, basename: str, index: DirectoryIndex) -> None:
     """
-    Moves a file to SUCCESS_DIR
+    Moves a file to ERROR_DIR if dirname contains it according to index
     """
-    if os.path.isdir(ERROR_DIR):
+    if index.is_dir(os.path.join(dirname, ERROR_DIR)):
         logging.debug('using hidden feature: if a folder named \"' + ERROR_DIR +
                       '\" exists, move failed files into it')
-        os.rename(os.path.join(dirname, basename),
-                  os.path.join(dirname, ERROR_DIR, basename))
+        try:
+            rename_no_replace(os.path.join(dirname, basename), os.path.join(dirname, ERROR_DIR, basename))
+        except FileExistsError:
+            logging.error('file can\'t be moved to sub-directory "' + ERROR_DIR + '" since it already contains ' +
+                          'a file with its name: [%s]' % basename)
+            return
+        index.rename(dirname, basename, os.path.join(dirname, ERROR_DIR), basename)
         logging.info('moved file to sub-directory "' + ERROR_DIR + '"')
 
 
+def rollback_journal(journal: str) -> int:
+    """
+    Undoes the renames of the journal of an interrupted RenamePlan in
+    reverse order and removes the journal. Steps which have not been
+    carried out are skipped: their new path does not exist or their
+    old path exists.
+
+    @param journal: path of the journal
+    @param return: number of renames which have been undone
+    """
+
+    with open(journal, encoding='utf-8') as stream:
+        steps = [json.loads(line) for line in stream if line.strip()]
+    undone = 0
+    for step in reversed(steps):
+        if os.path.lexists(step['new']) and not os.path.lexists(step['old']):
+            rename_no_replace(step['new'], step['old'])
+            logging.debug('rollback_journal: renamed "%s" back to "%s"' % (step['new'], step['old']))
+            undone += 1
+    os.remove(journal)
+    return undone
+
+
+def read_names(stream: BinaryIO, separator: str) -> Iterator[str]:
+    """
+    Yields the non-empty file names of stream which are separated by
+    separator. Bytes which are not UTF-8 are kept as surrogate escapes
+    (see os.fsdecode()).
+    """
+
+    rest = ''
+    while True:
+        chunk = stream.read(1024 * 1024)
+        if not chunk:
+            break
+        names = (rest + chunk.decode('utf-8', 'surrogateescape')).split(separator)
+        rest = names.pop()
+        yield from (name for name in names if name)
+    if rest:
+        yield rest
+
+
+def walk_files(directories: Iterable[str], include: list[str] | None = None, exclude: list[str] | None = None,
+               threads: int = 4) -> Iterator[str]:
+    """
+    Yields the files of directories and of their subdirectories for
+    --recursive. The directories are read with os.scandir() by several
+    threads, so subtrees are walked in parallel while the files found
+    so far are handled. The threads wait as long as the files of a
+    few directories are not taken yet, which keeps the memory constant
+    for trees of any size.
+
+    The files of a directory are yielded in a row, sorted by name and
+    only after the whole directory has been read: files renamed while
+    handling them are not found again. The directories SUCCESS_DIR and
+    ERROR_DIR as well as symbolic links to directories are not walked.
+
+    @param directories: iterable of directory names
+    @param include: glob patterns one of which the name of a yielded file matches (default: all files)
+    @param exclude: glob patterns of the names of files and directories to skip
+    @param threads: number of threads reading directories
+    """
+
+    import fnmatch
+    import queue
+    import threading
+
+    def matches(name: str, patterns: list[str]) -> bool:
+        return any(fnmatch.fnmatch(name, pattern) for pattern in patterns)
+
+    pending: queue.Queue[str | None] = queue.Queue()  # directories to read
+    found: queue.Queue[list[str] | None] = queue.Queue(2 * threads)  # files of read directories; None at the end
+    stopped = threading.Event()  # set when the generator is closed
+
+    def put_found(files: list[str] | None) -> None:
+        while not stopped.is_set():
+            try:
+                found.put(files, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def read_directories() -> None:
+        while (directory := pending.get()) is not None:
+            try:
+                if stopped.is_set():
+                    continue
+                files = []
+                with os.scandir(directory) as iterator:
+                    for entry in iterator:
+                        if entry.name in (SUCCESS_DIR, ERROR_DIR) or matches(entry.name, exclude or []):
+                            continue
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                pending.put(entry.path)
+                            elif entry.is_file() and (not include or matches(entry.name, include)):
+                                files.append(entry.path)
+                        except OSError as e:
+                            logging.warning('walk_files: could not read %s: %s' % (entry.path, str(e)))
+                if files:
+                    put_found(sorted(files))
+            except OSError as e:
+                logging.warning('walk_files: could not read directory %s: %s' % (directory, str(e)))
+            finally:
+                pending.task_done()
+
+    def finish() -> None:
+        pending.join()
+        for _ in range(threads):
+            pending.put(None)
+        put_found(None)
+
+    for directory in directories:
+        pending.put(directory)
+    for target in [read_directories] * threads + [finish]:
+        threading.Thread(target=target, daemon=True).start()
+    try:
+        while (files := found.get()) is not None:
+            yield from files
+    finally:
+        stopped.set()
+
+
+def get_batches(files: Iterable[str], size: int = FILE_BATCH_SIZE) -> Iterator[list[str]]:
+    """
+    Yields the files of files in lists of up to size files.
+    """
+
+    iterator = iter(files)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+
+def map_names(guess_filename: GuessFilename, names: Iterable[str], output: TextIO, jsonl: bool = False,
+              terminator: str = '\n') -> tuple[int, int]:
+    """
+    Writes the new file names derive_new_filename_from_old_filename()
+    returns for names to output without accessing any file. The new
+    file name keeps the directory of the old one; it is empty (or null
+    for JSONL) if no rule applies.
+
+    @param guess_filename: a non-interactive GuessFilename instance
+    @param names: iterable of file names
+    @param output: text stream for the lines of "old<TAB>new" or JSON objects
+    @param jsonl: write JSON objects with the keys old and new instead of tab separated values
+    @param terminator: string written after each line
+    @param return: number of names and number of names with a new file name
+    """
+
+    count = mapped = 0
+    for name in names:
+        count += 1
+        dirname, basename = os.path.split(name)
+        newfilename: str | bool | None = False
+        if basename:
+            try:
+                newfilename = guess_filename.derive_new_filename_from_old_filename(basename)
+            except Exception as e:
+                logging.warning('map_names: could not map "%s": %s' % (name, repr(e)))
+        newname = os.path.join(dirname, newfilename) if isinstance(newfilename, str) and newfilename else None
+        if newname:
+            mapped += 1
+        if jsonl:
+            output.write(json.dumps({'old': name, 'new': newname}) + terminator)
+        else:
+            output.write(name + '\t' + (newname or '') + terminator)
+    return count, mapped
+
+
+content_worker: GuessFilename | None = None  # the GuessFilename instance of a worker process of --jobs
+content_worker_budget: tuple[float | None, int | None] = (None, None)  # (seconds, bytes) per file of a worker process
+
+
+@contextlib.contextmanager
+def limit_content_budget(timeout: float | None, memory: int | None) -> Iterator[None]:
+    """
+    Limits the time and the additional memory of the content analysis
+    within the context. Exceeding the time raises a
+    ContentBudgetException with the stage of content_worker, exceeding
+    the memory a MemoryError. The memory is limited by the address
+    space (RLIMIT_AS) of the process, starting from its current size.
+
+    @param timeout: seconds of wall-clock time or None
+    @param memory: bytes of additional address space or None
+    """
+
+    def exceeded_time(signum: int, frame: Any) -> NoReturn:
+        assert timeout  # the handler is installed with a timeout only
+        stage = content_worker.get_content_stage() if content_worker else 'unknown stage'
+        raise ContentBudgetException('exceeded the time budget of %g seconds in %s' % (timeout, stage))
+
+    if memory:
+        import resource  # imported on first use only: it is not available on Windows
+        limits = resource.getrlimit(resource.RLIMIT_AS)
+        soft = get_address_space() + memory
+        if limits[1] != resource.RLIM_INFINITY:
+            soft = min(soft, limits[1])
+        resource.setrlimit(resource.RLIMIT_AS, (soft, limits[1]))
+    if timeout:
+        previous_handler = signal.signal(signal.SIGALRM, exceeded_time)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        yield
+    finally:
+        if timeout:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous_handler)
+        if memory:
+            resource.setrlimit(resource.RLIMIT_AS, limits)
+
+
+def get_address_space() -> int:
+    """
+    Returns the size of the address space of the process in bytes or 0 if it is unknown.
+    """
+
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[0]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def init_content_worker(configdir: str, rule_table: list[dict[str, Any]], debug: bool, pdf_backend: str,
+                        pdf_cache: tuple[str, int, bool, str] | None, stats: bool, loglevel: int,
+                        budget: tuple[float | None, int | None]) -> None:
+    """
+    Initializes a worker process of start_content_workers() with its own GuessFilename instance.
+
+    @param configdir: the directory of guessfilenameconfig.py
+    @param rule_table: the rule table of the GuessFilename instance of main()
+    @param debug: the debug flag of the GuessFilename instance of main()
+    @param pdf_backend: the PDF backend of the GuessFilename instance of main()
+    @param pdf_cache: (filename, max_bytes, hash_content, backend) of its PdfTextCache or None
+    @param stats: True if statistics of the rules are recorded
+    @param loglevel: the level of the root logger of main()
+    @param budget: (seconds, bytes) of each file for limit_content_budget()
+    """
+
+    global content_worker, content_worker_budget
+    content_worker_budget = budget
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # KeyboardInterrupt is handled by main()
+    sys.path.insert(0, configdir)
+    # the config of configdir, not the module a forked worker inherits from main():
+    configfile = os.path.join(configdir, 'guessfilenameconfig.py')
+    guessfilenameconfig: Any = False
+    if os.path.isfile(configfile):
+        import importlib.util
+        spec = importlib.util.spec_from_file_location('guessfilenameconfig', configfile)
+        assert spec and spec.loader
+        guessfilenameconfig = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(guessfilenameconfig)
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)  # the log messages are passed on to main() by analyse_content_in_worker()
+    root.setLevel(loglevel)
+    content_worker = GuessFilename(guessfilenameconfig, root, rule_table)
+    content_worker.interactive = False
+    content_worker.debug = debug
+    content_worker.pdf_backend = pdf_backend
+    content_worker.stats = RuleStatistics() if stats else None
+    content_worker.pdf_text_cache = PdfTextCache(*pdf_cache) if pdf_cache else None
+    if budget[1]:
+        # the modules of the content analysis do not count for the memory budget of the first file:
+        for module in ['pypdf', 'fuzzywuzzy.fuzz', 'sqlite3', 'difflib']:
+            with contextlib.suppress(ImportError):
+                __import__(module)
+
+
+def analyse_content_in_worker(dirname: str, basename: str) -> tuple[str | bool, str, list[logging.LogRecord],
+                                                                    RuleStatistics | None, str | None, int | None]:
+    """
+    Analyses the content of a file in a worker process of
+    start_content_workers() within the budget of content_worker_budget.
+    If the analysis exits, for example because of a missing module,
+    the exit code is returned along with the output explaining it
+    instead of ending the worker process.
+
+    @param dirname: string containing the directory of file within basename
+    @param basename: string containing one file name
+    @param return: (result of derive_new_filename_from_content(), output to stdout, log records, statistics or None,
+                    message of the exceeded budget or None, exit code or None)
+    """
+
+    import logging.handlers
+    import queue
+    assert content_worker
+    records: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+    handler = logging.handlers.QueueHandler(records)
+    logging.getLogger().addHandler(handler)
+    output = io.StringIO()
+    if content_worker.stats:
+        content_worker.stats = RuleStatistics()
+    content_worker.content_stage = ''
+    content_worker.content_document = None
+    newfilename: str | bool = False
+    exceeded = None
+    exitcode = None
+    try:
+        with contextlib.redirect_stdout(output), limit_content_budget(*content_worker_budget):
+            newfilename = content_worker.call_with_stats('content', content_worker.derive_new_filename_from_content,
+                                                         dirname, basename)
+    except ContentBudgetException as e:
+        exceeded = str(e)
+    except MemoryError:
+        exceeded = 'exceeded the memory budget of %i MB in %s' % ((content_worker_budget[1] or 0) // (1024 * 1024),
+                                                                  content_worker.get_content_stage())
+    except SystemExit as e:
+        exitcode = e.code if isinstance(e.code, int) else 1
+    finally:
+        logging.getLogger().removeHandler(handler)
+    collected = []
+    while not records.empty():
+        collected.append(records.get())
+    return newfilename, output.getvalue(), collected, content_worker.stats, exceeded, exitcode
+
+
+def start_content_workers(guess_filename: GuessFilename, files: list[str], jobs: int, configdir: str,
+                          rule_table: list[dict[str, Any]], budget: tuple[float | None, int | None] = (None, None)) -> Any:
+    """
+    Starts a pool of jobs worker processes analysing the content of
+    the files of files which need it (see needs_content_analysis()).
+    Each worker has its own GuessFilename instance. The results are
+    taken by guess_filename.handle_file() from content_futures, so
+    renaming and output keep the order of files.
+
+    @param guess_filename: the GuessFilename instance of main()
+    @param files: list of file names as given on the command line
+    @param jobs: number of worker processes
+    @param configdir: the directory of guessfilenameconfig.py
+    @param rule_table: the rule table guess_filename was built with
+    @param budget: (seconds, bytes) of each file (see limit_content_budget())
+    @param return: the concurrent.futures.ProcessPoolExecutor to shut down after handling the files
+    """
+
+    import concurrent.futures
+    cache = guess_filename.pdf_text_cache
+    executor = concurrent.futures.ProcessPoolExecutor(
+        jobs, initializer=init_content_worker,
+        initargs=(configdir, rule_table, guess_filename.debug, guess_filename.pdf_backend,
+                  (cache.filename, cache.max_bytes, cache.hash_content, cache.backend) if cache else None,
+                  bool(guess_filename.stats), logging.getLogger().level, budget))
+    submit_content_analysis(guess_filename, executor, files)
+    logging.debug('start_content_workers: %i files are analysed by %i worker processes' %
+                  (len(guess_filename.content_futures), jobs))
+    return executor
+
+
+def submit_content_analysis(guess_filename: GuessFilename, executor: Any, files: Iterable[str]) -> None:
+    """
+    Submits the files of files which need a content analysis to the
+    worker processes of start_content_workers().
+
+    @param guess_filename: the GuessFilename instance of main()
+    @param executor: the concurrent.futures.ProcessPoolExecutor of start_content_workers()
+    @param files: list of file names as given on the command line
+    """
+
+    for filename in files:
+        if guess_filename.needs_content_analysis(filename):
+            dirname = os.path.abspath(os.path.dirname(filename))
+            basename = os.path.basename(filename)
+            guess_filename.content_futures[os.path.join(dirname, basename)] = \
+                executor.submit(analyse_content_in_worker, dirname, basename)
+
+
+def get_default_pdf_cache_path() -> str:
+    """
+    Returns the path of the PdfTextCache of --pdf-cache.
+    """
+
+    directory = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(directory, 'guessfilename', 'pdftext.sqlite')
+
+
+def get_default_exif_cache_path() -> str:
+    """
+    Returns the path of the PixelMetadataCache of --exif-cache.
+    """
+
+    return os.path.join(os.path.dirname(get_default_pdf_cache_path()), 'exif.sqlite')
+
+
+def get_default_journal_path() -> str:
+    """
+    Returns the path of the journal of --plan and --rollback.
+    """
+
+    directory = os.environ.get('XDG_STATE_HOME') or os.path.join(os.path.expanduser("~"), ".local", "state")
+    return os.path.join(directory, 'guessfilename', 'renames.journal')
+
+
+def get_default_socket_path() -> str:
+    """
+    Returns the path of the Unix domain socket of --serve and --client.
+    """
+
+    directory = os.environ.get('XDG_RUNTIME_DIR') or os.path.join(os.path.expanduser("~"), ".config/guessfilename")
+    return os.path.join(directory, 'guessfilename.sock')
+
+
+def handle_request(guess_filename: GuessFilename, request: dict[str, Any]) -> dict[str, Any]:
+    """
+    Handles the files of one request of a client of the daemon.
+
+    The request contains the working directory of the client (cwd), its
+    files and the dryrun flag. The files are handled like in main()
+    within the working directory of the client. The output to stdout
+    and the log messages are collected for the client.
+
+    @param guess_filename: the GuessFilename instance of the daemon
+    @param request: dict with the keys cwd, files and dryrun
+    @param return: dict with the results of handle_file() (results), the output and an error message or None
+    """
+
+    output = io.StringIO()
+    handler = logging.StreamHandler(output)
+    handler.setFormatter(logging.Formatter("%(levelname)-8s %(message)s"))
+    logging.getLogger().addHandler(handler)
+    cwd = os.getcwd()
+    results: list[str | bool | None] = []
+    error = None
+    try:
+        os.chdir(request['cwd'])
+        with contextlib.redirect_stdout(output):
+            guess_filename.prefetch_pixel_metadata(request['files'])
+            for filename in request['files']:
+                results.append(guess_filename.handle_file(filename, bool(request.get('dryrun'))))
+    except FileSizePlausibilityException as e:
+        error = 'FileSizePlausibilityException: ' + str(e)
+    except Exception as e:
+        logging.exception('handle_request: could not handle the request %s' % str(request))
+        error = type(e).__name__ + ': ' + str(e)
+    finally:
+        guess_filename.pixel_metadata.clear()
+        guess_filename.directory_index.clear()  # the directories may change until the next request
+        os.chdir(cwd)
+        logging.getLogger().removeHandler(handler)
+    return {'results': results, 'output': output.getvalue(), 'error': error}
+
+
+def serve_connection(guess_filename: GuessFilename, connection: socket.socket) -> None:
+    """
+    Answers the requests of one client connection: each request and
+    each response is one line of JSON (see handle_request()).
+    """
+
+    with connection.makefile('rw', encoding='utf-8') as stream:
+        for line in stream:
+            try:
+                request = json.loads(line)
+            except ValueError:
+                response: dict[str, Any] = {'results': [], 'output': '', 'error': 'invalid request: ' + line.strip()}
+            else:
+                response = handle_request(guess_filename, request)
+            stream.write(json.dumps(response) + '\n')
+            stream.flush()
+
+
+def serve(guess_filename: GuessFilename, socketpath: str) -> None:
+    """
+    Runs the daemon of --serve: the rules, the config and the caches of
+    guess_filename stay in memory while the requests of the clients
+    are answered one after another.
+
+    @param guess_filename: the GuessFilename instance to use
+    @param socketpath: path of the Unix domain socket to listen on
+    """
+
+    if os.path.exists(socketpath):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+            try:
+                probe.connect(socketpath)
+            except OSError:
+                os.unlink(socketpath)  # left-over of a daemon which did not shut down properly
+            else:
+                error_exit(7, 'There is already a daemon listening on "' + socketpath + '"')
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+        try:
+            if os.path.dirname(socketpath):
+                # like the default ~/.config/guessfilename without $XDG_RUNTIME_DIR and an installed config:
+                os.makedirs(os.path.dirname(socketpath), mode=0o700, exist_ok=True)
+            umask = os.umask(0o177)  # only the user may connect
+            try:
+                server.bind(socketpath)
+            finally:
+                os.umask(umask)
+        except OSError as e:
+            error_exit(7, 'Could not listen on "' + socketpath + '": ' + str(e))
+        server.listen()
+        logging.info('listening on "' + socketpath + '" ...')
+        try:
+            while True:
+                connection, _ = server.accept()
+                with connection:
+                    serve_connection(guess_filename, connection)
+        finally:
+            guess_filename.close_exiftool()
+            os.unlink(socketpath)
+
+
+def send_request(connection: socket.socket, request: dict[str, Any]) -> dict[str, Any]:
+    """
+    Sends one request to the daemon and returns its response (see handle_request()).
+    """
+
+    with connection.makefile('rw', encoding='utf-8') as stream:
+        stream.write(json.dumps(request) + '\n')
+        stream.flush()
+        response: dict[str, Any] = json.loads(stream.readline())
+    return response
+
+
+def run_client(socketpath: str, files: Iterable[str], dryrun: bool) -> int:
+    """
+    Sends files to the daemon of --serve and prints its output. The
+    files are sent in requests of FILE_BATCH_SIZE files.
+
+    @param socketpath: path of the Unix domain socket of the daemon
+    @param files: iterable of file names relative to the current working directory
+    @param dryrun: boolean which defines if files should be changed (False) or not (True)
+    @param return: number of files the daemon could not derive a new file name for
+    """
+
+    failed = 0
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+            connection.connect(socketpath)
+            for batch in get_batches(files):
+                response = send_request(connection, {'cwd': os.getcwd(), 'files': batch, 'dryrun': dryrun})
+                sys.stdout.write(response['output'])
+                if response['error']:
+                    error_exit(99, 'An exception occurred: ' + response['error'] + '. Aborting further file processing.')
+                failed += len([result for result in response['results'] if not result])
+    except (OSError, ValueError) as e:
+        error_exit(7, 'Could not get an answer of the daemon on "' + socketpath + '" (start it with --serve): ' + str(e))
+    return failed
+
+
 def main() -> None:
     """Main function"""
 
+    (options, args) = parser.parse_args()
+
     if options.version:
         print(os.path.basename(sys.argv[0]) + " version " + PROG_VERSION_DATE)
         sys.exit(0)
 
-    handle_logging()
+    handle_logging(options)
     colorama.init()  # use Colorama to make Termcolor work on Windows too
 
     if options.verbose and options.quiet:
         error_exit(1, "Options \"--verbose\" and \"--quiet\" found. " +
                    "This does not make any sense, you silly fool :-)")
 
+    if options.jobs < 1:
+        error_exit(1, "Option \"--jobs\" requires at least one job")
+    if options.walk_threads < 1:
+        error_exit(1, "Option \"--walk-threads\" requires at least one thread")
+    if (options.content_timeout is not None and options.content_timeout <= 0) or \
+       (options.content_memory is not None and options.content_memory <= 0):
+        error_exit(1, "Options \"--content-timeout\" and \"--content-memory\" require a positive budget")
+
+    if options.rollback:
+        journal = options.journal or get_default_journal_path()
+        if not os.path.isfile(journal):
+            logging.info('There is no interrupted batch to roll back: "%s" does not exist' % journal)
+        else:
+            logging.info('Undid %i renames of the interrupted batch of "%s"' % (rollback_journal(journal), journal))
+        sys.exit(0)
+
     if options.dryrun:
         logging.debug("DRYRUN active, not changing any files")
     logging.debug("extracting list of files ...")
 
-    files = args
+    if options.map_names and args:
+        error_exit(1, "Option \"--map-names\" reads the file names from stdin, do not add file names as argument")
+
+    files: Iterable[str] = args
+    if options.recursive:
+        for directory in args:
+            if not os.path.isdir(directory):
+                error_exit(5, "Option \"--recursive\" requires directories as arguments: \"" + directory + "\" is none")
+        logging.debug("%s directories found: [%s]" % (str(len(args)), '], ['.join(args)))
+        files = walk_files(args, options.include, options.exclude, options.walk_threads)
+    else:
+        logging.debug("%s filenames found: [%s]" % (str(len(args)), '], ['.join(args)))
 
-    logging.debug("%s filenames found: [%s]" % (str(len(files)), '], ['.join(files)))
+    if options.client:
+        if len(args) < 1:
+            error_exit(5, "Please add at least one file name as argument")
+        filenames_could_not_be_found = run_client(options.socket or get_default_socket_path(), files, bool(options.dryrun))
+        if not options.quiet:
+            print()
+        sys.exit(1 if filenames_could_not_be_found else 0)
 
     CONFIGDIR = os.path.join(os.path.expanduser("~"), ".config/guessfilename")
     sys.path.insert(0, CONFIGDIR)  # add CONFIGDIR to Python path in order to find config file
@@ -1905,26 +4979,101 @@ def main() -> None:
                         "found, you can not use containing private settings")
         guessfilenameconfig = False
 
-    guess_filename = GuessFilename(guessfilenameconfig, logging.getLogger())
+    try:
+        rule_table = load_rule_table(os.path.join(CONFIGDIR, RULE_TABLE_FILENAME))
+        guess_filename = GuessFilename(guessfilenameconfig, logging.getLogger(), rule_table)
+    except ValueError as e:
+        error_exit(6, 'Could not load the rule table "' + os.path.join(CONFIGDIR, RULE_TABLE_FILENAME) + '": ' + str(e))
+
+    guess_filename.debug = bool(options.debug)
+    if options.map_names:
+        guess_filename.interactive = False
+        output = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='surrogateescape',
+                                  newline='\n', line_buffering=False)
+        count, mapped = map_names(guess_filename, read_names(sys.stdin.buffer, '\0' if options.null else '\n'), output,
+                                  bool(options.jsonl), '\0' if options.null and not options.jsonl else '\n')
+        output.flush()
+        logging.debug('mapped %i of %i file names' % (mapped, count))
+        sys.exit(0)
+
+    if options.pdf_backend == 'pdftotext':
+        import shutil
+        for command in ['pdfinfo', 'pdftotext']:
+            if not shutil.which(command):
+                error_exit(1, "Option \"--pdf-backend pdftotext\" requires the command \"" + command + "\". " +
+                           "Please install poppler-utils, e.g., with \"sudo apt install poppler-utils\".")
+    guess_filename.pdf_backend = options.pdf_backend
+    if not options.no_pdf_cache:
+        guess_filename.pdf_text_cache = PdfTextCache(options.pdf_cache or get_default_pdf_cache_path(),
+                                                     options.pdf_cache_size * 1024 * 1024, bool(options.pdf_cache_hash),
+                                                     options.pdf_backend)
+    if not options.no_exif_cache:
+        guess_filename.pixel_metadata_cache = PixelMetadataCache(options.exif_cache or get_default_exif_cache_path(),
+                                                                 options.exif_cache_size * 1024 * 1024)
+
+    if options.serve:
+        guess_filename.interactive = False
+        serve(guess_filename, options.socket or get_default_socket_path())
 
     if len(args) < 1:
         error_exit(5, "Please add at least one file name as argument")
 
+    if options.stats or options.stats_json:
+        guess_filename.stats = RuleStatistics()
+
+    if options.plan:
+        journal = options.journal or get_default_journal_path()
+        if os.path.exists(journal):
+            error_exit(8, 'The journal "' + journal + '" of an interrupted batch exists: undo its renames with ' +
+                       '"--rollback" first')
+        guess_filename.rename_plan = RenamePlan(guess_filename.directory_index, journal)
+
+    # the files are handled in batches: the workers analyse the files of the following batch in the meantime
+    batches = get_batches(files)
+    batch = next(batches, [])
+
+    # with a budget, even a single file is analysed in a worker process which keeps main() responsive:
+    budget = (options.content_timeout, options.content_memory * 1024 * 1024 if options.content_memory else None)
+    executor = start_content_workers(guess_filename, batch, options.jobs, CONFIGDIR, rule_table, budget) \
+        if options.jobs > 1 or any(budget) else None
+
     filenames_could_not_be_found = 0
     logging.debug("iterating over files ...\n" + "=" * 80)
-    for filename in files:
-        if filename.__class__ == str:
-            filename = str(filename)
-        try:
-            if not guess_filename.handle_file(filename, options.dryrun):
-                filenames_could_not_be_found += 1
-        except FileSizePlausibilityException:
-            error_exit(99, 'An exception occurred. Aborting further file processing.')
+    try:
+        guess_filename.prefetch_pixel_metadata(batch)
+        while batch:
+            following = next(batches, [])
+            if executor:
+                submit_content_analysis(guess_filename, executor, following)
+            for filename in batch:
+                if filename.__class__ == str:
+                    filename = str(filename)
+                try:
+                    if not guess_filename.handle_file(filename, options.dryrun):
+                        filenames_could_not_be_found += 1
+                except FileSizePlausibilityException:
+                    error_exit(99, 'An exception occurred. Aborting further file processing.')
+            if guess_filename.rename_plan:
+                filenames_could_not_be_found += guess_filename.rename_plan.apply(bool(options.dryrun))
+            guess_filename.directory_index.retain(os.path.abspath(os.path.dirname(filename)) for filename in following)
+            guess_filename.prefetch_pixel_metadata(following)
+            batch = following
+    finally:
+        guess_filename.close_exiftool()
+        if executor:
+            # waiting for idle workers avoids errors of the executor at exit; aborted runs do not wait:
+            executor.shutdown(wait=not guess_filename.content_futures, cancel_futures=True)
 
     if not options.quiet:
         # add empty line for better screen output readability
         print()
 
+    if guess_filename.stats:
+        if options.stats:
+            print(guess_filename.stats.get_table())
+        if options.stats_json:
+            guess_filename.stats.write_json(options.stats_json)
+
     if filenames_could_not_be_found == 0:
         logging.debug('successfully finished.')
     else:
@@ -0,0 +1,552 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8; mode: python; -*-
+
+# This script contains micro-benchmarks for guessfilename.
+# Launch it with the name of the benchmark as its first argument:
+#
+#   python3 guessfilename_benchmark.py matcher [NUMBER]
+#   python3 guessfilename_benchmark.py cues [NUMBER]
+#   python3 guessfilename_benchmark.py fuzzy [NUMBER]
+#   python3 guessfilename_benchmark.py context [NUMBER]
+#   python3 guessfilename_benchmark.py redos [LENGTH]
+#   python3 guessfilename_benchmark.py startup [NUMBER]
+#   python3 guessfilename_benchmark.py backends [DIRECTORY]
+#   python3 guessfilename_benchmark.py pixel [DIRECTORY]
+#   python3 guessfilename_benchmark.py json [NUMBER]
+
+import json
+import os
+import re
+import sys
+import time
+import shutil
+import statistics
+import subprocess
+import tempfile
+import timeit
+import tracemalloc
+import logging
+from typing import Callable
+from guessfilename import GuessFilename
+from guessfilename import PdfDocument
+from guessfilename import PixelMetadataReader
+from guessfilename import JsonKeyReader
+from guessfilename import CombinedRuleMatcher
+from guessfilename import KeywordMatcher
+from guessfilename import FuzzyIndex
+from guessfilename import import_fuzz
+
+# a mix of file names matching one of the rules and file names matching none of them:
+MATCHER_FILENAMES = [
+    'C110014365208EUR20150930001.pdf',
+    '2017-11-05T10.56.11_IKS-00000000512345678901234567890.csv',
+    'IMG_20161014_214404.jpg',
+    'VID_20170105_173104.mp4',
+    'Screenshot_2017-11-29_10-32-12.png',
+    '20180510T090000 ORF - ZIB - Signation -ORIGINAL- 2018-05-10_0900_tl_02_ZIB-9-00_Signation__13976423__o__1368225677__s14297692_2__WEB03HD_09000305P_09001400P_Q4A.mp4',
+    '2019-10-10 a file name with a few words.txt',
+    '2016-03-05 another document -- tag1 tag2.pdf',
+    'foo.txt',
+    'some document without any date.pdf',
+]
+
+
+def benchmark_matcher(number: int = 1000) -> None:
+    """
+    Compares trying the regular expressions of OLD_FILENAME_RULES one
+    after another with the single scan of a CombinedRuleMatcher.
+
+    @param number: number of iterations over MATCHER_FILENAMES
+    """
+
+    patterns = [regex for (_, _, regex) in GuessFilename.OLD_FILENAME_RULES if regex]
+    matcher = CombinedRuleMatcher(patterns)
+
+    def sequential() -> None:
+        for filename in MATCHER_FILENAMES:
+            for regex in patterns:
+                if regex.match(filename):
+                    break
+
+    def combined() -> None:
+        for filename in MATCHER_FILENAMES:
+            matcher.match(filename)
+
+    print('%i patterns, %i file names, %i iterations' % (len(patterns), len(MATCHER_FILENAMES), number))
+    for name, function in [('sequential', sequential), ('combined', combined)]:
+        seconds = min(timeit.repeat(function, number=number, repeat=5))
+        print('%-12s %8.2f µs per file name' % (name, seconds / number / len(MATCHER_FILENAMES) * 1e6))
+
+
+def benchmark_cues(number: int = 1000) -> None:
+    """
+    Compares checking the cues of OLD_FILENAME_RULE_CUES rule by rule
+    (lowering the file name again for each cue ignoring case) with the
+    single scan of a KeywordMatcher.
+
+    @param number: number of iterations over MATCHER_FILENAMES
+    """
+
+    rules = [[frozenset(cue for cue in cues if '{' not in cue) for cues in alternatives]
+             for alternatives in GuessFilename.OLD_FILENAME_RULE_CUES.values()]
+    matcher = KeywordMatcher([cue for alternatives in rules for cues in alternatives for cue in cues])
+
+    def contains(filename: str, cue: str) -> bool:
+        if cue.startswith(KeywordMatcher.IGNORE_CASE):
+            return cue[len(KeywordMatcher.IGNORE_CASE):] in filename.lower()
+        return cue in filename
+
+    def sequential() -> None:
+        for filename in MATCHER_FILENAMES:
+            for alternatives in rules:
+                all(any(contains(filename, cue) for cue in cues) for cues in alternatives)
+
+    def combined() -> None:
+        for filename in MATCHER_FILENAMES:
+            found = matcher.find(filename)
+            for alternatives in rules:
+                all(cues & found for cues in alternatives)
+
+    print('%i rules, %i cues, %i file names, %i iterations' % (len(rules), len(matcher.keywords), len(MATCHER_FILENAMES), number))
+    for name, function in [('sequential', sequential), ('combined', combined)]:
+        seconds = min(timeit.repeat(function, number=number, repeat=5))
+        print('%-12s %8.2f µs per file name' % (name, seconds / number / len(MATCHER_FILENAMES) * 1e6))
+
+
+# the first two pages of a typical invoice as extracted by pypdf:
+FUZZY_INVOICE_PAGE = """Stadtwerke Musterstadt GmbH · Energieallee 1 · 8010 Graz
+Herrn
+Max Mustermann
+Beispielgasse 12/3
+8010 Graz
+Kundennummer: 4711081500 Vertragskonto: 200123456789
+Rechnungsnummer: 2024-0815-4711 Rechnungsdatum: 15.03.2024
+Jahresabrechnung Strom für den Zeitraum 01.03.2023 bis 29.02.2024
+Sehr geehrter Herr Mustermann,
+vielen Dank für Ihr Vertrauen. Mit dieser Rechnung erhalten Sie die Abrechnung Ihres
+Energieverbrauchs für den oben angeführten Zeitraum.
+Zählpunkt: AT0010000000000000001000004711081 Zählernummer: 12345678
+Zählerstand alt 01.03.2023: 23.456 kWh Zählerstand neu 29.02.2024: 26.789 kWh
+Verbrauch: 3.333 kWh
+Energiepreis Arbeitspreis 3.333 kWh x 0,1890 EUR/kWh 629,94 EUR
+Grundpreis 12 Monate x 3,90 EUR 46,80 EUR
+Netzentgelte Netznutzungsentgelt 3.333 kWh x 0,0612 EUR/kWh 203,98 EUR
+Netzverlustentgelt 3.333 kWh x 0,0071 EUR/kWh 23,66 EUR
+Messentgelt 12 Monate x 2,40 EUR 28,80 EUR
+Steuern und Abgaben Elektrizitätsabgabe 3.333 kWh x 0,015 EUR/kWh 50,00 EUR
+Ökostromförderbeitrag 35,12 EUR
+Gebrauchsabgabe 6 %% 44,62 EUR
+Summe netto 1.062,92 EUR
+Umsatzsteuer 20 %% 212,58 EUR
+Gesamtbetrag brutto 1.275,50 EUR
+abzüglich geleistete Teilbeträge 1.200,00 EUR
+Nachzahlung 75,50 EUR
+Der Betrag wird am 29.03.2024 von Ihrem Konto IBAN AT12 3456 7890 1234 5678 abgebucht.
+Ihre neuen Teilbeträge ab April 2024: 11 x 110,00 EUR jeweils zum 15. des Monats.
+Bei Fragen erreichen Sie uns unter 0316 123456 oder kundenservice@stadtwerke-musterstadt.at.
+UID ATU12345678 · Firmenbuch FN 123456a · Landesgericht für ZRS Graz · Seite %i von 2
+"""
+FUZZY_INVOICE_TEXT = FUZZY_INVOICE_PAGE % 1 + FUZZY_INVOICE_PAGE % 2
+
+# the strings compared with the PDF content by the content rules (with example settings of the config):
+FUZZY_CUES = ["Transaktionsnummern (TANs)", "Ihre TAN-Liste in Verlust geraten", "4294-0208", "AT086000000007042401",
+              "ImHinblickaufdievereinbarteDynamikklauseltritteineWertsteigerunginKraft", "Prämienvorschreibung",
+              "Musterbank Kredit AG", "Kreditkonto 123456", "A1 Telekom Austria", "Internet Vertrag 123456789",
+              "Vertragskonto: 200123456789", "Jahresabrechnung Strom"]
+
+
+def benchmark_fuzzy(number: int = 20) -> None:
+    """
+    Compares fuzz.partial_ratio() for each string compared with the
+    PDF content by the content rules with a FuzzyIndex of the content,
+    built once per document, using FUZZY_INVOICE_TEXT. Both backends of
+    fuzzywuzzy are measured: the installed one (python-Levenshtein if
+    available) and difflib.
+
+    @param number: number of iterations over the document
+    """
+
+    import difflib
+    fuzz = import_fuzz()
+    installed = fuzz.SequenceMatcher
+    for backend in dict.fromkeys([installed, difflib.SequenceMatcher]):
+        fuzz.SequenceMatcher = backend
+        try:
+            expected = [fuzz.partial_ratio(FUZZY_INVOICE_TEXT, cue) > 64 for cue in FUZZY_CUES]
+            index = FuzzyIndex(FUZZY_INVOICE_TEXT)
+            if [index.is_similar(cue) for cue in FUZZY_CUES] != expected:
+                print('ERROR: FuzzyIndex differs from fuzz.partial_ratio()')
+
+            def partial_ratio() -> None:
+                for cue in FUZZY_CUES:
+                    fuzz.partial_ratio(FUZZY_INVOICE_TEXT, cue) > 64
+
+            def fuzzy_index() -> None:
+                index = FuzzyIndex(FUZZY_INVOICE_TEXT)
+                for cue in FUZZY_CUES:
+                    index.is_similar(cue)
+
+            print('%s backend: %i characters, %i strings (%i similar), %i iterations' %
+                  (backend.__module__, len(FUZZY_INVOICE_TEXT), len(FUZZY_CUES), sum(expected), number))
+            for name, function in [('partial_ratio', partial_ratio), ('FuzzyIndex', fuzzy_index)]:
+                seconds = min(timeit.repeat(function, number=number, repeat=5))
+                print('%-14s %8.2f ms per document' % (name, seconds / number * 1000))
+        finally:
+            fuzz.SequenceMatcher = installed
+
+
+# the contexts of euro charges searched in the PDF content by the content rules, the last one without a match:
+CONTEXT_DOCUMENT = FUZZY_INVOICE_TEXT * 10
+CONTEXTS = [('Nachzahlung', 'EUR'), ('Gesamtbetrag brutto', 'EUR'), ('Summe netto', 'EUR'), ('Rechnungsbetrag', 'EUR')]
+
+
+def benchmark_context(number: int = 20) -> None:
+    """
+    Compares the regular expressions with a leading ".*" searching the
+    euro charges of get_euro_charge_from_context() with the
+    search_context() of the same window after each occurrence of the
+    context, using ten copies of FUZZY_INVOICE_TEXT.
+
+    @param number: number of iterations over the document
+    """
+
+    windows = [(before, re.compile(r"\D{0,5}((\d{1,6})[,.](\d{2}))\D{0,5}" + after)) for (before, after) in CONTEXTS]
+    regexes = [re.compile(".*" + before + window.pattern + ".*") for (before, window) in windows]
+    expected = [components and components.groups() for components in [regex.search(CONTEXT_DOCUMENT) for regex in regexes]]
+    if [components and components.groups() for components in
+            [GuessFilename.search_context(CONTEXT_DOCUMENT, before, window) for (before, window) in windows]] != expected:
+        print('ERROR: search_context() differs from the regular expressions')
+
+    def regex_search() -> None:
+        for regex in regexes:
+            regex.search(CONTEXT_DOCUMENT)
+
+    def search_context() -> None:
+        for (before, window) in windows:
+            GuessFilename.search_context(CONTEXT_DOCUMENT, before, window)
+
+    print('%i characters, %i contexts, %i iterations' % (len(CONTEXT_DOCUMENT), len(CONTEXTS), number))
+    for name, function in [('re.search', regex_search), ('search_context', search_context)]:
+        seconds = min(timeit.repeat(function, number=number, repeat=5))
+        print('%-14s %8.2f ms per document' % (name, seconds / number * 1000))
+
+
+# building blocks of the adversarial file names of benchmark_redos():
+REDOS_PREFIXES = ['', '2019-10-10 ', '2019-10-10T12.34.56 ', '20191010T123456 ', 'a -- ']
+REDOS_PUMPS = ['a', 'a ', ' ', '1', '-', '_', '.', 'a -- ', ' - ', 'a_', '1_', '__1']
+REDOS_SUFFIXES = ['', '\x00', ' -- \x00', '.\x00', '.a\x00']
+REDOS_STEP = 8  # the length of the pumped part grows in small steps to catch exponential run times early
+REDOS_TIME_LIMIT = 0.05  # seconds per match: stop growing an adversarial file name after exceeding this
+
+
+def get_class_regexes() -> dict[str, re.Pattern[str]]:
+    """
+    Returns all regular expressions (and regular expression strings) defined in the GuessFilename class.
+    """
+
+    regexes = {}
+    for name in dir(GuessFilename):
+        value = getattr(GuessFilename, name)
+        if isinstance(value, re.Pattern):
+            regexes[name] = value
+        elif isinstance(value, str) and (name.endswith('_REGEX') or name.endswith('_REGEX_STRING')):
+            try:
+                regexes[name] = re.compile(value, re.UNICODE)
+            except re.error:
+                pass  # fragments like unbalanced parts of other regexes
+    return regexes
+
+
+def get_literal_prefix(regex: re.Pattern[str]) -> str:
+    """
+    Returns the literal characters the pattern of regex starts with.
+    """
+
+    return re.match(r'[^.^$*+?{}\[\]|()\\]*', regex.pattern).group(0)  # type: ignore[union-attr]
+
+
+def time_match(regex: re.Pattern[str], string: str) -> float:
+    start = time.perf_counter()
+    regex.match(string)
+    return time.perf_counter() - start
+
+
+def benchmark_redos(length: int = 256) -> None:
+    """
+    Audits the regular expressions of GuessFilename for catastrophic
+    backtracking: for each regex, adversarial file names are built
+    from a prefix (the literal start of the regex and/or an ISO
+    timestamp), a repeated pump and a suffix which prevents a match.
+    The pump is repeated until the file name reaches length characters
+    or a single match takes longer than REDOS_TIME_LIMIT.
+
+    For the worst adversarial file name of each regex, the time of a
+    match and its growth when doubling the pumped part is reported:
+    about 2 means linear, about 4 quadratic run time. Regexes with
+    exceeded time limits are marked with "!".
+
+    @param length: maximum number of characters of the pumped part
+    """
+
+    print('%-50s %12s %8s  %s' % ('regex', 'worst ms', 'growth', 'worst file name'))
+    for name, regex in sorted(get_class_regexes().items()):
+        worst = (0.0, '', 0.0, False)
+        for prefix in set(REDOS_PREFIXES + [get_literal_prefix(regex) + extra for extra in REDOS_PREFIXES]):
+            for pump in REDOS_PUMPS:
+                for suffix in REDOS_SUFFIXES:
+                    repetitions = REDOS_STEP // len(pump) or 1
+                    exceeded = False
+                    while True:
+                        seconds = time_match(regex, prefix + pump * repetitions + suffix)
+                        if seconds > REDOS_TIME_LIMIT:
+                            exceeded = True
+                            break
+                        if len(pump) * (repetitions + REDOS_STEP) > length:
+                            break
+                        repetitions += REDOS_STEP
+                    string = prefix + pump * repetitions + suffix
+                    seconds = min(time_match(regex, string) for _ in range(3)) if not exceeded else seconds
+                    if exceeded or seconds > worst[0]:
+                        if exceeded or repetitions < 2:
+                            growth = float('inf') if exceeded else 0.0
+                        else:
+                            half = prefix + pump * (repetitions // 2) + suffix
+                            growth = seconds / max(min(time_match(regex, half) for _ in range(3)), 1e-9)
+                        if not worst[3] or exceeded:
+                            worst = (seconds, string, growth, exceeded)
+                    if exceeded:
+                        break
+                if worst[3]:
+                    break
+            if worst[3]:
+                break
+        seconds, string, growth, exceeded = worst
+        print('%-50s %11.3f%s %8.1f  %r' % (name, seconds * 1000, '!' if exceeded else ' ', growth,
+                                            string if len(string) < 60 else string[:40] + '…' + string[-15:]))
+
+
+# modules which have to be imported on first use only:
+STARTUP_LAZY_MODULES = ['pypdf', 'fuzzywuzzy', 'exiftool']
+
+
+def benchmark_startup(number: int = 20) -> None:
+    """
+    Measures the cold start of guessfilename: a new Python interpreter
+    imports the module with "-X importtime" number times. The median
+    wall time of the interpreter, the median import time of
+    guessfilename and its most expensive direct imports are reported.
+    Modules of STARTUP_LAZY_MODULES which are imported nevertheless
+    are reported as well.
+
+    @param number: number of interpreter starts
+    """
+
+    walltimes = []
+    imports: dict[str, list[int]] = {}
+    for _ in range(number):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import guessfilename'],
+                                capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+        walltimes.append(time.perf_counter() - start)
+        for line in result.stderr.splitlines():
+            # "import time:   self [us] | cumulative | imported package" with indented nested imports
+            components = re.match(r'import time:\s+\d+ \|\s+(?P<cumulative>\d+) \| (?P<indentation> *)(?P<module>\S+)', line)
+            if components and len(components.group('indentation')) <= 2:
+                imports.setdefault(components.group('module'), []).append(int(components.group('cumulative')))
+
+    print('%i interpreter starts' % number)
+    print('%-30s %8.1f ms' % ('interpreter with import', statistics.median(walltimes) * 1000))
+    print('%-30s %8.1f ms' % ('import guessfilename', statistics.median(imports.get('guessfilename', [0])) / 1000))
+    print('most expensive imports:')
+    medians = {module: statistics.median(microseconds) for module, microseconds in imports.items() if module != 'guessfilename'}
+    for module in sorted(medians, key=medians.get, reverse=True)[:10]:  # type: ignore[arg-type]
+        print('  %-28s %8.1f ms' % (module, medians[module] / 1000))
+    eager = [module for module in imports if module.split('.')[0] in STARTUP_LAZY_MODULES]
+    if eager:
+        print('ERROR: modules which should be imported on first use are imported at start-up: ' + ', '.join(eager))
+
+
+def get_config() -> object:
+    """
+    Returns the guessfilenameconfig module of the user like main() of guessfilename or False.
+    """
+
+    sys.path.insert(0, os.path.join(os.path.expanduser("~"), ".config/guessfilename"))
+    try:
+        import guessfilenameconfig
+    except ImportError:
+        return False
+    return guessfilenameconfig
+
+
+def benchmark_backends(directory: str = '.') -> None:
+    """
+    Compares the PDF backends of GuessFilename.PDF_BACKENDS using the
+    PDF files of directory: the time for extracting the texts of the
+    pages analysed by the content rules and whether the content rules
+    return the same file names as with the backend "pypdf". Backends
+    whose commands are not installed are skipped.
+
+    @param directory: the directory of the PDF files
+    """
+
+    filenames = sorted(filename for filename in os.listdir(directory) if filename.lower().endswith('.pdf'))
+    guess_filename = GuessFilename(get_config(), logging.getLogger())
+    guess_filename.interactive = False
+    results: dict[str, list[str]] = {}
+    print('%i PDF files in %s' % (len(filenames), directory))
+    for backend in guess_filename.PDF_BACKENDS:
+        guess_filename.pdf_backend = backend
+        seconds = 0.0
+        pages = 0
+        results[backend] = []
+        try:
+            for filename in filenames:
+                start = time.perf_counter()
+                try:
+                    document = PdfDocument(os.path.join(directory, filename), guess_filename.open_pdf)
+                    texts = [document.get_page(number) for number in range(len(document.get_pages()))]
+                    pages += len(texts)
+                except Exception as e:
+                    texts = [type(e).__name__]
+                seconds += time.perf_counter() - start
+                try:
+                    result = guess_filename.derive_new_filename_from_content(directory, filename)
+                except Exception as e:
+                    result = type(e).__name__
+                results[backend].append(str(result))
+        except SystemExit:
+            print('%-10s not available' % backend)
+            del results[backend]
+            continue
+        differences = sum(result != expected for result, expected in zip(results[backend], results['pypdf']))
+        print('%-10s %8.1f ms per file %8.1f pages/s %5i results differing from pypdf' %
+              (backend, seconds / max(len(filenames), 1) * 1000, pages / seconds if seconds else 0, differences))
+
+
+def benchmark_pixel(directory: str = '.') -> None:
+    """
+    Compares reading the meta-data of the Google Pixel camera files of
+    directory with PixelMetadataReader and with one exiftool call for
+    all files: the time per file, the files PixelMetadataReader can not
+    read and the files whose tags of GuessFilename.PIXEL_METADATA_TAGS
+    differ. Without exiftool, only PixelMetadataReader is measured.
+
+    @param directory: the directory of the Pixel files
+    """
+
+    guess_filename = GuessFilename(get_config(), logging.getLogger())
+    filenames = sorted(os.path.join(directory, filename) for filename in os.listdir(directory)
+                       if guess_filename.get_pixel_match(filename))
+    print('%i Pixel files in %s' % (len(filenames), directory))
+    start = time.perf_counter()
+    native = [PixelMetadataReader.read(filename) for filename in filenames]
+    seconds = time.perf_counter() - start
+    print('%-20s %8.2f ms per file %5i files not readable' %
+          ('PixelMetadataReader', seconds / max(len(filenames), 1) * 1000, native.count(None)))
+    try:
+        start = time.perf_counter()
+        exiftool = guess_filename.get_exiftool().get_tags(filenames, guess_filename.PIXEL_METADATA_TAGS, params=['-fast'])
+        seconds = time.perf_counter() - start
+    except (SystemExit, OSError) as e:
+        print('%-20s not available: %s' % ('exiftool', str(e)))
+        return
+    finally:
+        guess_filename.close_exiftool()
+    differences = sum(entry is not None and {key: value for key, value in entry.items() if key != 'File:FileModifyDate'} !=
+                      {key: value for key, value in expected.items() if key != 'File:FileModifyDate'}
+                      for entry, expected in zip(native, exiftool))
+    print('%-20s %8.2f ms per file %5i files differing from exiftool' %
+          ('exiftool', seconds / max(len(filenames), 1) * 1000, differences))
+
+
+def get_info_json() -> str:
+    """
+    Returns the text of an .info.json file of a YouTube video in the
+    order of keys yt-dlp writes: a few MB of formats, fragments,
+    thumbnails and subtitles first, then the keys of
+    GuessFilename.JSON_METADATA_KEYS and the requested formats, and
+    some small keys at the end.
+    """
+
+    formats = [{'format_id': str(number), 'url': 'https://example.com/videoplayback?itag=%i&sig=%s' % (number, 'x' * 200),
+                'tbr': number * 1.5, 'http_headers': {'Accept': '*/*', 'User-Agent': 'Mozilla/5.0'},
+                'fragments': [{'url': 'https://example.com/fragment/%i/%i' % (number, fragment), 'duration': 5.0}
+                              for fragment in range(40)]} for number in range(60)]
+    data = {
+        'id': 'Ahg8OBYixL0', 'title': 'The Star7 PDA Prototype', 'formats': formats,
+        'thumbnails': [{'url': 'https://i.ytimg.com/vi/Ahg8OBYixL0/%i.jpg' % number, 'preference': -number}
+                       for number in range(40)],
+        'automatic_captions': {language: [{'ext': 'vtt', 'url': 'https://example.com/caption/' + language + '/' + 'y' * 200}]
+                               for language in ['de', 'en', 'fr', 'es', 'it', 'pt', 'ru', 'ja', 'ko', 'zh'] * 10},
+        'upload_date': '20070913', 'webpage_url_domain': 'youtube.com', 'extractor': 'youtube', 'extractor_key': 'Youtube',
+        'display_id': 'Ahg8OBYixL0', 'fulltitle': 'The Star7 PDA Prototype', 'duration_string': '9:51',
+        'requested_formats': formats[-2:], 'format_id': '59+58', 'ext': 'mp4', 'protocol': 'https+https',
+        'width': 1280, 'height': 720, 'vcodec': 'avc1.64001F', 'acodec': 'mp4a.40.2', '_type': 'video',
+    }
+    return json.dumps(data, indent=4)
+
+
+def benchmark_json(number: int = 20) -> None:
+    """
+    Compares parsing an .info.json file (see get_info_json()) with
+    json.load() and with JsonKeyReader the way
+    derive_new_filename_from_json_metadata() does: the time and the
+    peak of the allocated memory.
+    """
+
+    directory = tempfile.mkdtemp()
+    filename = os.path.join(directory, 'benchmark.info.json')
+    with open(filename, 'w', encoding='utf-8') as jsonfile:
+        jsonfile.write(get_info_json())
+    guess_filename = GuessFilename(get_config(), logging.getLogger())
+    keys = GuessFilename.JSON_METADATA_KEYS
+
+    def load() -> dict[str, object]:
+        with open(filename, encoding='utf-8') as jsonfile:
+            return {key: value for key, value in json.load(jsonfile).items() if key in keys}
+
+    def read() -> dict[str, object]:
+        with open(filename, encoding='utf-8') as jsonfile:
+            return JsonKeyReader(jsonfile).read(keys, guess_filename.has_json_metadata_keys)
+
+    results = {}
+    print('%i parses of an .info.json file of %.1f MB' % (number, os.path.getsize(filename) / 1024 / 1024))
+    for name, parser in [('json.load', load), ('JsonKeyReader', read)]:
+        seconds = min(timeit.repeat(parser, number=1, repeat=number))
+        tracemalloc.start()
+        results[name] = parser()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print('%-15s %8.2f ms %8.2f MB peak' % (name, seconds * 1000, peak / 1024 / 1024))
+    if results['json.load'] != results['JsonKeyReader']:
+        print('ERROR: JsonKeyReader returns other values than json.load')
+    shutil.rmtree(directory)
+
+
+BENCHMARKS: dict[str, Callable[..., None]] = {
+    'matcher': benchmark_matcher,
+    'cues': benchmark_cues,
+    'fuzzy': benchmark_fuzzy,
+    'context': benchmark_context,
+    'redos': benchmark_redos,
+    'startup': benchmark_startup,
+    'backends': benchmark_backends,
+    'pixel': benchmark_pixel,
+    'json': benchmark_json,
+}
+
+
+def main() -> None:
+    if len(sys.argv) < 2 or sys.argv[1] not in BENCHMARKS:
+        print('usage: ' + sys.argv[0] + ' {' + ','.join(BENCHMARKS) + '} [NUMBER|DIRECTORY]')
+        sys.exit(1)
+    logging.basicConfig(level=logging.ERROR)
+    BENCHMARKS[sys.argv[1]](*[int(argument) if argument.isdigit() else argument for argument in sys.argv[2:3]])
+
+
+if __name__ == "__main__":
+    main()
+
+# END OF FILE #################################################################
@@ -14,8 +14,187 @@ import os
 import os.path
 import sys
 import re
+import subprocess
+import io
+import json
+import socket
+import threading
+import shutil
+import itertools
+import contextlib
+import types
+import struct
+import time
+import guessfilename
 from guessfilename import GuessFilename
 from guessfilename import FileSizePlausibilityException
+from guessfilename import CombinedRuleMatcher
+from guessfilename import KeywordMatcher
+from guessfilename import FuzzyIndex
+from guessfilename import TableRule
+from guessfilename import RuleStatistics
+from guessfilename import PdfTextCache, PixelMetadataCache
+from guessfilename import PdfDocument, NoPdfContentException
+from guessfilename import PixelMetadataReader, JsonKeyReader
+from guessfilename import start_content_workers, analyse_content_in_worker
+from guessfilename import serve, serve_connection, send_request
+from guessfilename import read_names, map_names
+from guessfilename import walk_files, get_batches
+from guessfilename import RenamePlan, rollback_journal, rename_no_replace
+
+
+class FakePdfPage(object):
+    """A page of get_pdf_document() counting the extractions of its text"""
+
+    def __init__(self, text):
+        self.text = text
+        self.extractions = 0
+
+    def extract_text(self):
+        self.extractions += 1
+        return self.text
+
+
+def get_pdf_document(texts, cache=None, filename='test.pdf'):
+    """Returns a PdfDocument with the page texts without parsing a PDF file"""
+
+    reader = types.SimpleNamespace(pages=[FakePdfPage(text) for text in texts])
+    return PdfDocument(filename, lambda filename: reader, cache)
+
+
+def write_text_pdf(filename, texts):
+    """Writes a minimal PDF file with one line of text per page"""
+
+    objects = ['<< /Type /Catalog /Pages 2 0 R >>',
+               '<< /Type /Pages /Kids [' + ' '.join('%i 0 R' % (4 + 2 * index) for index in range(len(texts))) +
+               '] /Count %i >>' % len(texts),
+               '<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>']
+    for index, text in enumerate(texts):
+        stream = 'BT /F1 12 Tf 72 712 Td (%s) Tj ET' % text
+        objects.append('<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Resources << /Font << /F1 3 0 R >> >> ' +
+                       '/Contents %i 0 R >>' % (5 + 2 * index))
+        objects.append('<< /Length %i >>\nstream\n%s\nendstream' % (len(stream), stream))
+    output = b'%PDF-1.4\n'
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(output))
+        output += ('%i 0 obj\n%s\nendobj\n' % (number, body)).encode('latin-1')
+    xref = len(output)
+    output += ('xref\n0 %i\n0000000000 65535 f \n' % (len(objects) + 1)).encode('latin-1')
+    output += ''.join('%010i 00000 n \n' % offset for offset in offsets).encode('latin-1')
+    output += ('trailer\n<< /Size %i /Root 1 0 R >>\nstartxref\n%i\n%%%%EOF\n' % (len(objects) + 1, xref)).encode('latin-1')
+    with open(filename, 'wb') as pdffile:
+        pdffile.write(output)
+
+
+# the meta-data of the classes of Pixel camera files with tags derive_new_filename_for_pixel_files() does not use:
+PIXEL_METADATA = [
+    ({'File:FileType': 'JPEG'}, ''),
+    ({'File:FileType': 'JPEG', 'XMP:SpecialTypeID': 'com.google.android.apps.camera.gallery.specialtype.SpecialType-NIGHT'},
+     ' -- nightsight'),
+    ({'File:FileType': 'JPEG', 'XMP:FullPanoWidthPixels': 8000}, ' -- panorama'),
+    ({'File:FileType': 'JPEG', 'XMP:FullPanoWidthPixels': 8000, 'XMP:IsPhotosphere': 1}, ' -- photosphere'),
+    ({'File:FileType': 'JPEG', 'XMP:SpecialTypeID': 'com.google.android.apps.camera.gallery.specialtype.SpecialType-PORTRAIT'},
+     ' -- selfie'),
+    ({'File:FileType': 'JPEG', 'XMP:SpecialTypeID': 'com.google.android.apps.camera.gallery.specialtype.SpecialType-PORTRAIT',
+      'XMP:ProfilesType': 'DepthPhoto', 'XMP:CamerasDepthMapNear': 0.2}, ' -- selfie blurred'),
+    ({'File:FileType': 'MP4', 'QuickTime:AudioChannels': 2, 'QuickTime:ComAndroidCaptureFps': 30}, ''),
+    ({'File:FileType': 'MP4', 'QuickTime:ComAndroidCaptureFps': 30}, ' -- timelapse'),
+    ({'File:FileType': 'MP4', 'QuickTime:AudioChannels': 2, 'QuickTime:ComAndroidCaptureFps': 240}, ' -- slowmotion'),
+    ({'File:FileType': 'MP4', 'QuickTime:AudioChannels': 2}, ' -- lsvideo'),
+    ({'File:FileType': 'MP4'}, ' -- nightsight'),
+]
+PIXEL_METADATA_NOISE = {'File:FileModifyDate': '2020:11:11 19:12:50+01:00', 'File:FileSize': 3456789, 'EXIF:Make': 'Google',
+                        'EXIF:Model': 'Pixel 4a', 'XMP:Version': 1, 'QuickTime:MatrixStructure': '1 0 0 0 1 0 0 0 1',
+                        'Composite:ImageSize': '4032 3024'}
+
+
+class FakeExifTool(object):
+    """An exiftool.ExifToolHelper returning the meta-data of the file names from PIXEL_METADATA"""
+
+    running = True
+
+    def __init__(self):
+        self.calls = []
+
+    def get_metadata(self, files):
+        self.calls.append(files)
+        return [dict(PIXEL_METADATA[int(os.path.basename(filename)[20:22]) % len(PIXEL_METADATA)][0],
+                     SourceFile=filename, **PIXEL_METADATA_NOISE) for filename in files]
+
+    def get_tags(self, files, tags, params=None):
+        return [{key: value for key, value in metadata.items() if key in tags or key == 'SourceFile'}
+                for metadata in self.get_metadata(files)]
+
+    def terminate(self):
+        self.running = False
+
+
+def get_mp4_box(boxtype, payload):
+    return struct.pack('>I', 8 + len(payload)) + boxtype + payload
+
+
+def write_pixel_file(filename, metadata, moov_at_end=False):
+    """Writes a JPEG or MP4 file with the XMP or QuickTime meta-data of a PIXEL_METADATA entry"""
+
+    if metadata['File:FileType'] == 'JPEG':
+        properties = {'XMP:SpecialTypeID': '<GCamera:SpecialTypeID>%s</GCamera:SpecialTypeID>',
+                      'XMP:FullPanoWidthPixels': '<GPano:FullPanoWidthPixels>%s</GPano:FullPanoWidthPixels>',
+                      'XMP:IsPhotosphere': '<GPano:IsPhotosphere>%s</GPano:IsPhotosphere>',
+                      'XMP:ProfilesType': '<Device:Profiles><rdf:Seq><rdf:li rdf:parseType="Resource">' +
+                      '<Device:Profile Profile:Type="%s"/></rdf:li></rdf:Seq></Device:Profiles>',
+                      'XMP:CamerasDepthMapNear': '<Device:Cameras><rdf:Seq><rdf:li rdf:parseType="Resource">' +
+                      '<Device:Camera rdf:parseType="Resource"><Camera:DepthMap DepthMap:Near="%s"/>' +
+                      '</Device:Camera></rdf:li></rdf:Seq></Device:Cameras>'}
+        namespaces = ' '.join('xmlns:%s="http://ns.google.com/photos/1.0/%s/"' % (name, name.lower())
+                              for name in ['GCamera', 'GPano', 'Device', 'Profile', 'Camera', 'DepthMap'])
+
+        def get_xmp(keys):
+            return ('<?xpacket begin="\ufeff" id="W5M0MpCehiHzreSzNTczkc9d"?><x:xmpmeta xmlns:x="adobe:ns:meta/" ' +
+                    'x:xmptk="Adobe XMP Core 5.1.0"><rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#">' +
+                    '<rdf:Description rdf:about="" %s xmpNote:HasExtendedXMP="0123" ' % namespaces +
+                    'xmlns:xmpNote="http://ns.adobe.com/xmp/note/">' +
+                    ''.join(properties[key] % metadata[key] for key in keys if key in metadata) +
+                    '</rdf:Description></rdf:RDF></x:xmpmeta><?xpacket end="w"?>').encode('utf-8')
+
+        def get_segment(marker, payload):
+            return b'\xff' + marker + struct.pack('>H', len(payload) + 2) + payload
+
+        # the depth map structures are in the extended XMP like on a Pixel:
+        extended = get_xmp(['XMP:ProfilesType', 'XMP:CamerasDepthMapNear'])
+        content = b'\xff\xd8' + get_segment(b'\xe0', b'JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00') + \
+            get_segment(b'\xe1', b'http://ns.adobe.com/xap/1.0/\x00' +
+                        get_xmp(['XMP:SpecialTypeID', 'XMP:FullPanoWidthPixels', 'XMP:IsPhotosphere'])) + \
+            b''.join(get_segment(b'\xe1', b'http://ns.adobe.com/xmp/extension/\x00' + b'0' * 32 +
+                                 struct.pack('>II', len(extended), offset) + extended[offset:offset + 100])
+                     for offset in range(0, len(extended), 100)) + \
+            b'\xff\xda\x00\x02' + b'\xff\xe1\x00\x10http://ns.ad' + b'\x00' * 1000 + b'\xff\xd9'
+    else:
+        def get_track(handler, description):
+            return get_mp4_box(b'trak', get_mp4_box(b'tkhd', b'\x00' * 84) + get_mp4_box(b'mdia', get_mp4_box(
+                b'hdlr', b'\x00' * 8 + handler + b'\x00' * 13) + get_mp4_box(b'minf', get_mp4_box(b'stbl', get_mp4_box(
+                    b'stsd', b'\x00' * 4 + struct.pack('>I', 1) + description)))))
+
+        moov = get_mp4_box(b'mvhd', b'\x00' * 100) + \
+            get_track(b'vide', get_mp4_box(b'avc1', b'\x00' * 78))
+        if 'QuickTime:AudioChannels' in metadata:
+            moov += get_track(b'soun', get_mp4_box(b'mp4a', b'\x00' * 6 + b'\x00\x01' + b'\x00' * 8 +
+                                                   struct.pack('>HHHHI', metadata['QuickTime:AudioChannels'], 16, 0, 0,
+                                                               48000 << 16)))
+        if 'QuickTime:ComAndroidCaptureFps' in metadata:
+            moov += get_mp4_box(b'meta', get_mp4_box(b'hdlr', b'\x00' * 8 + b'mdta' + b'\x00' * 13) + get_mp4_box(
+                b'keys', b'\x00' * 4 + struct.pack('>I', 2) + get_mp4_box(b'mdta', b'com.android.version') +
+                get_mp4_box(b'mdta', b'com.android.capture.fps')) + get_mp4_box(b'ilst', get_mp4_box(
+                    struct.pack('>I', 1), get_mp4_box(b'data', struct.pack('>II', 1, 0) + b'13')) + get_mp4_box(
+                    struct.pack('>I', 2), get_mp4_box(b'data', struct.pack('>II', 23, 0) +
+                                                      struct.pack('>f', metadata['QuickTime:ComAndroidCaptureFps'])))))
+        boxes = [get_mp4_box(b'ftyp', b'isom\x00\x00\x02\x00isomiso2mp41'), get_mp4_box(b'moov', moov),
+                 get_mp4_box(b'mdat', b'\x00' * 1000)]
+        content = b''.join(boxes[:1] + boxes[:0:-1] if moov_at_end else boxes)
+    with open(filename, 'wb') as mediafile:
+        mediafile.write(content)
+    modified = time.mktime((2020, 11, 11, 19, 12, 50, 0, 0, -1))
+    os.utime(filename, (modified, modified))
 
 
 class TestGuessFilename(unittest.TestCase):
@@ -75,6 +254,11 @@ class TestGuessFilename(unittest.TestCase):
         self.assertTrue(os.path.isfile(tmp_oldfile2))
         oldbasename2 = os.path.basename(tmp_oldfile2)
         self.assertFalse(self.guess_filename.rename_file(dirname, oldbasename, oldbasename2, dryrun=True, quiet=True))
+        with open(tmp_oldfile2, 'w') as output:
+            output.write('existing')
+        self.assertFalse(self.guess_filename.rename_file(dirname, oldbasename, oldbasename2, dryrun=False, quiet=True))
+        self.assertTrue(os.path.isfile(tmp_oldfile1))
+        self.assertEqual(open(tmp_oldfile2).read(), 'existing')
         os.remove(tmp_oldfile2)
 
         # no change with dryrun set:
@@ -89,6 +273,50 @@ class TestGuessFilename(unittest.TestCase):
 
         os.remove(newfilename)
 
+    def test_rename_no_replace(self):
+
+        tmpdir = tempfile.mkdtemp()
+        for basename in ['a', 'b']:
+            with open(os.path.join(tmpdir, basename), 'w') as output:
+                output.write(basename)
+
+        # with renameat2() on Linux and with the check before os.rename() elsewhere:
+        get_renameat2 = guessfilename.get_renameat2
+        for renameat2 in [get_renameat2(), None]:
+            guessfilename.get_renameat2 = lambda: renameat2
+            try:
+                with self.assertRaises(FileExistsError):
+                    rename_no_replace(os.path.join(tmpdir, 'a'), os.path.join(tmpdir, 'b'))
+                with self.assertRaises(FileNotFoundError):
+                    rename_no_replace(os.path.join(tmpdir, 'missing'), os.path.join(tmpdir, 'c'))
+                rename_no_replace(os.path.join(tmpdir, 'a'), os.path.join(tmpdir, 'c'))
+                rename_no_replace(os.path.join(tmpdir, 'c'), os.path.join(tmpdir, 'a'))
+            finally:
+                guessfilename.get_renameat2 = get_renameat2
+            self.assertEqual([open(os.path.join(tmpdir, basename)).read() for basename in ['a', 'b']], ['a', 'b'])
+            self.assertFalse(os.path.exists(os.path.join(tmpdir, 'c')))
+
+        # a file created after deriving the new file name is neither replaced nor moved:
+        os.mkdir(os.path.join(tmpdir, guessfilename.SUCCESS_DIR))
+        basename = 'IMG_20161014_214404.jpg'
+        open(os.path.join(tmpdir, basename), 'w').close()
+        guess_filename = GuessFilename(self.guess_filename.config, logging)
+        self.assertTrue(guess_filename.directory_index.is_file(os.path.join(tmpdir, basename)))
+        with open(os.path.join(tmpdir, '2016-10-14T21.44.04.jpg'), 'w') as output:
+            output.write('concurrent')
+        with contextlib.redirect_stdout(io.StringIO()), self.assertLogs(level='ERROR'):
+            self.assertEqual(guess_filename.handle_file(os.path.join(tmpdir, basename), False), '2016-10-14T21.44.04.jpg')
+        self.assertEqual(sorted(os.listdir(tmpdir)), ['2016-10-14T21.44.04.jpg', basename, 'a', 'b', guessfilename.SUCCESS_DIR])
+        self.assertEqual(os.listdir(os.path.join(tmpdir, guessfilename.SUCCESS_DIR)), [])
+
+        # moving to SUCCESS_DIR does not replace files either:
+        open(os.path.join(tmpdir, guessfilename.SUCCESS_DIR, 'b'), 'w').close()
+        with self.assertLogs(level='ERROR'):
+            guessfilename.move_to_success_dir(tmpdir, 'b', guess_filename.directory_index)
+        self.assertEqual(open(os.path.join(tmpdir, 'b')).read(), 'b')
+
+        shutil.rmtree(tmpdir)
+
     def test_youtube_json_metadata(self):
 
         tmpdir=tempfile.mkdtemp()
@@ -464,6 +692,14 @@ class TestGuessFilename(unittest.TestCase):
   "tbr": 355.714
 }""")
 
+        # large .info.json files are read by JsonKeyReader:
+        guess_filename = GuessFilename(self.guess_filename.config, logging)
+        guess_filename.JSON_STREAM_SIZE = 0
+        self.assertEqual(guess_filename.derive_new_filename_from_json_metadata(tmpdir, os.path.basename(mediafile),
+                                                                               os.path.basename(jsonfile)),
+                         self.guess_filename.derive_new_filename_from_json_metadata(tmpdir, os.path.basename(mediafile),
+                                                                                    os.path.basename(jsonfile)))
+
         new_mediafilename = self.guess_filename.handle_file(mediafile, False)
         assert(type(new_mediafilename) == str)
         new_mediafilename_generated = os.path.join(tmpdir, new_mediafilename)
@@ -1021,6 +1257,823 @@ class TestGuessFilename(unittest.TestCase):
 #                         '')
 
 
+    def test_old_filename_rule_index(self):
+
+        def candidates(filename):
+            return [rule[0] for rule in self.guess_filename.get_old_filename_rule_candidates(filename)]
+
+        # every candidate list keeps the order of precedence of OLD_FILENAME_RULES:
+        order = [rule[0] for rule in self.guess_filename.OLD_FILENAME_RULES]
+        for filename in ['IMG_20161014_214404.jpg', '2016-03-05 10er.pdf', 'Screenshot_2017-11-29_10-32-12.png', 'foo.txt']:
+            self.assertEqual(candidates(filename), sorted(candidates(filename), key=order.index))
+
+        self.assertIn('img', candidates('IMG_20161014_214404.jpg'))
+        self.assertNotIn('vid', candidates('IMG_20161014_214404.jpg'))
+        self.assertNotIn('img', candidates('2016-03-05 10er.pdf'))
+        self.assertIn('konicaminolta', candidates('20052915100.pdf'))
+
+        # rules without a dispatch prefix are candidates for any file name:
+        for filename in ['IMG_20161014_214404.jpg', '2016-03-05 10er.pdf', 'foo.txt', 'Ü.pdf']:
+            self.assertIn('newspaper1', candidates(filename))
+            self.assertIn('boox_exported', candidates(filename))
+
+        # file names without any matching dispatch prefix only get the rules without prefix:
+        self.assertEqual(candidates('foo.txt'), ['games', 'boox_exported', 'newspaper1'])
+        self.assertFalse(self.guess_filename.derive_new_filename_from_old_filename('foo.txt'))
+
+    def test_combined_rule_matcher(self):
+
+        self.assertEqual(CombinedRuleMatcher.get_noncapturing_pattern(r'(?P<year>\d{4})-(\d{2})(?:x)?'),
+                         r'(?:\d{4})-(?:\d{2})(?:x)?')
+        self.assertEqual(CombinedRuleMatcher.get_noncapturing_pattern(r'[(]\(a[^]()](b)'),
+                         r'[(]\(a[^]()](?:b)')
+
+        # the combined matcher returns the first matching pattern, just like trying them one after another:
+        patterns = [regex for (_, _, regex) in self.guess_filename.OLD_FILENAME_RULES if regex]
+        matcher = CombinedRuleMatcher(patterns)
+        for filename in ['IMG_20161014_214404.jpg', '2016-03-05 10er.pdf', 'C110014365208EUR20150930001.pdf',
+                         '2017-11-05T10.56.11_IKS-00000000512345678901234567890.csv',
+                         'Screenshot_2017-11-29_10-32-12.png', 'foo.txt']:
+            expected = next((index for index, regex in enumerate(patterns) if regex.match(filename)), None)
+            self.assertEqual(matcher.match(filename), expected)
+
+        self.assertEqual(CombinedRuleMatcher(patterns[:2], [7, 9]).match('C110014365208EUR20150930001.pdf'), 7)
+        self.assertIsNone(CombinedRuleMatcher([]).match('foo.txt'))
+
+    def test_keyword_matcher(self):
+
+        matcher = KeywordMatcher(['bill', 'Hive', ' A1 ', ' a1 ', '(?i)oekostrom', 'oeko', 'ill', 'llama', '(?i)OEKO'])
+        self.assertEqual(matcher.find('2019-04-01 OEKOSTROM bill -- scan.pdf'), {'(?i)oekostrom', '(?i)OEKO', 'bill', 'ill'})
+        self.assertEqual(matcher.find('oeko billlama A1 a1 Hive'), {'oeko', '(?i)OEKO', 'bill', 'ill', 'llama', ' A1 ', ' a1 ', 'Hive'})
+        self.assertEqual(matcher.find('hive BILL'), set())
+        self.assertEqual(KeywordMatcher([]).find('foo'), set())
+
+        # the cues of OLD_FILENAME_RULE_CUES skip rules without calling them:
+        guess_filename = GuessFilename(self.guess_filename.config, logging)
+        guess_filename.filename_rule_bill = lambda *args: self.fail('rule without its cue called')
+        guess_filename.build_old_filename_rule_index()
+        self.assertFalse(guess_filename.derive_new_filename_from_old_filename('2016-01-19 foobar baz 12,12EUR.pdf'))
+
+    def test_fuzzy_index(self):
+
+        import difflib
+        from fuzzywuzzy import fuzz
+        document = 'Kundennummer: 4711 Vertragskonto: 200123456789\nIhre TAN-Liste ist in Verlust geraten. ' * 5 + \
+            'Transaktionsnumern (TAN) Seite 1 von 2'
+        # the results are identical to fuzz.partial_ratio() with the installed backend and with difflib:
+        installed = fuzz.SequenceMatcher
+        for backend in [installed, difflib.SequenceMatcher]:
+            fuzz.SequenceMatcher = backend
+            try:
+                index = FuzzyIndex(document)
+                for string in ['Transaktionsnummern (TANs)', 'Ihre TAN-Liste in Verlust geraten', 'Vertragskonto: 200123456789',
+                               'AT086000000007042401', 'Prämienvorschreibung', '4711', 'X', '', document, document + '!',
+                               'Ihre TAN-Liste ist in Verlust geraten. Kundennummer: 4711 Vertragskonto: 200123456789 ' * 2]:
+                    for threshold in [0, 64, 90, 100]:
+                        self.assertEqual(index.is_similar(string, threshold), fuzz.partial_ratio(document, string) > threshold,
+                                         (backend, string, threshold))
+            finally:
+                fuzz.SequenceMatcher = installed
+
+        # all rules comparing strings with the same document share its index:
+        self.assertIs(self.guess_filename.get_fuzzy_index(document), self.guess_filename.get_fuzzy_index(document[:]))
+        self.assertIsNot(self.guess_filename.get_fuzzy_index(document), self.guess_filename.get_fuzzy_index('foo'))
+
+    def test_rule_table(self):
+
+        rule_table = [
+            {'name': 'invoice', 'pattern': r'Invoice_(?P<number>\d+)_(?P<year>\d{4})(?P<month>\d{2})(?P<day>\d{2})\.pdf',
+             'template': '{year}-{month}-{day} Example Shop Invoice {number} -- {tags}.pdf', 'tags': ['bill']},
+            {'name': 'dated', 'filename_contains': ['Kontoauszug', '{SALARY_IDSTRING}'], 'config': ['SALARY_IDSTRING'],
+             'template': '{datetimestr} {SALARY_IDSTRING} Kontoauszug -- {tags}.{extension}', 'tags': ['bank', 'bill']},
+            {'name': 'missingconfig', 'pattern': 'Foo', 'config': ['THIS_SETTING_DOES_NOT_EXIST'], 'template': 'Bar'},
+            {'name': 'donation', 'source': 'content', 'filename_contains': ['Spende'],
+             'content_contains': ['Spendenbestätigung'], 'charge': ['Betrag', 'EUR'],
+             'template': '{datetimestr} Spende {charge}€ -- {tags}.pdf', 'tags': ['taxes']},
+        ]
+        guess_filename = GuessFilename(self.guess_filename.config, logging, rule_table)
+        self.assertEqual([tablerule.name for tablerule in guess_filename.table_rules], ['invoice', 'dated', 'donation'])
+
+        self.assertEqual(guess_filename.derive_new_filename_from_old_filename('Invoice_4711_20240229.pdf'),
+                         '2024-02-29 Example Shop Invoice 4711 -- bill.pdf')
+        self.assertEqual(guess_filename.derive_new_filename_from_old_filename('2024-03-01 SALARYID Kontoauszug -- bill.PDF'),
+                         '2024-03-01 SALARYID Kontoauszug -- bill bank.PDF')
+        self.assertFalse(guess_filename.derive_new_filename_from_old_filename('SALARYID Kontoauszug.pdf'))
+        # the rules of OLD_FILENAME_RULES take precedence:
+        self.assertEqual(guess_filename.derive_new_filename_from_old_filename('IMG_20161014_214404.jpg'),
+                         self.guess_filename.derive_new_filename_from_old_filename('IMG_20161014_214404.jpg'))
+
+        # the dispatch prefix is derived from the pattern:
+        self.assertIn('invoice', [rule[0] for rule in guess_filename.get_old_filename_rule_candidates('Invoice_1.pdf')])
+        self.assertNotIn('invoice', [rule[0] for rule in guess_filename.get_old_filename_rule_candidates('foo.txt')])
+        self.assertEqual(guess_filename.table_rules[0].get_dispatch_prefix(), 'Invoice_')
+        self.assertEqual(TableRule({'name': 'x', 'pattern': r'\d{8}', 'template': ''}, None).get_dispatch_prefix(), r'\d')
+        self.assertEqual(TableRule({'name': 'x', 'pattern': 'Scans?_', 'template': ''}, None).get_dispatch_prefix(), 'Scan')
+        self.assertIsNone(TableRule({'name': 'x', 'pattern': 'Foo|Bar', 'template': ''}, None).get_dispatch_prefix())
+
+        donation = guess_filename.table_rules[2]
+        self.assertEqual(guess_filename.derive_new_filename_from_table_rule(
+            donation, '2024-01-10 Spende.pdf', guess_filename.split_filename_entities('2024-01-10 Spende.pdf'), None,
+            get_pdf_document(['Spendenbestätigung\nBetrag 50,00 EUR\n'])), '2024-01-10 Spende 50,00€ -- taxes.pdf')
+        self.assertFalse(guess_filename.derive_new_filename_from_table_rule(
+            donation, '2024-01-10 Spende.pdf', guess_filename.split_filename_entities('2024-01-10 Spende.pdf'), None,
+            get_pdf_document(['Rechnung\nBetrag 50,00 EUR\n'])))
+
+        # invalid rule definitions:
+        for definition in [{'name': 'x'},
+                           {'name': 'x', 'pattern': 'Foo', 'template': '{unknown}'},
+                           {'name': 'x', 'pattern': '(', 'template': ''},
+                           {'name': 'x', 'pattern': 'Foo', 'template': '', 'colour': 'blue'},
+                           {'name': 'x', 'pattern': 'Foo', 'content_contains': ['bar'], 'template': ''},
+                           {'name': 'x', 'pattern': 'Foo', 'pages': 1, 'template': ''},
+                           {'name': 'x', 'source': 'content', 'pattern': 'Foo', 'pages': 3, 'template': ''},
+                           {'name': 'x', 'template': ''}]:
+            with self.assertRaises(ValueError):
+                TableRule(definition, None)
+
+    def test_rule_statistics(self):
+
+        self.assertEqual([rule[0] for rule in self.guess_filename.content_rules], self.guess_filename.CONTENT_RULES)
+
+        self.guess_filename.stats = RuleStatistics()
+        for filename in ['IMG_20161014_214404.jpg', 'VID_20170105_173104.mp4', 'foo.txt']:
+            self.guess_filename.derive_new_filename_from_old_filename(filename)
+        rows = {row['rule']: row for row in self.guess_filename.stats.get_rows()}
+        self.assertEqual((rows['filename/img']['attempts'], rows['filename/img']['hits']), (1, 1))
+        self.assertEqual((rows['filename/vid']['attempts'], rows['filename/vid']['hits']), (1, 1))
+        # rules whose regex does not match are no attempts:
+        self.assertNotIn('filename/newspaper1', rows)
+        # rules whose cues are missing are no attempts either:
+        self.assertNotIn('filename/games', rows)
+        self.assertEqual((rows['filename/boox_exported']['attempts'], rows['filename/boox_exported']['hits']), (1, 0))
+        self.assertLessEqual(rows['filename/boox_exported']['p50_ms'], rows['filename/boox_exported']['p99_ms'])
+        self.assertIn('filename/img', self.guess_filename.stats.get_table())
+
+        self.assertEqual(RuleStatistics().get_percentile([1.0, 2.0, 3.0, 4.0], 50), 2.0)
+        self.assertEqual(RuleStatistics().get_percentile([float(i) for i in range(1, 101)], 99), 99.0)
+        self.assertEqual(RuleStatistics().get_percentile([5.0], 99), 5.0)
+
+    def test_import_without_side_effects(self):
+
+        # importing neither parses the command line nor imports the modules needed for PDF content:
+        result = subprocess.run([sys.executable, '-c', 'import sys, guessfilename; ' +
+                                 'print(" ".join(module for module in ["pypdf", "fuzzywuzzy"] if module in sys.modules))',
+                                 '--no-such-option'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+        self.assertEqual(result.returncode, 0)
+        self.assertEqual(result.stdout.strip(), '')
+
+    def test_serve_connection(self):
+
+        tmpdir = tempfile.mkdtemp()
+        open(os.path.join(tmpdir, 'IMG_20161014_214404.jpg'), 'w').close()
+        open(os.path.join(tmpdir, 'nothing.txt'), 'w').close()
+
+        server, client = socket.socketpair()
+        thread = threading.Thread(target=serve_connection, args=(self.guess_filename, server))
+        thread.start()
+        with client:
+            response = send_request(client, {'cwd': tmpdir, 'files': ['IMG_20161014_214404.jpg', 'nothing.txt'], 'dryrun': True})
+        thread.join()
+        server.close()
+
+        self.assertEqual(response['results'], ['2016-10-14T21.44.04.jpg', False])
+        self.assertIsNone(response['error'])
+        self.assertIn('I failed to derive new filename', response['output'])
+        # dryrun: the files are not renamed
+        self.assertEqual(sorted(os.listdir(tmpdir)), ['IMG_20161014_214404.jpg', 'nothing.txt'])
+        self.assertNotEqual(os.getcwd(), tmpdir)
+
+        # the daemon runs non-interactively: files which need the user's input are not renamed by other rules
+        self.guess_filename.interactive = False
+        self.assertFalse(self.guess_filename.derive_new_filename_from_old_filename(
+            '20181028T201400 ORF - Tatort - Tatort Blut -ORIGINALhd- playlit.m3u8.mp4'))
+
+        # the directory of the socket is created and a socket which can not be bound is reported:
+        socketpath = os.path.join(tmpdir, 'missing', 'x' * 120)  # too long for a Unix domain socket
+        with self.assertLogs(level='ERROR') as logs, self.assertRaises(SystemExit) as exit:
+            serve(self.guess_filename, socketpath)
+        self.assertEqual(exit.exception.code, 7)
+        self.assertIn('Could not listen on', logs.output[0])
+        self.assertEqual(os.stat(os.path.join(tmpdir, 'missing')).st_mode & 0o777, 0o700)
+
+        shutil.rmtree(tmpdir)
+
+    def test_map_names(self):
+
+        self.assertEqual(list(read_names(io.BytesIO(b'a.txt\nb c.txt\n\nd\xff.txt'), '\n')), ['a.txt', 'b c.txt', 'd\udcff.txt'])
+        self.assertEqual(list(read_names(io.BytesIO(b'a\nb.txt\0c.txt\0'), '\0')), ['a\nb.txt', 'c.txt'])
+
+        output = io.StringIO()
+        self.assertEqual(map_names(self.guess_filename, ['IMG_20161014_214404.jpg', '/tmp/foo/VID_20170105_173104.mp4', 'foo.txt'],
+                                   output), (3, 2))
+        self.assertEqual(output.getvalue(), 'IMG_20161014_214404.jpg\t2016-10-14T21.44.04.jpg\n' +
+                         '/tmp/foo/VID_20170105_173104.mp4\t/tmp/foo/2017-01-05T17.31.04.mp4\n' +
+                         'foo.txt\t\n')
+
+        output = io.StringIO()
+        map_names(self.guess_filename, ['IMG_20161014_214404.jpg', 'foo.txt'], output, jsonl=True)
+        self.assertEqual([json.loads(line) for line in output.getvalue().splitlines()],
+                         [{'old': 'IMG_20161014_214404.jpg', 'new': '2016-10-14T21.44.04.jpg'}, {'old': 'foo.txt', 'new': None}])
+
+    def test_pdf_text_cache(self):
+
+        tmpdir = tempfile.mkdtemp()
+        pdffile = os.path.join(tmpdir, '2020-01-01 foo.pdf')
+        with open(pdffile, 'wb') as output:
+            output.write(b'not a PDF file')
+        cache = PdfTextCache(os.path.join(tmpdir, 'cache', 'pdftext.sqlite'))
+        self.assertIsNone(cache.get(pdffile))
+        cache.put(pdffile, ['first page', 'second page'])
+        self.assertEqual(cache.get(pdffile), ['first page', 'second page'])
+
+        # the stored texts are used instead of parsing the file:
+        guess_filename = GuessFilename(self.guess_filename.config, logging)
+        guess_filename.pdf_text_cache = cache
+        guess_filename.open_pdf = lambda filename: self.fail('PDF file parsed despite the cache')
+        self.assertFalse(guess_filename.derive_new_filename_from_content(tmpdir, '2020-01-01 foo.pdf'))
+
+        # the texts of other PDF backends are stored separately:
+        other_backend = PdfTextCache(os.path.join(tmpdir, 'cache', 'pdftext.sqlite'), backend='pdftotext')
+        self.assertIsNone(other_backend.get(pdffile))
+        other_backend.close()
+
+        # modified files are parsed again:
+        os.utime(pdffile, ns=(0, 1234567890))
+        self.assertIsNone(cache.get(pdffile))
+
+        # with hash_content, copies are found and modifications keeping size and modification time are detected:
+        hashed = PdfTextCache(os.path.join(tmpdir, 'cache', 'pdftext.sqlite'), hash_content=True)
+        hashed.put(pdffile, ['hashed'])
+        copy = os.path.join(tmpdir, 'copy.pdf')
+        shutil.copy(pdffile, copy)
+        self.assertIsNone(cache.get(copy))
+        self.assertEqual(hashed.get(copy), ['hashed'])
+        with open(pdffile, 'wb') as output:
+            output.write(b'not a PDF fil3')
+        os.utime(pdffile, ns=(0, 1234567890))
+        self.assertEqual(cache.get(pdffile), ['hashed'])
+        self.assertIsNone(hashed.get(pdffile))
+
+        # the least recently used texts are removed when exceeding max_bytes:
+        small = PdfTextCache(os.path.join(tmpdir, 'small.sqlite'), max_bytes=30)
+        small.put(pdffile, ['x' * 10])
+        small.put(copy, ['y' * 10])
+        self.assertEqual(small.get(pdffile), ['x' * 10])
+        third = os.path.join(tmpdir, 'third.pdf')
+        shutil.copy(pdffile, third)
+        small.put(third, ['z' * 10])
+        self.assertIsNone(small.get(copy))
+        self.assertEqual(small.get(pdffile), ['x' * 10])
+        self.assertEqual(small.get(third), ['z' * 10])
+
+        for database in [cache, hashed, small]:
+            database.close()
+        shutil.rmtree(tmpdir)
+
+    def test_pdf_document(self):
+
+        # the pages are extracted once when a rule asks for them:
+        document = get_pdf_document(['first page ', 'second page', 'third page'])
+        self.assertEqual(document.get_text(1), 'first page ')
+        pages = document.get_reader().pages
+        self.assertEqual([page.extractions for page in pages], [1, 0, 0])
+        self.assertEqual(document.get_text(), 'first page second page')
+        self.assertEqual(document.get_text(1), 'first page ')
+        self.assertEqual([page.extractions for page in pages], [1, 1, 0])
+
+        # PDF files without text are skipped, even if the first page only is empty:
+        with self.assertRaises(NoPdfContentException):
+            get_pdf_document(['', '']).get_text(1)
+        self.assertEqual(get_pdf_document(['', 'second page']).get_text(1), '')
+        self.assertEqual(get_pdf_document(['', 'second page']).get_text(), 'second page')
+
+        # rules checking the file name first do not open files without their cues:
+        tmpdir = tempfile.mkdtemp()
+        with open(os.path.join(tmpdir, 'foo.pdf'), 'wb') as output:
+            output.write(b'not a PDF file')
+        guess_filename = GuessFilename(self.guess_filename.config, logging)
+        guess_filename.open_pdf = lambda filename: self.fail('PDF file opened without a rule asking for its text')
+        self.assertFalse(guess_filename.derive_new_filename_from_content(tmpdir, 'foo.pdf'))
+
+        # rules needing the first page only leave the second page for later runs in the cache:
+        rule_table = [{'name': 'donation', 'source': 'content', 'content_contains': ['Spendenbestätigung'], 'pages': 1,
+                       'template': '{datetimestr} Spende -- {tags}.pdf', 'tags': ['taxes']}]
+        cache = PdfTextCache(os.path.join(tmpdir, 'pdftext.sqlite'))
+        document = get_pdf_document(['Spendenbestätigung', 'second page'], cache, os.path.join(tmpdir, 'foo.pdf'))
+        tablerule = TableRule(rule_table[0], None)
+        self.assertEqual(guess_filename.derive_new_filename_from_table_rule(
+            tablerule, '2024-01-10 foo.pdf', guess_filename.split_filename_entities('2024-01-10 foo.pdf'), None, document),
+            '2024-01-10 Spende -- taxes.pdf')
+        document.close()
+        self.assertEqual(cache.get(os.path.join(tmpdir, 'foo.pdf')), ['Spendenbestätigung', None])
+        document = get_pdf_document(['', 'second page'], cache, os.path.join(tmpdir, 'foo.pdf'))
+        self.assertEqual(document.get_text(), 'Spendenbestätigungsecond page')
+        self.assertEqual([page.extractions for page in document.get_reader().pages], [0, 1])
+        document.close()
+        self.assertEqual(cache.get(os.path.join(tmpdir, 'foo.pdf')), ['Spendenbestätigung', 'second page'])
+
+        cache.close()
+        shutil.rmtree(tmpdir)
+
+    def test_pdf_backends(self):
+
+        tmpdir = tempfile.mkdtemp()
+        pdffile = os.path.join(tmpdir, 'test.pdf')
+        write_text_pdf(pdffile, ['Hello first page', 'Second page 12,34 EUR', 'Third page'])
+        guess_filename = GuessFilename(self.guess_filename.config, logging)
+        self.assertEqual(PdfDocument(pdffile, guess_filename.open_pdf).get_text(), 'Hello first pageSecond page 12,34 EUR')
+
+        # the other backends extract the same words if their commands are installed:
+        for backend in guess_filename.PDF_BACKENDS:
+            if backend == 'pdftotext' and not (shutil.which('pdftotext') and shutil.which('pdfinfo')):
+                continue
+            guess_filename.pdf_backend = backend
+            document = PdfDocument(pdffile, guess_filename.open_pdf)
+            self.assertEqual(len(document.get_reader().pages), 3)
+            self.assertEqual(document.get_text(1).split(), ['Hello', 'first', 'page'], backend)
+            self.assertEqual(document.get_page(1).split(), ['Second', 'page', '12,34', 'EUR'], backend)
+
+        shutil.rmtree(tmpdir)
+
+    def test_content_budget(self):
+
+        class SlowPage(object):
+            def extract_text(self):
+                while True:
+                    pass
+
+        class LargePage(object):
+            def extract_text(self):
+                return 'x' * (1024 * 1024 * 1024)
+
+        tmpdir = tempfile.mkdtemp()
+        with open(os.path.join(tmpdir, '2020-01-01 foo.pdf'), 'wb') as output:
+            output.write(b'not a PDF file')
+        worker = GuessFilename(self.guess_filename.config, logging)
+        worker.interactive = False
+        try:
+            guessfilename.content_worker = worker
+            for page, budget, message in [
+                    (SlowPage(), (0.2, None), 'exceeded the time budget of 0.2 seconds in rule "easybank_tan_list" ' +
+                     'while extracting page 1'),
+                    (LargePage(), (None, 64 * 1024 * 1024), 'exceeded the memory budget of 64 MB in rule ' +
+                     '"easybank_tan_list" while extracting page 1')]:
+                worker.open_pdf = lambda filename: types.SimpleNamespace(pages=[page])
+                guessfilename.content_worker_budget = budget
+                self.assertEqual(analyse_content_in_worker(tmpdir, '2020-01-01 foo.pdf')[4], message)
+
+            # an exit of the analysis is returned with its output instead of ending the worker:
+            def exit_pdf(filename):
+                print('Could not find command "pdfinfo".')
+                sys.exit(1)
+            worker.open_pdf = exit_pdf
+            self.assertEqual(analyse_content_in_worker(tmpdir, '2020-01-01 foo.pdf')[1:],
+                             ('Could not find command "pdfinfo".\n', [], None, None, 1))
+        finally:
+            guessfilename.content_worker = None
+            guessfilename.content_worker_budget = (None, None)
+
+        # the file is abandoned by handle_file() while the batch continues; dryrun does not move it to ERROR_DIR:
+        filename = os.path.join(tmpdir, '2020-01-01 foo.pdf')
+        os.mkdir(os.path.join(tmpdir, guessfilename.ERROR_DIR))
+        guess_filename = GuessFilename(self.guess_filename.config, logging)
+        for dryrun in [True, False]:
+            guess_filename.content_futures[filename] = types.SimpleNamespace(
+                result=lambda: (False, '', [], None, 'exceeded the time budget of 1 seconds in rule "loan"', None))
+            with contextlib.redirect_stdout(io.StringIO()), self.assertLogs(level='ERROR') as logs:
+                self.assertFalse(guess_filename.handle_file(filename, dryrun))
+            self.assertIn('Abandoned the content analysis of "2020-01-01 foo.pdf": exceeded the time budget', logs.output[0])
+            self.assertEqual(os.listdir(os.path.join(tmpdir, guessfilename.ERROR_DIR)), [] if dryrun else ['2020-01-01 foo.pdf'])
+
+        # main() prints the output of an exited worker and exits the same way:
+        guess_filename.content_futures[os.path.join(tmpdir, 'bar.pdf')] = types.SimpleNamespace(
+            result=lambda: (False, 'Could not find command "pdfinfo".\n', [], None, None, 1))
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output), self.assertRaises(SystemExit) as exit:
+            guess_filename.get_content_result(tmpdir, 'bar.pdf')
+        self.assertEqual(exit.exception.code, 1)
+        self.assertEqual(output.getvalue(), 'Could not find command "pdfinfo".\n')
+
+        shutil.rmtree(tmpdir)
+
+    def test_pixel_metadata(self):
+
+        tmpdir = tempfile.mkdtemp()
+        basenames = ['PXL_20201111_191250000.jpg', 'PXL_20201111_191251000 foo -- bar.jpg', 'foo.jpg', 'PXL_missing.jpg']
+        for basename in basenames[:3]:
+            open(os.path.join(tmpdir, basename), 'w').close()
+        guess_filename = GuessFilename(self.guess_filename.config, logging)
+        session = FakeExifTool()
+        guess_filename.exiftool_session = session
+
+        # one exiftool call for all Pixel files and none per file:
+        guess_filename.PIXEL_METADATA_BATCH_SIZE = 1
+        guess_filename.prefetch_pixel_metadata([os.path.join(tmpdir, basename) for basename in basenames])
+        self.assertEqual(session.calls, [[os.path.join(tmpdir, basenames[0])], [os.path.join(tmpdir, basenames[1])]])
+        guess_filename.PIXEL_METADATA_BATCH_SIZE = 500
+        session.calls = []
+        guess_filename.prefetch_pixel_metadata([os.path.join(tmpdir, basename) for basename in basenames])
+        self.assertEqual(len(session.calls), 1)
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertEqual([guess_filename.handle_file(os.path.join(tmpdir, basename), True) for basename in basenames[:2]],
+                             ['2020-11-11T19.12.50.jpg', '2020-11-11T19.12.50 foo -- bar.jpg'])
+        self.assertEqual(len(session.calls), 1)
+        self.assertEqual(guess_filename.pixel_metadata, {})
+
+        # files without prefetched meta-data are read with the same session which is closed at the end:
+        self.assertEqual(guess_filename.derive_new_filename_for_pixel_files(
+            tmpdir, basenames[0], guess_filename.get_pixel_match(basenames[0])), '2020-11-11T19.12.50.jpg')
+        self.assertEqual(session.calls[-1], [os.path.join(tmpdir, basenames[0])])
+        guess_filename.close_exiftool()
+        self.assertFalse(session.running)
+        self.assertIsNone(guess_filename.exiftool_session)
+
+        shutil.rmtree(tmpdir)
+
+    def test_pixel_metadata_tags(self):
+
+        # the classification of the Pixel camera files is the same with the tags of PIXEL_METADATA_TAGS only:
+        tmpdir = tempfile.mkdtemp()
+        basenames = ['PXL_20201111_191250%03i foo%s' % (index, '.mp4' if metadata['File:FileType'] == 'MP4' else '.jpg')
+                     for index, (metadata, _) in enumerate(PIXEL_METADATA)]
+        expected = ['2020-11-11T19.12.50 foo' + tags + os.path.splitext(basename)[1]
+                    for basename, (_, tags) in zip(basenames, PIXEL_METADATA)]
+        results = {}
+        for debug in [True, False]:
+            guess_filename = GuessFilename(self.guess_filename.config, logging)
+            guess_filename.debug = debug
+            guess_filename.exiftool_session = FakeExifTool()
+            with contextlib.redirect_stdout(io.StringIO()):
+                results[debug] = [guess_filename.derive_new_filename_for_pixel_files(
+                    tmpdir, basename, guess_filename.get_pixel_match(basename)) for basename in basenames]
+        self.assertEqual(results[True], expected)
+        self.assertEqual(results[False], expected)
+
+        # the classification uses no other tags:
+        import inspect
+        source = inspect.getsource(GuessFilename.derive_new_filename_for_pixel_files)
+        source = '\n'.join(line for line in source.splitlines() if 'print_metadata_table_line' not in line)
+        self.assertEqual(set(re.findall(r"'((?:File|XMP|QuickTime|EXIF|Composite):\w+)'", source)),
+                         set(GuessFilename.PIXEL_METADATA_TAGS))
+        shutil.rmtree(tmpdir)
+
+    def test_pixel_metadata_reader(self):
+
+        tmpdir = tempfile.mkdtemp()
+        basenames = ['PXL_20201111_191250%03i foo%s' % (index, '.mp4' if metadata['File:FileType'] == 'MP4' else '.jpg')
+                     for index, (metadata, _) in enumerate(PIXEL_METADATA)]
+        for index, (basename, (metadata, _)) in enumerate(zip(basenames, PIXEL_METADATA)):
+            write_pixel_file(os.path.join(tmpdir, basename), metadata, moov_at_end=index % 2 == 1)
+
+        # the tags of the classification are read without exiftool:
+        for basename, (metadata, _) in zip(basenames, PIXEL_METADATA):
+            filename = os.path.join(tmpdir, basename)
+            result = PixelMetadataReader.read(filename)
+            self.assertEqual(result['SourceFile'], filename)
+            self.assertTrue(guessfilename.GuessFilename.PXL_TIMESTAMP_REGEX.match(result['File:FileModifyDate']))
+            self.assertEqual({key: value for key, value in result.items()
+                              if key in GuessFilename.PIXEL_METADATA_TAGS and key != 'File:FileModifyDate'}, metadata)
+        guess_filename = GuessFilename(self.guess_filename.config, logging)
+        session = FakeExifTool()
+        guess_filename.exiftool_session = session
+        guess_filename.prefetch_pixel_metadata([os.path.join(tmpdir, basename) for basename in basenames])
+        self.assertEqual([guess_filename.derive_new_filename_for_pixel_files(
+            tmpdir, basename, guess_filename.get_pixel_match(basename)) for basename in basenames],
+                         ['2020-11-11T19.12.50 foo' + tags + os.path.splitext(basename)[1]
+                          for basename, (_, tags) in zip(basenames, PIXEL_METADATA)])
+        self.assertEqual(session.calls, [])
+
+        # files which are no JPEG or MP4 files or whose headers are broken are read by exiftool:
+        self.assertEqual(PixelMetadataReader.get_xmp_tag(['{ns}Cameras', '{ns}Camera', '{ns}depthMap', '{ns}Near']),
+                         'XMP:CamerasDepthMapNear')
+        with open(os.path.join(tmpdir, basenames[0]), 'w') as jpegfile:
+            jpegfile.write('no JPEG file')
+        with open(os.path.join(tmpdir, basenames[6]), 'r+b') as mp4file:
+            mp4file.seek(28)
+            mp4file.write(struct.pack('>I', 1000000))  # the size of moov exceeds the file
+        for basename in basenames[:1] + basenames[6:7]:
+            self.assertIsNone(PixelMetadataReader.read(os.path.join(tmpdir, basename)))
+        self.assertIsNone(PixelMetadataReader.read(os.path.join(tmpdir, 'PXL_missing.jpg')))
+        guess_filename.prefetch_pixel_metadata([os.path.join(tmpdir, basename) for basename in basenames])
+        self.assertEqual(session.calls, [[os.path.join(tmpdir, basename) for basename in basenames[:1] + basenames[6:7]]])
+        self.assertEqual(len(guess_filename.pixel_metadata), len(basenames))
+
+        shutil.rmtree(tmpdir)
+
+    def test_pixel_metadata_cache(self):
+
+        tmpdir = tempfile.mkdtemp()
+        basenames = ['PXL_20201111_191250%03i foo%s' % (index, '.mp4' if metadata['File:FileType'] == 'MP4' else '.jpg')
+                     for index, (metadata, _) in enumerate(PIXEL_METADATA)]
+        filenames = [os.path.join(tmpdir, basename) for basename in basenames]
+        for filename, (metadata, _) in zip(filenames, PIXEL_METADATA):
+            write_pixel_file(filename, metadata)
+        with open(filenames[0], 'w') as jpegfile:
+            jpegfile.write('no JPEG file')  # read by exiftool
+        expected = ['2020-11-11T19.12.50 foo' + tags + os.path.splitext(basename)[1]
+                    for basename, (_, tags) in zip(basenames, PIXEL_METADATA)]
+
+        def rename_all(cache):
+            guess_filename = GuessFilename(self.guess_filename.config, logging)
+            guess_filename.exiftool_session = FakeExifTool()
+            guess_filename.pixel_metadata_cache = cache
+            guess_filename.prefetch_pixel_metadata(filenames)
+            return [guess_filename.derive_new_filename_for_pixel_files(tmpdir, basename, guess_filename.get_pixel_match(
+                basename)) for basename in basenames], guess_filename.exiftool_session.calls
+
+        cache = PixelMetadataCache(os.path.join(tmpdir, 'cache', 'exif.sqlite'))
+        self.assertEqual(rename_all(cache), (expected, [filenames[:1]]))
+
+        # the stored meta-data is used instead of reading the files, even by another process:
+        for filename in filenames[1:]:
+            stat = os.stat(filename)
+            with open(filename, 'r+b') as mediafile:
+                mediafile.write(b'\x00' * 12)  # neither JPEG nor MP4 anymore, same size
+            os.utime(filename, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        self.assertEqual(rename_all(PixelMetadataCache(os.path.join(tmpdir, 'cache', 'exif.sqlite'))), (expected, []))
+        self.assertEqual(set(cache.get(filenames)), set(filenames))
+        self.assertEqual(cache.get(filenames[1:2])[filenames[1]]['SourceFile'], filenames[1])
+
+        # modified files are read again:
+        os.utime(filenames[1], ns=(0, 1234567890))
+        self.assertEqual(set(cache.get(filenames)), set(filenames) - {filenames[1]})
+        self.assertEqual(cache.get([os.path.join(tmpdir, 'PXL_missing.jpg')]), {})
+
+        # the least recently used meta-data is removed when exceeding max_bytes:
+        small = PixelMetadataCache(os.path.join(tmpdir, 'small.sqlite'), max_bytes=250)
+        small.put([{'SourceFile': filenames[2], 'File:FileType': 'JPEG', 'XMP:SpecialTypeID': 'x' * 50}])
+        small.put([{'SourceFile': filenames[3], 'File:FileType': 'JPEG', 'XMP:SpecialTypeID': 'y' * 50}])
+        self.assertEqual(set(small.get(filenames[2:3])), set(filenames[2:3]))
+        small.put([{'SourceFile': filenames[4], 'File:FileType': 'JPEG', 'XMP:SpecialTypeID': 'z' * 50}])
+        self.assertEqual(set(small.get(filenames)), {filenames[2], filenames[4]})
+        small.close()
+        cache.close()
+
+        shutil.rmtree(tmpdir)
+
+    def test_json_key_reader(self):
+
+        data = {'formats': [{'format_id': str(number), 'url': 'https://example.com/' + str(number), 'tbr': number / 3,
+                             'http_headers': {'Accept': '*/*'}, 'fragments': [{'path': '"[}\\'}]}
+                            for number in range(10)],
+                'upload_date': '20070913', 'extractor': 'youtube', 'duration': 591, 'tags': ['java', 'oak'],
+                'fulltitle': 'The "Star7" PDA Prototype \u2028 €', 'ext': 'mp4', 'is_live': False,
+                'display_id': 'Ahg8OBYixL0', 'average_rating': 4.5, 'subtitles': {}, 'duration_string': '9:51',
+                'release_timestamp': None, 'thumbnails': [{'url': 'x', 'preference': -37}]}
+        keys = ['upload_date', 'fulltitle', 'ext', 'duration', 'average_rating', 'is_live', 'release_timestamp',
+                'formats', 'missing']
+        text = json.dumps(data, indent=2, ensure_ascii=False)
+        for chunk_size in [1, 2, 3, 7, 64 * 1024]:
+            reader = JsonKeyReader(io.StringIO(text))
+            reader.CHUNK_SIZE = chunk_size
+            self.assertEqual(reader.read(keys), {key: value for key, value in data.items() if key in keys})
+
+        # reading stops when all keys are found:
+        stream = io.StringIO(text)
+        reader = JsonKeyReader(stream)
+        reader.CHUNK_SIZE = 10
+        self.assertEqual(reader.read(['upload_date', 'extractor']), {'upload_date': '20070913', 'extractor': 'youtube'})
+        self.assertLess(stream.tell(), text.index('"tags"'))
+
+        # reading stops when the caller needs no further keys:
+        stream = io.StringIO(text)
+        reader = JsonKeyReader(stream)
+        reader.CHUNK_SIZE = 10
+        self.assertEqual(reader.read(keys, lambda values: 'fulltitle' in values),
+                         {key: data[key] for key in ['formats', 'upload_date', 'duration', 'fulltitle']})
+        self.assertLess(stream.tell(), text.index('"is_live"'))
+
+        # a YouTube file needs no "url" and one of ORF TVthek no "upload_date":
+        youtube = {'upload_date': '20070913', 'extractor': 'youtube', 'extractor_key': 'Youtube', 'display_id': 'Ahg8OBYixL0',
+                   'ext': 'mp4', 'duration_string': '9:51', 'fulltitle': 'The Star7 PDA Prototype'}
+        self.assertTrue(self.guess_filename.has_json_metadata_keys(youtube))
+        self.assertFalse(self.guess_filename.has_json_metadata_keys({**youtube, 'upload_date': '2007'}))
+        self.assertFalse(self.guess_filename.has_json_metadata_keys({**youtube, 'extractor_key': 'PeerTube'}))
+        self.assertTrue(self.guess_filename.has_json_metadata_keys({**youtube, 'extractor_key': 'PeerTube',
+                                                                    'webpage_url_domain': 'example.com'}))
+        self.assertFalse(self.guess_filename.has_json_metadata_keys({key: youtube[key] for key in ['extractor_key', 'ext']}))
+        self.assertTrue(self.guess_filename.has_json_metadata_keys({'extractor_key': 'ORFTVthek', 'fulltitle': 'ZIB',
+                                                                    'url': 'https://example.com/', 'ext': 'mp4'}))
+        self.assertFalse(self.guess_filename.has_json_metadata_keys({'extractor_key': ['Youtube']}))
+
+        # no object or invalid JSON:
+        for document in ['[1, 2]', '"foo"', '', '{}', ' { } ']:
+            self.assertEqual(JsonKeyReader(io.StringIO(document)).read(keys), {})
+        for document in ['{"ext": ', '{"formats": [1, 2', '{"ext" 1}', '{"ext": "mp4"', '{ext: 1}', '{"ext": 1.}']:
+            with self.assertRaises(json.JSONDecodeError):
+                JsonKeyReader(io.StringIO(document)).read(keys)
+
+    def test_directory_index(self):
+
+        tmpdir = tempfile.mkdtemp()
+        for basename in ['foo.mp4', 'foo.info.json', 'bar.txt']:
+            open(os.path.join(tmpdir, basename), 'w').close()
+        os.mkdir(os.path.join(tmpdir, guessfilename.ERROR_DIR))
+        os.symlink(os.path.join(tmpdir, 'bar.txt'), os.path.join(tmpdir, 'link.txt'))
+        index = guessfilename.DirectoryIndex()
+        self.assertEqual([index.is_file(os.path.join(tmpdir, basename)) for basename in
+                          ['foo.mp4', 'foo.info.json', 'link.txt', 'missing.txt', guessfilename.ERROR_DIR]],
+                         [True, True, True, False, False])
+        self.assertEqual([index.is_dir(os.path.join(tmpdir, basename)) for basename in
+                          ['foo.mp4', guessfilename.ERROR_DIR, 'missing']], [False, True, False])
+        self.assertTrue(index.is_dir(tmpdir + '/'))
+        self.assertTrue(index.is_dir('/'))
+        self.assertFalse(index.is_file(os.path.join(tmpdir, 'missing', 'foo.txt')))
+
+        # renames by guessfilename are recorded, other changes are noticed after refresh():
+        index.rename(tmpdir, 'bar.txt', os.path.join(tmpdir, guessfilename.ERROR_DIR), 'bar.txt')
+        self.assertFalse(index.is_file(os.path.join(tmpdir, 'bar.txt')))
+        index.rename(tmpdir, 'foo.mp4', tmpdir, 'baz.mp4')
+        self.assertTrue(index.is_file(os.path.join(tmpdir, 'baz.mp4')))
+        open(os.path.join(tmpdir, 'new.txt'), 'w').close()
+        self.assertFalse(index.is_file(os.path.join(tmpdir, 'new.txt')))
+        index.refresh(tmpdir)
+        self.assertTrue(index.is_file(os.path.join(tmpdir, 'new.txt')))
+        self.assertTrue(index.is_file(os.path.join(tmpdir, 'bar.txt')))
+
+        # handle_file() finds the file, its .info.json file and ERROR_DIR without checking them one by one:
+        guess_filename = GuessFilename(self.guess_filename.config, logging)
+        guess_filename.get_content_result = lambda dirname, basename: False
+        isfile, isdir = os.path.isfile, os.path.isdir
+        os.path.isfile = os.path.isdir = lambda path: self.fail('checked ' + path)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                # dryrun does not move the file to ERROR_DIR:
+                self.assertFalse(guess_filename.handle_file(os.path.join(tmpdir, 'foo.mp4'), True))
+                self.assertEqual(os.listdir(os.path.join(tmpdir, guessfilename.ERROR_DIR)), [])
+                self.assertFalse(guess_filename.handle_file(os.path.join(tmpdir, 'foo.mp4'), False))
+                self.assertFalse(guess_filename.handle_file(os.path.join(tmpdir, 'new.txt'), False))
+        finally:
+            os.path.isfile, os.path.isdir = isfile, isdir
+        self.assertEqual(sorted(os.listdir(os.path.join(tmpdir, guessfilename.ERROR_DIR))), ['foo.mp4', 'new.txt'])
+        self.assertFalse(guess_filename.directory_index.is_file(os.path.join(tmpdir, 'foo.mp4')))
+
+        # files created after reading their directory are found:
+        open(os.path.join(tmpdir, 'other.txt'), 'w').close()
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertFalse(guess_filename.handle_file(os.path.join(tmpdir, 'other.txt'), False))
+        self.assertFalse(os.path.isfile(os.path.join(tmpdir, 'other.txt')))
+
+        shutil.rmtree(tmpdir)
+
+    def test_walk_files(self):
+
+        tmpdir = tempfile.mkdtemp()
+        for dirname in ['a/b/c', 'a/' + guessfilename.SUCCESS_DIR, guessfilename.ERROR_DIR, 'd', 'tmp']:
+            os.makedirs(os.path.join(tmpdir, dirname))
+        files = ['foo.pdf', 'a/bar.txt', 'a/b/baz.pdf', 'a/b/c/qux.pdf', 'a/b/c/quux.txt', 'd/corge.pdf',
+                 'a/' + guessfilename.SUCCESS_DIR + '/done.pdf', guessfilename.ERROR_DIR + '/failed.pdf', 'tmp/grault.pdf']
+        for filename in files:
+            open(os.path.join(tmpdir, filename), 'w').close()
+        os.symlink(os.path.join(tmpdir, 'a'), os.path.join(tmpdir, 'd', 'loop'))
+
+        # SUCCESS_DIR, ERROR_DIR and symbolic links to directories are not walked:
+        self.assertEqual(sorted(walk_files([tmpdir])), sorted(os.path.join(tmpdir, filename) for filename in files[:6] + files[8:]))
+        for threads in [1, 3]:
+            self.assertEqual(sorted(walk_files([os.path.join(tmpdir, 'a'), os.path.join(tmpdir, 'd')], ['*.pdf'],
+                                               ['c', 'tmp'], threads)),
+                             [os.path.join(tmpdir, 'a/b/baz.pdf'), os.path.join(tmpdir, 'd/corge.pdf')])
+        self.assertEqual(list(walk_files([os.path.join(tmpdir, 'missing')])), [])
+
+        # the files of a directory are yielded in a row; the threads stop when the generator is closed:
+        dirnames = [os.path.dirname(filename) for filename in walk_files([tmpdir], threads=3)]
+        self.assertEqual(len(dirnames), len([dirname for dirname, group in itertools.groupby(dirnames)]) + 1)
+        walker = walk_files([tmpdir], threads=1)
+        self.assertTrue(next(walker).startswith(tmpdir))
+        walker.close()
+
+        self.assertEqual(list(get_batches(iter('abcde'), 2)), [['a', 'b'], ['c', 'd'], ['e']])
+        self.assertEqual(list(get_batches([], 2)), [])
+
+        shutil.rmtree(tmpdir)
+
+    def test_rename_plan(self):
+
+        tmpdir = tempfile.mkdtemp()
+        os.makedirs(os.path.join(tmpdir, 'sub', guessfilename.SUCCESS_DIR))
+        for basename in ['a', 'b', 'c', 'd', 'e', 'f', 'h', 'i', 'l', 'sub/j']:
+            with open(os.path.join(tmpdir, basename), 'w') as output:
+                output.write(basename)
+
+        def read_files() -> dict[str, str]:
+            files = {}
+            for dirname, dirnames, basenames in os.walk(tmpdir):
+                for basename in basenames:
+                    with open(os.path.join(dirname, basename)) as stream:
+                        files[os.path.relpath(os.path.join(dirname, basename), tmpdir)] = stream.read()
+            return files
+
+        journal = os.path.join(tmpdir, 'state', 'renames.journal')
+        plan = RenamePlan(guessfilename.DirectoryIndex(), journal)
+        renames = [('a', 'x'), ('b', 'x'), ('c', 'd'), ('e', 'f'), ('f', 'g'), ('h', 'i'), ('i', 'h'), ('l', 'a')]
+        for dryrun in [True, False]:
+            for oldbasename, newbasename in renames:
+                plan.add(tmpdir, oldbasename, newbasename, guessfilename.SUCCESS_DIR)
+            plan.add(os.path.join(tmpdir, 'sub'), 'j', 'k', guessfilename.SUCCESS_DIR)
+            plan.add(tmpdir, 'd', 'd', guessfilename.ERROR_DIR)
+            with self.assertLogs(level='ERROR') as logs:
+                # files getting the same name, existing names and renames depending on them are not carried out:
+                self.assertEqual(plan.apply(dryrun), 4)
+            self.assertEqual(sorted(line.split('"')[1] for line in logs.output),
+                             [os.path.join(tmpdir, basename) for basename in ['a', 'b', 'c', 'l']])
+            if dryrun:
+                self.assertEqual(read_files(), {'a': 'a', 'b': 'b', 'c': 'c', 'd': 'd', 'e': 'e', 'f': 'f', 'h': 'h', 'i': 'i',
+                                                'l': 'l', 'sub/j': 'sub/j'})
+        # chains are renamed from their end, cycles via a temporary name:
+        self.assertEqual(read_files(), {'a': 'a', 'b': 'b', 'c': 'c', 'd': 'd', 'f': 'e', 'g': 'f', 'i': 'h', 'h': 'i',
+                                        'l': 'l', 'sub/' + guessfilename.SUCCESS_DIR + '/k': 'sub/j'})
+        self.assertFalse(os.path.exists(journal))
+        self.assertTrue(plan.index.is_file(os.path.join(tmpdir, 'g')))
+        self.assertFalse(plan.index.is_file(os.path.join(tmpdir, 'e')))
+
+        # a failing rename rolls back the renames of the batch:
+        plan.add(tmpdir, 'a', 'y', guessfilename.SUCCESS_DIR)
+        plan.add(tmpdir, 'b', 'missing/z', guessfilename.SUCCESS_DIR)
+        with self.assertLogs(level='ERROR'):
+            self.assertEqual(plan.apply(), 2)
+        self.assertEqual((read_files()['a'], read_files()['b']), ('a', 'b'))
+        self.assertFalse(os.path.exists(journal))
+
+        # the journal of an interrupted batch is rolled back, skipping the steps which are not carried out:
+        os.rename(os.path.join(tmpdir, 'a'), os.path.join(tmpdir, 'y'))
+        with open(journal, 'w') as output:
+            for oldbasename, newbasename in [('a', 'y'), ('b', 'z')]:
+                output.write(json.dumps({'old': os.path.join(tmpdir, oldbasename), 'new': os.path.join(tmpdir, newbasename)}) + '\n')
+        self.assertEqual(rollback_journal(journal), 1)
+        self.assertEqual((read_files()['a'], read_files()['b']), ('a', 'b'))
+        self.assertFalse(os.path.exists(journal))
+
+        # handle_file() adds the renames to the plan:
+        for basename in ['Screenshot_2017-11-29_10-32-12.png', 'Screenshot_20171129-103212.png', 'VID_20170105_173104.mp4']:
+            open(os.path.join(tmpdir, 'sub', basename), 'w').close()
+        guess_filename = GuessFilename(self.guess_filename.config, logging)
+        guess_filename.rename_plan = RenamePlan(guess_filename.directory_index, journal)
+        with contextlib.redirect_stdout(io.StringIO()):
+            for basename in ['Screenshot_2017-11-29_10-32-12.png', 'Screenshot_20171129-103212.png', 'VID_20170105_173104.mp4']:
+                self.assertTrue(guess_filename.handle_file(os.path.join(tmpdir, 'sub', basename), False))
+        with self.assertLogs(level='ERROR'):
+            self.assertEqual(guess_filename.rename_plan.apply(), 2)
+        self.assertEqual(sorted(os.listdir(os.path.join(tmpdir, 'sub'))),
+                         ['Screenshot_2017-11-29_10-32-12.png', 'Screenshot_20171129-103212.png', guessfilename.SUCCESS_DIR])
+        self.assertEqual(sorted(os.listdir(os.path.join(tmpdir, 'sub', guessfilename.SUCCESS_DIR))),
+                         ['2017-01-05T17.31.04.mp4', 'k'])
+
+        # like without --plan, a file is not moved to SUCCESS_DIR with the name of an existing file next to it:
+        for basename in ['IMG_20161014_214404.jpg', '2016-10-14T21.44.04.jpg']:
+            open(os.path.join(tmpdir, 'sub', basename), 'w').close()
+        guess_filename.directory_index.refresh(os.path.join(tmpdir, 'sub'))
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertTrue(guess_filename.handle_file(os.path.join(tmpdir, 'sub', 'IMG_20161014_214404.jpg'), False))
+        with self.assertLogs(level='ERROR') as logs:
+            self.assertEqual(guess_filename.rename_plan.apply(), 1)
+        self.assertIn('a file with this name exists already', logs.output[0])
+        self.assertIn('IMG_20161014_214404.jpg', os.listdir(os.path.join(tmpdir, 'sub')))
+        self.assertNotIn('2016-10-14T21.44.04.jpg', os.listdir(os.path.join(tmpdir, 'sub', guessfilename.SUCCESS_DIR)))
+
+        shutil.rmtree(tmpdir)
+
+    def test_content_workers(self):
+
+        tmpdir = tempfile.mkdtemp()
+        files = [os.path.join(tmpdir, basename) for basename in
+                 ['2020-01-01 foo.pdf', '2016-01-19 bill foobar 12,12EUR.pdf', '2020-01-02 bar.pdf', 'missing.pdf']]
+        for filename in files[:3]:
+            with open(filename, 'wb') as output:
+                output.write(b'not a PDF file')
+        cache = PdfTextCache(os.path.join(tmpdir, 'pdftext.sqlite'))
+        cache.put(files[0], ['Spendenbestätigung'])
+        cache.put(files[2], ['something else'])
+        rule_table = [{'name': 'donation', 'source': 'content', 'content_contains': ['Spendenbestätigung'],
+                       'template': '{datetimestr} Spende -- {tags}.pdf', 'tags': ['taxes']}]
+        guess_filename = GuessFilename(self.guess_filename.config, logging, rule_table)
+        guess_filename.pdf_text_cache = cache
+        guess_filename.stats = RuleStatistics()
+
+        # only PDF files not recognized by the file name rules are analysed by the workers:
+        # the workers use the guessfilenameconfig.py of configdir instead of the one of the developer:
+        configdir = os.path.join(tmpdir, 'config')
+        os.mkdir(configdir)
+        with open(os.path.join(configdir, 'guessfilenameconfig.py'), 'w') as output:
+            for setting in ['DEFAULT_PDF_PASSWORD', 'GENERALI1_POLIZZE_NUMBER', 'LOAN_ID', 'LOAN_INSTITUTE',
+                            'MERKUR_GESUNDHEITSVORSORGE_NUMBER', 'MERKUR_GESUNDHEITSVORSORGE_ZAHLUNGSREFERENZ',
+                            'PROVIDER_CONTRACT', 'PROVIDER_CUE', 'RECHTSCHUTZPOLIZZE', 'RECHTSCHUTZVERSICHERUNG',
+                            'SALARY_COMPANY_NAME', 'SALARY_IDSTRING', 'VOLTINO_Kundennummer', 'VOLTINO_Teilbetrag']:
+                output.write('%s = "test %s"\n' % (setting, setting))
+        executor = start_content_workers(guess_filename, files, 2, configdir, rule_table)
+        self.assertEqual(sorted(guess_filename.content_futures), [files[0], files[2]])
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = [guess_filename.handle_file(filename, True) for filename in files]
+        executor.shutdown()
+        self.assertEqual(results, ['2020-01-01 Spende -- taxes.pdf', '2016-01-19 foobar 12,12€ -- scan bill.pdf', False, None])
+        self.assertEqual(guess_filename.content_futures, {})
+        rows = {row['rule']: row for row in guess_filename.stats.get_rows()}
+        self.assertEqual((rows['content']['attempts'], rows['content']['hits']), (2, 1))
+        self.assertEqual((rows['content/donation']['attempts'], rows['content/donation']['hits']), (2, 1))
+
+        cache.close()
+        shutil.rmtree(tmpdir)
+
     def test_film_url_regex(self):
 
         # check if the defined help text string for a MediathekView film URL matches the corresponding RegEx
@@ -1181,6 +2234,30 @@ class TestGuessFilename(unittest.TestCase):
         self.assertEqual(self.guess_filename.get_euro_charge_from_context("DasinsteinTest2015:EURJahresbeitrag123,45Offen678,90Zahlungenbis03.11.2015sindber",
                                                                            "Offen", "Zahlungen"), "678,90")
 
+    def test_search_context(self):
+
+        # search_context() chooses the same occurrence as the leading ".*" of the regular expressions:
+        documents = ["foo 1,00 bar foo 2,00 bar\nfoo 3,00 bar", "foo 1,00 baz foo\nfoo 2,00 bar foo 3,00 bar",
+                     "foo\nfoo 1,00 bar", "foofoo 1,00 barfoo 12,34 bar", "foo 1,00\nbar foo 2,00 bar", "", "foo",
+                     "foo:\n1,00 bar foo:\n2,00 bar", "x•Auszahlung  1.234,56•x•Auszahlung  2.345,67•x\n•Auszahlung  3.456,78•x",
+                     "•Auszahlung  1.234,56•x", "x\n•Auszahlung  1.234,56•x"]
+        for document in documents:
+            for before, after in [('foo', 'bar'), ('foo:\n', 'bar'), ('o', ' bar'), ('•Auszahlung  ', '•')]:
+                window = r"\D{0,5}((\d{1,6})[,.](\d{2}))\D{0,5}" + after
+                expected = re.search(".*" + before + window + ".*", document)
+                components = self.guess_filename.search_context(document, before, re.compile(window))
+                self.assertEqual(components and components.groups(), expected and expected.groups(), (document, before, after))
+                expected = re.search(".*" + before + "(.*)" + after + ".*", document)
+                components = self.guess_filename.search_context(document, before, re.compile("(.*)" + after))
+                self.assertEqual(components and components.groups(), expected and expected.groups(), (document, before, after))
+            expected = re.match(r'.+•Auszahlung  (?P<salary>\d\.\d{3},\d{2})•.+', document)
+            components = self.guess_filename.search_context(document, '•Auszahlung  ', GuessFilename.SALARY_WINDOW_REGEX, at_start=True)
+            self.assertEqual(components and components.groups(), expected and expected.groups(), document)
+
+        # contexts with regular expressions are still searched with them:
+        self.assertEqual(self.guess_filename.get_string_from_context("Summe: 12 EUR", "Sum+e: ", " (EUR|USD)"), "12")
+        self.assertEqual(self.guess_filename.get_euro_charge_from_context("Summe 1,00 x Summe 2,00 EUR", "Summe", "EUR"), "2,00")
+
 
     def test_get_euro_charge(self):
 
@@ -1240,6 +2317,14 @@ class TestGuessFilename(unittest.TestCase):
                          (None, ' -- ', [], None))
         self.assertEqual(self.guess_filename.split_filename_entities("."),
                          (None, '.', [], None))
+        self.assertEqual(self.guess_filename.split_filename_entities("foo -- bar baz .ext"),
+                         (None, "foo", ["bar", "baz", ""], "ext"))
+        self.assertEqual(self.guess_filename.split_filename_entities("foo -- bar  baz.ext"),
+                         (None, "foo -- bar  baz", [], "ext"))
+
+        # almost matching tags used to take exponential time:
+        self.assertEqual(self.guess_filename.split_filename_entities("foo -- " + "a" * 100 + "!.pdf"),
+                         (None, "foo -- " + "a" * 100 + "!", [], "pdf"))
 
 # Local Variables:
 # mode: flyspell